@@ -3,3 +3,8 @@
 from . import controllers
 from . import models
 from . import wizard
+
+
+def _post_init_hook(env):
+    """Build the postal summaries of the messages sent before installation."""
+    env['mail.message']._postal_rebuild_summaries()
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Postal Mail Tracking',
-    'version': '19.0.1.0.0',
+    'version': '19.0.1.4.0',
     'category': 'Discuss',
     'summary': 'Track email delivery status via Postal webhooks with WhatsApp-style ticks',
     'description': """
@@ -33,10 +33,17 @@ Configuration
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'wizard/mail_resend_message_views.xml',
-        'wizard/mail_postal_events_popup_views.xml',
-        'views/res_config_settings_views.xml',
+        'wizard/mail_postal_event_export_views.xml',
         'views/mail_postal_event_views.xml',
+        'views/mail_postal_event_summary_views.xml',
+        'views/mail_postal_stat_views.xml',
+        'views/mail_postal_resend_job_views.xml',
+        'views/mail_postal_suppression_views.xml',
+        'views/mail_postal_replay_job_views.xml',
+        'views/res_config_settings_views.xml',
+        'views/mail_postal_webhook_queue_views.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -44,6 +51,7 @@ Configuration
             'dr_postal/static/src/js/**/*',
         ],
     },
+    'post_init_hook': '_post_init_hook',
     'installable': True,
     'application': True,
     'auto_install': False,
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 
 from . import webhook
+from . import timeline
 
+from . import export
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, http
+from odoo.exceptions import UserError
+from odoo.http import Response, request
+
+
+class PostalExportController(http.Controller):
+    """Stream postal events as CSV or JSON Lines."""
+
+    @http.route('/postal/events/export', type='http', auth='user', methods=['GET'])
+    def postal_events_export(self, date_from=None, date_to=None, export_format='csv',
+                             columns=None, event_types=None, **kwargs):
+        """Stream the events of a date range.
+
+        ``columns`` and ``event_types`` are comma-separated lists; the
+        payload is only exported when ``payload`` is among the columns.
+        The body is generated from a separate cursor while it is sent, so
+        the export never holds the whole range in memory.
+        """
+        Event = request.env['mail.postal.event']
+        Event.check_access('read')
+        if export_format not in ('csv', 'jsonl'):
+            return request.make_response('Unsupported format\n', status=400)
+        options = {
+            'date_from': date_from or None,
+            'date_to': date_to or None,
+            'event_types': [event_type for event_type in (event_types or '').split(',') if event_type],
+        }
+        try:
+            options['columns'] = Event._postal_check_export_columns(
+                [column for column in (columns or '').split(',') if column]
+            )
+        except UserError as e:
+            return request.make_response(f'{e}\n', status=400)
+
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+
+        def generate():
+            # the request cursor is closed once the response starts streaming
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from env['mail.postal.event']._postal_export_chunks(export_format, **options)
+
+        filename = 'postal_events_%s.%s' % (fields.Date.to_string(fields.Date.context_today(Event)), export_format)
+        return Response(
+            generate(),
+            headers=[
+                ('Content-Type', 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson'),
+                ('Content-Disposition', http.content_disposition(filename)),
+            ],
+            direct_passthrough=True,
+        )
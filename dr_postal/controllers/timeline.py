@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+
+
+class PostalTimelineController(http.Controller):
+    """Serve compact per-recipient tracking timelines to the chatter."""
+
+    @http.route('/postal/timeline', type='jsonrpc', auth='user')
+    def postal_timeline(self, message_id, offset=0, limit=20):
+        """Return one page of recipients of a message with their event stats."""
+        message = request.env['mail.message'].browse(int(message_id)).exists()
+        if not message:
+            return {'total': 0, 'offset': 0, 'limit': limit, 'event_types': [], 'recipients': []}
+        return message._postal_get_timeline(offset=int(offset), limit=min(int(limit), 100))
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import hmac
 import json
 import logging
-from datetime import datetime
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from psycopg2.errors import UniqueViolation
 
 from odoo import http, SUPERUSER_ID
 from odoo.http import request
 
+from odoo.addons.dr_postal.tools.admission import BACKLOG, CONCURRENCY, RATE_LIMITER
+from odoo.addons.dr_postal.tools.metrics import METRICS
+
 _logger = logging.getLogger(__name__)
 
 
@@ -33,198 +43,182 @@ class PostalWebhookController(http.Controller):
     ], type='http', auth='none', methods=['POST'], csrf=False)
     def postal_webhook(self, token=None, **kwargs):
         """Receive and process postal webhook events."""
-        # Get JSON data from request body
+        with METRICS.timer('request'):
+            rejection = self._check_admission()
+            if rejection:
+                return rejection
+            try:
+                return self._handle_postal_webhook(token)
+            finally:
+                CONCURRENCY.release()
+
+    def _check_admission(self):
+        """Shed load before doing any work on the webhook.
+
+        Returns an error response when the source exceeds its rate limit
+        (429) or when this worker is saturated or the queue backlog is too
+        deep (503), both with ``Retry-After`` so that Postal retries later.
+        Otherwise takes a concurrency slot, to release once done, and
+        returns None.
+        """
+        config = self._get_webhook_config()
+        retry_after = [('Retry-After', str(config['retry_after']))]
+        if not RATE_LIMITER.allow(request.httprequest.remote_addr, config['rate_limit']):
+            METRICS.count(None, 'throttled')
+            return self._json_response({'status': 'error', 'message': 'Too many requests'}, 429, headers=retry_after)
+        if not CONCURRENCY.acquire(config['max_concurrency']):
+            METRICS.count(None, 'shed')
+            return self._json_response({'status': 'error', 'message': 'Server busy'}, 503, headers=retry_after)
         try:
-            data = json.loads(request.httprequest.data.decode('utf-8'))
-        except Exception as e:
-            _logger.error('Postal webhook: Failed to parse JSON: %s', e)
-            return self._json_response({'status': 'error', 'message': 'Invalid JSON'}, 400)
+            backlog_full = config['max_backlog'] and BACKLOG.get(
+                lambda: request.env['mail.postal.webhook.queue'].sudo()._get_backlog(config['max_backlog'])
+            ) >= config['max_backlog']
+        except Exception:
+            CONCURRENCY.release()
+            raise
+        if backlog_full:
+            CONCURRENCY.release()
+            METRICS.count(None, 'shed')
+            return self._json_response({'status': 'error', 'message': 'Backlog full'}, 503, headers=retry_after)
+        return None
+
+    def _handle_postal_webhook(self, token):
+        # Authenticate first, so that rejected requests are never parsed
+        with METRICS.timer('auth'):
+            if not self._validate_webhook_token(token):
+                _logger.warning('Postal webhook: Invalid or missing token')
+                METRICS.count(None, 'rejected')
+                return self._json_response({'status': 'error', 'message': 'Unauthorized'}, 403)
+            body = request.httprequest.get_data()
+            if not self._validate_webhook_signature(body):
+                _logger.warning('Postal webhook: Invalid or missing signature')
+                METRICS.count(None, 'rejected')
+                return self._json_response({'status': 'error', 'message': 'Unauthorized'}, 403)
+
+        # In asynchronous mode, only stage the raw body and answer immediately
+        if self._is_async_mode():
+            if not body:
+                _logger.warning('Postal webhook: Empty payload received')
+                METRICS.count(None, 'error')
+                return self._json_response({'status': 'error', 'message': 'Empty payload'}, 400)
+            with METRICS.timer('enqueue'):
+                env = request.env(user=SUPERUSER_ID)
+                env['mail.postal.webhook.queue'].sudo()._enqueue(body.decode('utf-8', errors='replace'))
+            METRICS.count(None, 'queued')
+            return self._json_response({'status': 'queued'}, 202)
+
+        # Get JSON data from request body
+        with METRICS.timer('parse'):
+            try:
+                data = json.loads(body.decode('utf-8'))
+            except Exception as e:
+                _logger.error('Postal webhook: Failed to parse JSON: %s', e)
+                METRICS.count(None, 'error')
+                return self._json_response({'status': 'error', 'message': 'Invalid JSON'}, 400)
         
         if not data:
             _logger.warning('Postal webhook: Empty payload received')
+            METRICS.count(None, 'error')
             return self._json_response({'status': 'error', 'message': 'Empty payload'}, 400)
         
-        # Validate webhook token
-        if not self._validate_webhook_token(token):
-            _logger.warning('Postal webhook: Invalid or missing token')
-            return self._json_response({'status': 'error', 'message': 'Unauthorized'}, 403)
-        
         # Process the event
         try:
-            result = self._process_postal_event(data)
+            with METRICS.timer('process'):
+                result = self._process_postal_event(data)
             return self._json_response(result)
         except Exception as e:
             _logger.exception('Postal webhook: Error processing event: %s', e)
+            METRICS.count(data.get('event') if isinstance(data, dict) else None, 'error')
             return self._json_response({'status': 'error', 'message': str(e)}, 500)
 
-    def _json_response(self, data, status=200):
+    @http.route('/postal/metrics', type='http', auth='public', methods=['GET'], csrf=False)
+    def postal_metrics(self, **kwargs):
+        """Expose the pipeline metrics of this worker in Prometheus text format.
+
+        Allowed for administrators logged in, or with the configured metrics
+        token as ``Authorization: Bearer <token>``.
+        """
+        if not self._validate_metrics_access():
+            return request.make_response('Unauthorized\n', headers=[('Content-Type', 'text/plain')], status=403)
+        return request.make_response(
+            METRICS.render(),
+            headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')],
+        )
+
+    def _json_response(self, data, status=200, headers=None):
         """Return a JSON response."""
         return request.make_response(
             json.dumps(data),
-            headers=[('Content-Type', 'application/json')],
+            headers=[('Content-Type', 'application/json')] + (headers or []),
             status=status
         )
 
+    def _get_webhook_config(self):
+        """Return the webhook configuration, cached per worker."""
+        env = request.env(user=SUPERUSER_ID)
+        return env['mail.postal.event'].sudo()._postal_get_webhook_config()
+
+    def _is_async_mode(self):
+        """Whether webhooks are staged in the queue instead of processed inline."""
+        return self._get_webhook_config()['async']
+
     def _validate_webhook_token(self, url_token=None):
         """Validate the token from URL or X-Postal-Token header."""
-        env = request.env(user=SUPERUSER_ID)
-        configured_token = env['ir.config_parameter'].sudo().get_param(
-            'dr_postal.webhook_token', ''
-        )
+        configured_token = self._get_webhook_config()['token']
         
         if not configured_token:
             _logger.warning('Postal webhook: No token configured, allowing request')
             return True
         
-        if url_token and url_token == configured_token:
+        configured_token = configured_token.encode()
+        if url_token and hmac.compare_digest(url_token.encode(), configured_token):
             return True
         
         header_token = request.httprequest.headers.get('X-Postal-Token', '')
-        if header_token and header_token == configured_token:
+        if header_token and hmac.compare_digest(header_token.encode(), configured_token):
             return True
         
         return False
 
-    def _process_postal_event(self, data):
-        """Process a postal webhook event."""
-        env = request.env(user=SUPERUSER_ID)
-        
-        # Postal wraps events: {event, timestamp, uuid, payload}
-        event_name = data.get('event', '')
-        payload = data.get('payload', {})
-        
-        _logger.info('Postal webhook: Event=%s, Payload keys=%s', event_name, list(payload.keys()) if payload else 'None')
-        
-        # Map Postal event names to our states
-        event_mapping = {
-            'MessageSent': 'sent',
-            'MessageDelayed': 'sent',
-            'MessageDeliveryFailed': 'bounced',
-            'MessageHeld': 'sent',
-            'MessageBounced': 'bounced',
-            'MessageLinkClicked': 'opened',
-            'MessageLoaded': 'opened',
-        }
-        
-        event_type = event_mapping.get(event_name)
-        
-        if not event_type:
-            _logger.warning('Postal webhook: Unknown event name: %s', event_name)
-            return {'status': 'ok', 'message': f'Unknown event: {event_name}, ignored'}
-        
-        _logger.info('Postal webhook: Mapped %s -> %s', event_name, event_type)
-        
-        # Extract message data from payload
-        # For most events, message info is in payload.message
-        # For bounce events, it's in payload.original_message
-        if event_name == 'MessageBounced':
-            message_data = payload.get('original_message', {})
-        else:
-            message_data = payload.get('message', {})
-        
-        # Extract identifiers
-        external_message_id = message_data.get('message_id', '')
-        recipient = message_data.get('to', '')
-        
-        # Get timestamp
-        timestamp = data.get('timestamp') or payload.get('timestamp', 0)
-        if timestamp:
+    def _validate_metrics_access(self):
+        """Check the bearer metrics token, or that the user is an administrator."""
+        metrics_token = self._get_webhook_config()['metrics_token']
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if metrics_token and authorization.startswith('Bearer '):
+            return hmac.compare_digest(authorization[7:].strip().encode(), metrics_token.encode())
+        return request.env.user.has_group('base.group_system')
+
+    def _validate_webhook_signature(self, body):
+        """Verify the X-Postal-Signature(-256) header when signatures are enforced.
+
+        Postal signs the raw request body with its RSA key: SHA-256 in
+        ``X-Postal-Signature-256``, SHA-1 in the legacy ``X-Postal-Signature``.
+        """
+        config = self._get_webhook_config()
+        if not config['verify_signature']:
+            return True
+        public_key = config['public_key']
+        if not public_key:
+            return False
+        
+        headers = request.httprequest.headers
+        for header, algorithm in (('X-Postal-Signature-256', hashes.SHA256), ('X-Postal-Signature', hashes.SHA1)):
+            signature = headers.get(header)
+            if not signature:
+                continue
             try:
-                event_datetime = datetime.fromtimestamp(float(timestamp))
-            except (ValueError, TypeError, OSError):
-                event_datetime = datetime.now()
-        else:
-            event_datetime = datetime.now()
-        
-        # Build error message for failures
-        error_message = ''
-        if event_type == 'bounced':
-            if event_name == 'MessageBounced':
-                bounce_info = payload.get('bounce', {})
-                error_message = f"Bounce from: {bounce_info.get('from', 'unknown')}\nSubject: {bounce_info.get('subject', 'N/A')}"
-            else:
-                error_message = payload.get('details', '')
-                if payload.get('output'):
-                    error_message += f"\n\nServer response: {payload.get('output', '')}"
-        
-        # Find notification
-        notification = self._find_notification(message_data, external_message_id)
-        
-        if not notification:
-            _logger.info(
-                'Postal webhook: No matching notification found (message_id: %s, to: %s)',
-                external_message_id, recipient
-            )
-        
-        # Create postal event record
-        event_vals = {
-            'event_type': event_type,
-            'event_datetime': event_datetime,
-            'payload_json': json.dumps(data, indent=2),
-            'external_message_id': external_message_id,
-            'recipient': recipient,
-            'error_message': error_message,
-            'postal_tracking_uuid': '',
-        }
-        
-        if notification:
-            event_vals['notification_id'] = notification.id
-            event_vals['message_id'] = notification.mail_message_id.id if notification.mail_message_id else False
-            if notification.postal_tracking_uuid:
-                event_vals['postal_tracking_uuid'] = notification.postal_tracking_uuid
-        
-        event_record = env['mail.postal.event'].sudo().create(event_vals)
-        
-        # Update notification state
-        if notification:
-            notification.sudo()._update_postal_state(event_type, event_record)
-        
-        _logger.info(
-            'Postal webhook: Created event %s for %s (id: %s)',
-            event_type, recipient, event_record.id
-        )
-        
-        return {'status': 'ok', 'event_id': event_record.id}
+                public_key.verify(base64.b64decode(signature), body, padding.PKCS1v15(), algorithm())
+                return True
+            except (InvalidSignature, ValueError):
+                return False
+        return False
 
-    def _find_notification(self, message_data, external_message_id):
-        """Find the mail.notification record matching the webhook data."""
+    def _process_postal_event(self, data):
+        """Process a postal webhook event."""
         env = request.env(user=SUPERUSER_ID)
-        Notification = env['mail.notification'].sudo()
-        
-        if external_message_id:
-            Message = env['mail.message'].sudo()
-            
-            # Search for mail.message with this message_id
-            message = Message.search([
-                ('message_id', '=', external_message_id)
-            ], limit=1)
-            
-            if message:
-                notification = Notification.search([
-                    ('mail_message_id', '=', message.id)
-                ], limit=1)
-                if notification:
-                    return notification
-            
-            # Try with angle brackets
-            message = Message.search([
-                ('message_id', '=', f'<{external_message_id}>')
-            ], limit=1)
-            
-            if message:
-                notification = Notification.search([
-                    ('mail_message_id', '=', message.id)
-                ], limit=1)
-                if notification:
-                    return notification
-        
-        # Try by tracking UUID
-        tracking_uuid = message_data.get('odoo_tracking_uuid')
-        if tracking_uuid:
-            notification = Notification.search([
-                ('postal_tracking_uuid', '=', tracking_uuid)
-            ], limit=1)
-            if notification:
-                return notification
-        
-        return None
+        try:
+            with env.cr.savepoint():
+                return env['mail.postal.event'].sudo()._process_postal_event(data)
+        except UniqueViolation:
+            # A concurrent retry of the same envelope won the race
+            return {'status': 'ok', 'message': 'Duplicate event, ignored'}
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import logging
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def migrate(cr, version):
+    """Move legacy plain-text payloads into the compressed payload column."""
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+         WHERE table_name = 'mail_postal_event' AND column_name = 'payload_json'
+    """)
+    if not cr.fetchone():
+        return
+
+    converted = 0
+    while True:
+        cr.execute("""
+            SELECT id, payload_json FROM mail_postal_event
+             WHERE payload_json IS NOT NULL
+          ORDER BY id
+             LIMIT %s
+        """, [BATCH_SIZE])
+        rows = cr.fetchall()
+        if not rows:
+            break
+        values = []
+        for event_id, text in rows:
+            try:
+                raw = json.dumps(json.loads(text), separators=(',', ':'), ensure_ascii=False).encode()
+            except ValueError:
+                raw = text.encode()
+            values.append((event_id, base64.b64encode(zlib.compress(raw)), len(raw)))
+        cr.execute("""
+            UPDATE mail_postal_event e
+               SET payload_data = v.data, payload_size = v.size, payload_json = NULL
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::bytea[]) AS data, unnest(%s::int[]) AS size) v
+             WHERE e.id = v.id
+        """, [[v[0] for v in values], [v[1] for v in values], [v[2] for v in values]])
+        converted += len(rows)
+
+    cr.execute("ALTER TABLE mail_postal_event DROP COLUMN payload_json")
+    _logger.info('dr_postal: compressed %s legacy postal event payloads', converted)
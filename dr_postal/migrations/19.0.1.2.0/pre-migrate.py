@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo.addons.dr_postal.tools.smtp import parse_smtp_error
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def migrate(cr, version):
+    """Fill the new search columns of postal events with plain SQL.
+
+    Creating the columns beforehand keeps the ORM from recomputing the
+    stored fields of every event in Python; only bounces, the events with
+    an error message, need their SMTP failure parsed.
+    """
+    cr.execute("""
+        ALTER TABLE mail_postal_event
+            ADD COLUMN IF NOT EXISTS recipient_normalized varchar,
+            ADD COLUMN IF NOT EXISTS recipient_domain varchar,
+            ADD COLUMN IF NOT EXISTS smtp_code varchar,
+            ADD COLUMN IF NOT EXISTS smtp_category varchar
+    """)
+    cr.execute("""
+        UPDATE mail_postal_event
+           SET recipient_normalized = NULLIF(lower(btrim(recipient, ' <>')), ''),
+               recipient_domain = NULLIF(split_part(lower(btrim(recipient, ' <>')), '@', 2), '')
+         WHERE recipient IS NOT NULL
+    """)
+
+    parsed = 0
+    last_id = 0
+    while True:
+        cr.execute("""
+            SELECT id, error_message FROM mail_postal_event
+             WHERE id > %s AND error_message IS NOT NULL AND error_message != ''
+          ORDER BY id
+             LIMIT %s
+        """, [last_id, BATCH_SIZE])
+        rows = cr.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [(event_id, *parse_smtp_error(text)) for event_id, text in rows]
+        cr.execute("""
+            UPDATE mail_postal_event e
+               SET smtp_code = v.code, smtp_category = v.category
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::varchar[]) AS code, unnest(%s::varchar[]) AS category) v
+             WHERE e.id = v.id
+        """, [[v[0] for v in values], [v[1] or None for v in values], [v[2] or None for v in values]])
+        parsed += len(rows)
+    _logger.info('dr_postal: parsed the SMTP failure of %s postal events', parsed)
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Build the postal summaries of existing messages.
+
+    The summary columns are only maintained incrementally afterwards, so
+    they must start from the current state of the email notifications.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['mail.message']._postal_rebuild_summaries()
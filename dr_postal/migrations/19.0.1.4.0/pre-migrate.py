@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Index the last postal event of notifications.
+
+    Purging events sets this foreign key to NULL on the notifications that
+    reference them; without an index, each deleted event scans the whole
+    notification table. The index gets the name the ORM gives to
+    ``btree_not_null`` indexes, so that the upgrade does not create another.
+    """
+    cr.execute("""
+        CREATE INDEX IF NOT EXISTS mail_notification__postal_last_event_id_index
+            ON mail_notification (postal_last_event_id)
+         WHERE postal_last_event_id IS NOT NULL
+    """)
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from . import mail_postal_event
+from . import mail_postal_event_summary
+from . import mail_postal_message_map
+from . import mail_postal_stat
+from . import mail_postal_suppression
+from . import mail_postal_resend_job
+from . import mail_postal_replay_job
+from . import mail_postal_webhook_queue
 from . import mail_notification
 from . import mail_mail
 from . import mail_message
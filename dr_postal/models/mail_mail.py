@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
-import uuid
-from odoo import api, models
+from odoo import _, api, models
+from odoo.tools import email_normalize, email_split
 
 
 class MailMail(models.Model):
@@ -9,46 +9,140 @@ class MailMail(models.Model):
     
     _inherit = 'mail.mail'
 
+    def _send(self, *args, **kwargs):
+        """Prefetch the postal notifications of the whole batch once.
+
+        The (message, partner) map is kept in the cursor cache while the batch
+        is sent, so that ``_send_prepare_values`` never has to search
+        notifications itself.
+        Recipients on the Postal suppression list are dropped beforehand.
+        """
+        mails = self._postal_skip_suppressed_recipients()
+        if not mails:
+            return True
+        notification_map = mails._get_postal_notification_map()
+        cache = self.env.cr.cache
+        previous_map = cache.get('dr_postal.notification_map')
+        cache['dr_postal.notification_map'] = notification_map
+        try:
+            res = super(MailMail, mails)._send(*args, **kwargs)
+        finally:
+            if previous_map is None:
+                cache.pop('dr_postal.notification_map', None)
+            else:
+                cache['dr_postal.notification_map'] = previous_map
+
+        # Update notification state to 'sent' for all mails sent in this batch
+        notifications = self.env['mail.notification'].sudo().browse(
+            {notification_id for notification_id, __ in notification_map.values()}
+        )
+        notifications.filtered(
+            lambda n: n.postal_state == 'none' and n.notification_status == 'sent'
+        ).write({'postal_state': 'sent'})
+        return res
+
+    def _postal_skip_suppressed_recipients(self):
+        """Remove suppressed addresses from the mails before they are sent.
+
+        The notifications of suppressed partners are marked as bounced right
+        away and detached from the mail, so that post-processing the sent mail
+        does not reset them; mails left without any recipient are failed
+        without reaching the SMTP server. The whole batch is resolved with one search
+        of the notifications and one write of the recipients. Returns the
+        mails still to send.
+        """
+        suppressed = self.env['mail.postal.suppression'].sudo()._postal_get_suppressed_emails()
+        if not suppressed:
+            return self
+        partners = self.recipient_ids.filtered(lambda p: p.email_normalized in suppressed)
+        email_to_updates = {}
+        for mail in self:
+            emails = email_split(mail.email_to or '')
+            kept = [email for email in emails if email_normalize(email) not in suppressed]
+            if len(kept) != len(emails):
+                email_to_updates[mail] = ', '.join(kept)
+        mails = self.filtered(lambda mail: mail.recipient_ids & partners)
+        if not mails and not email_to_updates:
+            return self
+
+        reason = _('Address suppressed after repeated bounces reported by Postal')
+        if mails:
+            pairs = {
+                (mail.mail_message_id.id, partner.id)
+                for mail in mails.filtered('mail_message_id')
+                for partner in mail.recipient_ids & partners
+            }
+            notifications = self.env['mail.notification'].sudo().search([
+                ('mail_message_id', 'in', list({message_id for message_id, __ in pairs})),
+                ('res_partner_id', 'in', partners.ids),
+                ('notification_type', '=', 'email'),
+            ]).filtered(lambda n: (n.mail_message_id.id, n.res_partner_id.id) in pairs)
+            mails.write({'recipient_ids': [(3, partner.id) for partner in partners]})
+            if notifications:
+                notifications.write({
+                    'notification_status': 'bounce',
+                    'failure_type': 'mail_bounce',
+                    'failure_reason': reason,
+                    'postal_state': 'bounced',
+                    'mail_mail_id': False,
+                })
+                notifications._postal_notify_state_changes()
+        email_to_mails = self.browse().concat(*email_to_updates)
+        for email_to, to_update in email_to_mails.grouped(email_to_updates.get).items():
+            to_update.write({'email_to': email_to})
+
+        skipped = (mails | email_to_mails).filtered(
+            lambda mail: not mail.recipient_ids and not email_split(mail.email_to or '') and not mail.email_cc
+        )
+        if skipped:
+            skipped.write({'state': 'exception', 'failure_reason': reason})
+        return self - skipped
+
     def _send_prepare_values(self, partner=None):
         """Add postal tracking headers to outgoing email."""
         res = super()._send_prepare_values(partner=partner)
         
-        # Find notification for this partner if exists
-        notification = self._get_postal_notification(partner)
+        notification_map = self.env.cr.cache.get('dr_postal.notification_map')
+        if notification_map is None:
+            notification_map = self._get_postal_notification_map()
+        entry = notification_map.get((self.mail_message_id.id, partner.id if partner else False))
         
-        if notification:
-            # Generate tracking UUID if not exists
-            if not notification.postal_tracking_uuid:
-                tracking_uuid = str(uuid.uuid4())
-                notification.postal_tracking_uuid = tracking_uuid
-            else:
-                tracking_uuid = notification.postal_tracking_uuid
+        if entry:
+            notification_id, tracking_uuid = entry
             
             # Add custom headers for postal tracking
             extra_headers = res.get('headers', {}) or {}
             extra_headers.update({
                 'X-Odoo-Tracking-UUID': tracking_uuid,
-                'X-Odoo-Notification-Id': str(notification.id),
+                'X-Odoo-Notification-Id': str(notification_id),
                 'X-Odoo-Message-Id': str(self.mail_message_id.id) if self.mail_message_id else '',
             })
             res['headers'] = extra_headers
-            
-            # Update notification state to 'sent'
-            if notification.postal_state == 'none':
-                notification.postal_state = 'sent'
         
         return res
 
-    def _get_postal_notification(self, partner=None):
-        """Find the mail.notification record for this mail and partner."""
-        if not self.mail_message_id:
-            return None
-        
-        domain = [('mail_message_id', '=', self.mail_message_id.id)]
+    def _get_postal_notification_map(self):
+        """Map ``(message id, partner id)`` to ``(notification id, tracking uuid)``.
+
+        Email notifications of all mails in ``self`` are fetched with one
+        search; notifications created before tracking UUIDs were assigned at
+        creation get theirs in a single bulk update. The ``(message id, False)``
+        key holds the notification used for mails sent without a partner.
+        """
+        messages = self.mail_message_id
+        if not messages:
+            return {}
         
-        if partner:
-            domain.append(('res_partner_id', '=', partner.id))
+        notifications = self.env['mail.notification'].sudo().search([
+            ('mail_message_id', 'in', messages.ids),
+            ('notification_type', '=', 'email'),
+        ], order='id')
+        notifications.filtered(lambda n: not n.postal_tracking_uuid)._assign_postal_tracking_uuids()
         
-        notification = self.env['mail.notification'].search(domain, limit=1)
-        return notification
-
+        notification_map = {}
+        for notification in notifications:
+            entry = (notification.id, notification.postal_tracking_uuid)
+            message_id = notification.mail_message_id.id
+            notification_map[(message_id, notification.res_partner_id.id)] = entry
+            notification_map.setdefault((message_id, False), entry)
+        return notification_map
@@ -1,11 +1,345 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models
+import logging
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Postal states counted in message summaries, from worst to best
+POSTAL_SUMMARY_STATES = ['bounced', 'none', 'sent', 'delivered', 'opened']
+POSTAL_SUMMARY_COUNT_FIELDS = {state: f'postal_{state}_count' for state in POSTAL_SUMMARY_STATES}
+POSTAL_SUMMARY_FNAMES = [
+    *POSTAL_SUMMARY_COUNT_FIELDS.values(), 'postal_worst_state', 'postal_best_state', 'postal_summary',
+]
 
 
 class MailMessage(models.Model):
     """Extend mail.message for postal tracking compatibility."""
     
     _inherit = 'mail.message'
-    
-    # No overrides needed - postal_state is handled via mail.notification._to_store_defaults
+
+    # Canonical Message-ID (no angle brackets / surrounding spaces), used to
+    # match Postal events whatever form Postal reports the header in.
+    _postal_message_key_idx = models.Index("(btrim(message_id, '<> '))")
+
+    # Delivery summary over the email notifications of the message. Changes
+    # of postal state only append deltas (mail.postal.summary.delta), which
+    # a cron folds into these columns; reads add the deltas not folded yet.
+    # The chatter renders ticks from it without loading every notification.
+    postal_none_count = fields.Integer(string='Untracked Recipients', readonly=True)
+    postal_sent_count = fields.Integer(string='Sent Recipients', readonly=True)
+    postal_delivered_count = fields.Integer(string='Delivered Recipients', readonly=True)
+    postal_opened_count = fields.Integer(string='Opened Recipients', readonly=True)
+    postal_bounced_count = fields.Integer(string='Bounced Recipients', readonly=True)
+    postal_worst_state = fields.Selection(
+        selection=lambda self: self.env['mail.notification']._fields['postal_state']._description_selection(self.env),
+        string='Worst Postal Status',
+        readonly=True,
+    )
+    postal_best_state = fields.Selection(
+        selection=lambda self: self.env['mail.notification']._fields['postal_state']._description_selection(self.env),
+        string='Best Postal Status',
+        readonly=True,
+    )
+    postal_summary = fields.Json(string='Postal Summary', compute='_compute_postal_summary')
+
+    @api.depends(*POSTAL_SUMMARY_COUNT_FIELDS.values())
+    def _compute_postal_summary(self):
+        pending = defaultdict(dict)
+        message_ids = [message.id for message in self if message.id]
+        if message_ids:
+            self.env.cr.execute(SQL(
+                """SELECT message_id, state, SUM(delta)
+                     FROM mail_postal_summary_delta
+                    WHERE message_id = ANY(%s)
+                 GROUP BY message_id, state""",
+                message_ids,
+            ))
+            for message_id, state, delta in self.env.cr.fetchall():
+                pending[message_id][state] = delta
+        for message in self:
+            counts = {
+                state: message[fname] + pending[message.id].get(state, 0)
+                for state, fname in POSTAL_SUMMARY_COUNT_FIELDS.items()
+            }
+            counted = [state for state in POSTAL_SUMMARY_STATES if counts[state] > 0]
+            message.postal_summary = {
+                'counts': counts,
+                'total': sum(counts.values()),
+                'worst': counted[0],
+                'best': counted[-1],
+            } if counted else False
+
+    def _postal_is_tracked(self):
+        """Whether Postal reported on at least one recipient of this message."""
+        self.ensure_one()
+        summary = self.postal_summary
+        return bool(summary) and summary['best'] != 'none'
+
+    def _to_store_defaults(self, target):
+        """Add the postal summary to the data sent to frontend."""
+        return super()._to_store_defaults(target) + ['postal_summary']
+
+    @api.model
+    def _postal_normalize_message_id(self, message_id):
+        """Return the canonical form of a Message-ID, as indexed above."""
+        return (message_id or '').strip('<> ') or False
+
+    @api.model
+    def _postal_summary_delta_cte(self, transitions):
+        """Return a CTE appending the deltas of postal state transitions.
+
+        :param transitions: ``SQL`` query returning ``(message_id, old_state,
+            new_state)`` rows, one per email notification changing state,
+            entering the summary (``old_state`` is NULL) or leaving it
+            (``new_state`` is NULL)
+
+        Rows are only inserted: concurrent transactions never wait on each
+        other, whatever the number of recipients of the message.
+        """
+        return SQL(
+            """
+            postal_summary_delta AS (
+                INSERT INTO mail_postal_summary_delta (message_id, state, delta)
+                SELECT t.message_id, d.state, d.delta
+                  FROM (%s) t
+            CROSS JOIN LATERAL (VALUES (t.old_state, -1), (t.new_state, 1)) AS d(state, delta)
+                 WHERE t.message_id IS NOT NULL AND t.old_state IS DISTINCT FROM t.new_state
+                   AND d.state IS NOT NULL
+            )
+            """,
+            transitions,
+        )
+
+    @api.model
+    def _postal_apply_state_transitions(self, transitions):
+        """Append the deltas of ``(message_id, old_state, new_state)`` transitions.
+
+        See ``_postal_summary_delta_cte``.
+        """
+        deltas = defaultdict(int)
+        for message_id, old_state, new_state in transitions:
+            if not message_id or old_state == new_state:
+                continue
+            if old_state:
+                deltas[message_id, old_state] -= 1
+            if new_state:
+                deltas[message_id, new_state] += 1
+        rows = [(message_id, state, delta) for (message_id, state), delta in deltas.items() if delta]
+        if not rows:
+            return
+        self.env.cr.execute(SQL(
+            "INSERT INTO mail_postal_summary_delta (message_id, state, delta) VALUES %s",
+            SQL(', ').join(SQL('(%s, %s, %s)', *row) for row in rows),
+        ))
+        self.invalidate_model(['postal_summary'])
+
+    @api.model
+    def _postal_summary_assignments(self):
+        """SET clause storing the counters of a ``c`` relation with one column per state."""
+
+        def first_counted(states):
+            return SQL("CASE %s END", SQL(' ').join(
+                SQL("WHEN c.%s > 0 THEN %s", SQL.identifier(state), state) for state in states
+            ))
+
+        return SQL(', ').join([
+            *(SQL("%s = c.%s", SQL.identifier(fname), SQL.identifier(state))
+              for state, fname in POSTAL_SUMMARY_COUNT_FIELDS.items()),
+            SQL("postal_worst_state = %s", first_counted(POSTAL_SUMMARY_STATES)),
+            SQL("postal_best_state = %s", first_counted(reversed(POSTAL_SUMMARY_STATES))),
+        ])
+
+    @api.model
+    def _cron_fold_postal_summaries(self):
+        """Fold the pending summary deltas into the message counters, in batches.
+
+        Only this cron updates the summary columns of messages, so webhooks
+        never lock the row of a message sent to thousands of recipients.
+        """
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.summary_fold_batch_size', 10000))
+        totals = SQL(', ').join(
+            SQL("COALESCE(SUM(delta) FILTER (WHERE state = %s), 0) AS %s", state, SQL.identifier(state))
+            for state in POSTAL_SUMMARY_STATES
+        )
+        counts = SQL(', ').join(
+            SQL("COALESCE(m.%s, 0) + t.%s AS %s", SQL.identifier(fname), SQL.identifier(state), SQL.identifier(state))
+            for state, fname in POSTAL_SUMMARY_COUNT_FIELDS.items()
+        )
+        while True:
+            self.env.cr.execute(SQL(
+                """
+                WITH folded AS (
+                    DELETE FROM mail_postal_summary_delta
+                     WHERE id IN (SELECT id FROM mail_postal_summary_delta ORDER BY id LIMIT %(limit)s
+                                  FOR UPDATE SKIP LOCKED)
+                 RETURNING message_id, state, delta
+                ),
+                totals AS (
+                    SELECT message_id AS id, %(totals)s FROM folded GROUP BY message_id
+                ),
+                c AS (
+                    SELECT m.id, %(counts)s FROM mail_message m JOIN totals t ON t.id = m.id
+                ),
+                updated AS (
+                    UPDATE mail_message m SET %(assignments)s FROM c WHERE m.id = c.id
+                )
+                SELECT COUNT(*) FROM folded
+                """,
+                limit=batch_size,
+                totals=totals,
+                counts=counts,
+                assignments=self._postal_summary_assignments(),
+            ))
+            folded = self.env.cr.fetchone()[0]
+            self.invalidate_model(POSTAL_SUMMARY_FNAMES)
+            if not folded or not self.env['ir.cron']._commit_progress(folded):
+                break
+
+    @api.model
+    def _postal_rebuild_summaries(self):
+        """Recount the summaries of all messages from their email notifications.
+
+        Run at installation and upgrade, as the counters are only maintained
+        incrementally afterwards.
+        """
+        self.env['mail.notification'].flush_model(['mail_message_id', 'notification_type', 'postal_state'])
+        counts = SQL(', ').join(
+            SQL("COUNT(*) FILTER (WHERE COALESCE(postal_state, 'none') = %s) AS %s", state, SQL.identifier(state))
+            for state in POSTAL_SUMMARY_STATES
+        )
+        self.env.cr.execute(SQL("DELETE FROM mail_postal_summary_delta"))
+        self.env.cr.execute(SQL(
+            """
+            WITH c AS (
+                SELECT mail_message_id AS id, %(counts)s
+                  FROM mail_notification
+                 WHERE notification_type = 'email' AND mail_message_id IS NOT NULL
+              GROUP BY mail_message_id
+            )
+            UPDATE mail_message m SET %(assignments)s FROM c WHERE m.id = c.id
+            """,
+            counts=counts,
+            assignments=self._postal_summary_assignments(),
+        ))
+        _logger.info('dr_postal: built the postal summary of %s messages', self.env.cr.rowcount)
+        self.invalidate_model(POSTAL_SUMMARY_FNAMES)
+
+    def _postal_get_timeline(self, offset=0, limit=20):
+        """Return a page of recipients of this message with per-type event stats.
+
+        Only aggregates are returned: for each recipient and event type, the
+        number of events and the first / last event times, including events
+        already rolled up by the retention policy.
+        """
+        self.ensure_one()
+        self.check_access('read')
+        Notification = self.env['mail.notification'].sudo()
+        domain = [('mail_message_id', '=', self.id), ('notification_type', '=', 'email')]
+        total = Notification.search_count(domain)
+        notifications = Notification.search(domain, order='id', offset=offset, limit=limit)
+
+        stats = {}
+
+        def add_stats(notification, event_type, count, first, last):
+            entry = stats.setdefault(notification.id, {}).setdefault(
+                event_type, {'count': 0, 'first': first, 'last': last},
+            )
+            entry['count'] += count
+            entry['first'] = min(entry['first'], first)
+            entry['last'] = max(entry['last'], last)
+
+        if notifications:
+            event_domain = [('notification_id', 'in', notifications.ids)]
+            for notification, event_type, count, first, last in self.env['mail.postal.event'].sudo()._read_group(
+                event_domain, ['notification_id', 'event_type'],
+                ['__count', 'event_datetime:min', 'event_datetime:max'],
+            ):
+                add_stats(notification, event_type, count, first, last)
+            for notification, event_type, count, first, last in self.env['mail.postal.event.summary'].sudo()._read_group(
+                event_domain, ['notification_id', 'event_type'],
+                ['event_count:sum', 'first_event_datetime:min', 'last_event_datetime:max'],
+            ):
+                add_stats(notification, event_type, count, first, last)
+
+        state_labels = dict(Notification._fields['postal_state']._description_selection(self.env))
+        return {
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'event_types': self.env['mail.postal.event']._fields['event_type']._description_selection(self.env),
+            'recipients': [{
+                'notification_id': notification.id,
+                'name': notification.res_partner_id.name or notification.mail_email_address or '',
+                'email': notification.res_partner_id.email or notification.mail_email_address or '',
+                'postal_state': notification.postal_state or 'none',
+                'postal_state_label': state_labels.get(notification.postal_state or 'none'),
+                'events': {
+                    event_type: {
+                        'count': entry['count'],
+                        'first': fields.Datetime.to_string(entry['first']),
+                        'last': fields.Datetime.to_string(entry['last']),
+                    }
+                    for event_type, entry in stats.get(notification.id, {}).items()
+                },
+            } for notification in notifications],
+        }
+
+    def _postal_notify_timeline_changes(self):
+        """Tell clients at commit time that the timelines of these messages changed.
+
+        Message ids are accumulated during the transaction and sent once, so
+        clients drop their cached timelines without being flooded.
+        """
+        pending = self.env.cr.precommit.data.setdefault('dr_postal.bus_timeline_message_ids', set())
+        if not pending:
+            self.env.cr.precommit.add(self._postal_send_timeline_invalidation)
+        pending.update(self.ids)
+
+    def _postal_send_timeline_invalidation(self):
+        """Send the invalidation to the internal authors and followers of the threads.
+
+        Other users viewing the message rely on the expiry of the client cache.
+        """
+        message_ids = self.env.cr.precommit.data.pop('dr_postal.bus_timeline_message_ids', set())
+        messages = self.sudo().browse(message_ids).exists()
+        for partner, partner_messages in messages._postal_get_internal_watchers().items():
+            partner._bus_send('dr_postal.timeline/invalidate', {'message_ids': partner_messages.ids})
+
+    def _postal_get_internal_watchers(self):
+        """Map the internal partners watching these messages to their messages.
+
+        Watchers are the authors of the messages and the followers of their
+        threads, restricted to partners of internal users.
+        """
+        partner_messages = defaultdict(lambda: self.browse())
+        for (model, res_id), thread_messages in self.grouped(lambda m: (m.model, m.res_id)).items():
+            partners = thread_messages.author_id
+            if model in self.env and res_id and 'message_partner_ids' in self.env[model]._fields:
+                partners |= self.env[model].sudo().browse(res_id).exists().message_partner_ids
+            for partner in partners:
+                partner_messages[partner] |= thread_messages
+        return {
+            partner: partner_messages
+            for partner, partner_messages in partner_messages.items()
+            if any(not user.share for user in partner.with_context(active_test=False).user_ids)
+        }
+
+
+class MailPostalSummaryDelta(models.Model):
+    """Pending change of the postal summary of a message.
+
+    Appended for each notification changing postal state, and folded into
+    the counters of the message by ``mail.message._cron_fold_postal_summaries``.
+    """
+
+    _name = 'mail.postal.summary.delta'
+    _description = 'Postal Message Summary Delta'
+    _log_access = False
+
+    message_id = fields.Many2one('mail.message', string='Message', required=True, ondelete='cascade', index=True)
+    state = fields.Char(string='Postal Status', required=True)
+    delta = fields.Integer(string='Delta', required=True)
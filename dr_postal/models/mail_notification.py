@@ -1,7 +1,56 @@
 # -*- coding: utf-8 -*-
 
+import logging
 import uuid
+from collections import defaultdict
+from datetime import timedelta
+
 from odoo import api, fields, models, _
+from odoo.tools import SQL, email_normalize
+
+from odoo.addons.dr_postal.tools.postal_api import PostalAPIClient
+
+_logger = logging.getLogger(__name__)
+
+
+# Map Postal delivery statuses to the webhook events reporting them
+POSTAL_DELIVERY_EVENTS = {
+    'Sent': 'MessageSent',
+    'SoftFail': 'MessageDelayed',
+    'HardFail': 'MessageDeliveryFailed',
+    'Held': 'MessageHeld',
+    'Bounced': 'MessageBounced',
+}
+
+POSTAL_STATE_RANK = {'none': 0, 'sent': 1, 'delivered': 2, 'opened': 3, 'bounced': 99}
+
+# Fields whose changes move a notification within the message summaries
+POSTAL_SUMMARY_DEPENDENCIES = {'postal_state', 'mail_message_id', 'notification_type'}
+
+
+def _postal_summary_transitions(before, after):
+    """Return the summary transitions between two ``_postal_summary_keys``."""
+    transitions = []
+    for notification_id in before.keys() | after.keys():
+        old, new = before.get(notification_id), after.get(notification_id)
+        if old == new:
+            continue
+        if old and new and old[0] == new[0]:
+            transitions.append((old[0], old[1], new[1]))
+            continue
+        if old:
+            transitions.append((old[0], old[1], None))
+        if new:
+            transitions.append((new[0], None, new[1]))
+    return transitions
+
+
+def _postal_state_rank_sql(column):
+    """SQL expression giving the rank of the postal state held in ``column``."""
+    cases = SQL(' ').join(
+        SQL('WHEN %s THEN %s', state, rank) for state, rank in POSTAL_STATE_RANK.items()
+    )
+    return SQL("(CASE COALESCE(%s, 'none') %s END)", SQL(column), cases)
 
 
 class MailNotification(models.Model):
@@ -25,17 +74,189 @@ class MailNotification(models.Model):
         'mail.postal.event',
         string='Last Postal Event',
         ondelete='set null',
+        index='btree_not_null',
     )
+    postal_reset_date = fields.Datetime(
+        string='Postal Status Reset On',
+        readonly=True,
+        copy=False,
+        help='Last time the postal status was reset, e.g. when resending; earlier events no longer apply',
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Assign tracking UUIDs to email notifications upon creation."""
+        for vals in vals_list:
+            if vals.get('notification_type') == 'email' and not vals.get('postal_tracking_uuid'):
+                vals['postal_tracking_uuid'] = self._generate_tracking_uuid()
+        notifications = super().create(vals_list)
+        self.env['mail.message']._postal_apply_state_transitions(
+            _postal_summary_transitions({}, notifications._postal_summary_keys())
+        )
+        return notifications
+
+    def write(self, vals):
+        """Keep the postal summaries of the messages in sync, and date resets."""
+        if 'postal_state' in vals and vals['postal_state'] in (False, 'none'):
+            vals = dict(vals, postal_reset_date=fields.Datetime.now())
+        if not POSTAL_SUMMARY_DEPENDENCIES.intersection(vals):
+            return super().write(vals)
+        before = self._postal_summary_keys()
+        res = super().write(vals)
+        self.env['mail.message']._postal_apply_state_transitions(
+            _postal_summary_transitions(before, self._postal_summary_keys())
+        )
+        return res
+
+    def unlink(self):
+        before = self._postal_summary_keys()
+        res = super().unlink()
+        self.env['mail.message']._postal_apply_state_transitions(_postal_summary_transitions(before, {}))
+        return res
+
+    def _postal_summary_keys(self):
+        """Return ``{id: (message_id, postal_state)}`` of the notifications counted in summaries."""
+        return {
+            notification.id: (notification.mail_message_id.id, notification.postal_state or 'none')
+            for notification in self
+            if notification.notification_type == 'email' and notification.mail_message_id
+        }
 
     def _to_store_defaults(self, target):
         """Add postal_state to the data sent to frontend."""
         defaults = super()._to_store_defaults(target)
         return defaults + ["postal_state"]
 
+    def _filtered_for_web_client(self):
+        """Only ship one email notification per message tracked by Postal.
+
+        Ticks are rendered from the summary and the recipients are fetched
+        when the popover opens, so messages sent to thousands of followers
+        do not load every notification. Messages Postal never reported on
+        keep all their notifications, and failures are always kept for the
+        resend UI.
+        """
+        notifications = super()._filtered_for_web_client()
+        summarized = notifications.filtered(
+            lambda n: n.notification_type == 'email' and n.mail_message_id._postal_is_tracked()
+        )
+        kept = notifications - summarized
+        for message_notifications in summarized.grouped('mail_message_id').values():
+            kept |= message_notifications.sorted('id')[:1]
+            kept |= message_notifications.filtered(lambda n: n.notification_status in ('bounce', 'exception'))
+        return notifications & kept
+
     def _generate_tracking_uuid(self):
         """Generate a new tracking UUID for this notification."""
         return str(uuid.uuid4())
 
+    def _assign_postal_tracking_uuids(self):
+        """Give a tracking UUID to the notifications lacking one, in one query."""
+        if not self:
+            return
+        self.flush_recordset(['postal_tracking_uuid'])
+        self.env.cr.execute(SQL(
+            """UPDATE mail_notification
+                  SET postal_tracking_uuid = gen_random_uuid()::varchar
+                WHERE id = ANY(%s) AND postal_tracking_uuid IS NULL""",
+            self.ids,
+        ))
+        self.invalidate_recordset(['postal_tracking_uuid'])
+
+    @api.model
+    def _postal_resolve_notifications(self, keys):
+        """Resolve many Postal events to notifications in one SQL query.
+
+        :param keys: list of ``(message_id, recipient, tracking_uuid,
+            postal_message_id, postal_token)`` tuples; any element may be
+            empty.
+        :return: list of ``mail.notification`` records (possibly empty),
+            aligned with ``keys``.
+
+        Matching priority for each key:
+
+        0. notification recorded for the Postal message id and token;
+        1. notification carrying the tracking UUID;
+        2. email notification of the message whose recipient matches;
+        3. email notification of the message, when no recipient is known;
+        4. the only email notification of the message.
+
+        Keys found in ``mail.postal.message.map`` skip the other rules
+        entirely. Keys resolved by the other rules are added to the mapping,
+        so that later events of the same Postal message take the fast path.
+
+        Message-IDs are compared in their canonical form (see
+        ``mail.message._postal_normalize_message_id``), so bracketed and
+        bare ids both hit the same expression index.
+        """
+        if not keys:
+            return []
+        self.flush_model(['postal_tracking_uuid', 'mail_message_id', 'notification_type',
+                          'res_partner_id', 'mail_email_address'])
+        self.env['mail.message'].flush_model(['message_id'])
+        self.env['res.partner'].flush_model(['email_normalized'])
+        normalize = self.env['mail.message']._postal_normalize_message_id
+        keys = [
+            (normalize(message_id) or None, email_normalize(recipient or '') or None,
+             tracking_uuid or None, postal_message_id or None, postal_token or '')
+            for message_id, recipient, tracking_uuid, postal_message_id, postal_token in keys
+        ]
+        values = SQL(', ').join(
+            SQL('(%s, %s::varchar, %s::varchar, %s::varchar, %s::integer, %s::varchar)', index, *key)
+            for index, key in enumerate(keys)
+        )
+        self.env.cr.execute(SQL(
+            """
+            WITH keys (idx, message_key, recipient, tracking_uuid, postal_message_id, postal_token) AS (VALUES %s),
+            by_postal AS (
+                SELECT k.idx, map.notification_id AS id, 0 AS priority
+                  FROM keys k
+                  JOIN mail_postal_message_map map ON map.postal_message_id = k.postal_message_id
+                                                  AND map.postal_token = k.postal_token
+            ),
+            unmapped AS (
+                SELECT * FROM keys WHERE idx NOT IN (SELECT idx FROM by_postal)
+            ),
+            by_uuid AS (
+                SELECT k.idx, n.id, 1 AS priority
+                  FROM unmapped k
+                  JOIN mail_notification n ON n.postal_tracking_uuid = k.tracking_uuid
+            ),
+            by_message AS (
+                SELECT k.idx, n.id,
+                       CASE WHEN k.recipient IS NOT NULL
+                                 AND k.recipient = COALESCE(p.email_normalized, lower(n.mail_email_address)) THEN 2
+                            WHEN k.recipient IS NULL THEN 3
+                            WHEN COUNT(*) OVER (PARTITION BY k.idx) = 1 THEN 4
+                       END AS priority
+                  FROM unmapped k
+                  JOIN mail_message m ON btrim(m.message_id, '<> ') = k.message_key
+                  JOIN mail_notification n ON n.mail_message_id = m.id AND n.notification_type = 'email'
+             LEFT JOIN res_partner p ON p.id = n.res_partner_id
+            )
+            SELECT DISTINCT ON (c.idx) c.idx, c.id, c.priority, n.mail_message_id
+              FROM (SELECT * FROM by_postal UNION ALL SELECT * FROM by_uuid UNION ALL SELECT * FROM by_message) c
+              JOIN mail_notification n ON n.id = c.id
+             WHERE c.priority IS NOT NULL
+          ORDER BY c.idx, c.priority, c.id
+            """,
+            values,
+        ))
+        matches = {}
+        new_mappings = []
+        for index, notification_id, priority, message_id in self.env.cr.fetchall():
+            matches[index] = notification_id
+            message_key, __, __, postal_message_id, postal_token = keys[index]
+            if priority and postal_message_id:
+                new_mappings.append((postal_message_id, postal_token, message_key, notification_id, message_id))
+        self.env['mail.postal.message.map']._postal_record_mappings(new_mappings)
+        # share the prefetch set so that later reads load all matches at once
+        prefetch_ids = list(matches.values())
+        return [
+            self.browse(matches.get(index, ())).with_prefetch(prefetch_ids)
+            for index in range(len(keys))
+        ]
+
     def _update_postal_state(self, event_type, event_record):
         """
         Update the postal state based on incoming event.
@@ -45,37 +266,295 @@ class MailNotification(models.Model):
         
         For bounced emails, also updates Odoo's notification_status to 'bounce'
         to trigger the built-in bounce handling UI (envelope icon with retry options).
+
+        Returns whether the state was updated.
         """
         self.ensure_one()
-        
-        state_order = {'none': 0, 'sent': 1, 'delivered': 2, 'opened': 3, 'bounced': 99}
-        
-        current_order = state_order.get(self.postal_state, 0)
-        new_order = state_order.get(event_type, 0)
-        
-        if new_order > current_order or event_type == 'bounced':
-            vals = {
-                'postal_state': event_type,
-                'postal_last_event_id': event_record.id,
-            }
-            
-            # For bounced emails, trigger Odoo's built-in bounce handling
+        return bool(self._postal_update_states([(self.id, event_type, event_record)]))
+
+    def _postal_update_states(self, updates):
+        """Apply many postal state transitions with one guarded UPDATE per state.
+
+        :param updates: list of ``(notification_id, event_type, event)``
+        :return: dict mapping each applied ``(notification_id, event_type)``
+            to the event recorded as the notification's last event
+
+        The ``WHERE`` clause compares state ranks in SQL, so a notification
+        never goes back to an earlier state, and rows that would not change
+        are neither written nor locked: a burst of opens on an already opened
+        notification does not conflict with anything. Bounces always apply,
+        to record the latest failure reason.
+        """
+        # keep the latest event per (notification, state)
+        latest = {}
+        for notification_id, event_type, event in updates:
+            key = (notification_id, event_type)
+            if event_type not in POSTAL_STATE_RANK or event_type == 'none':
+                continue
+            if key not in latest or (event.event_datetime, event.id) > (latest[key].event_datetime, latest[key].id):
+                latest[key] = event
+        if not latest:
+            return {}
+
+        fnames = ['postal_state', 'postal_last_event_id', 'notification_status', 'failure_type', 'failure_reason']
+        self.flush_model(fnames)
+        applied = {}
+        transitions = []
+        for event_type in sorted({key[1] for key in latest}, key=POSTAL_STATE_RANK.get):
+            # sorted by id so that concurrent transactions lock rows in the same order
+            rows = sorted(
+                (notification_id, event.id, event.error_message or _('Email bounced (reported by Postal)'))
+                for (notification_id, state), event in latest.items() if state == event_type
+            )
+            values = SQL(', ').join(SQL('(%s, %s, %s)', *row) for row in rows)
             if event_type == 'bounced':
-                vals['notification_status'] = 'bounce'
-                vals['failure_type'] = 'mail_bounce'
-                vals['failure_reason'] = event_record.error_message or _('Email bounced (reported by Postal)')
-            
-            self.write(vals)
+                # For bounced emails, trigger Odoo's built-in bounce handling
+                query = SQL(
+                    """UPDATE mail_notification n
+                          SET postal_state = 'bounced',
+                              postal_last_event_id = v.event_id,
+                              notification_status = 'bounce',
+                              failure_type = 'mail_bounce',
+                              failure_reason = v.reason
+                         FROM (VALUES %s) AS v(id, event_id, reason), mail_notification old
+                        WHERE n.id = v.id AND old.id = n.id
+                    RETURNING n.id, n.mail_message_id, n.notification_type, COALESCE(old.postal_state, 'none')""",
+                    values,
+                )
+            else:
+                query = SQL(
+                    """UPDATE mail_notification n
+                          SET postal_state = %s,
+                              postal_last_event_id = v.event_id
+                         FROM (VALUES %s) AS v(id, event_id, reason), mail_notification old
+                        WHERE n.id = v.id AND old.id = n.id
+                          AND %s < %s
+                    RETURNING n.id, n.mail_message_id, n.notification_type, COALESCE(old.postal_state, 'none')""",
+                    event_type, values, _postal_state_rank_sql('n.postal_state'), POSTAL_STATE_RANK[event_type],
+                )
+            self.env.cr.execute(query)
+            for notification_id, message_id, notification_type, old_state in self.env.cr.fetchall():
+                applied[notification_id, event_type] = latest[notification_id, event_type]
+                if notification_type == 'email':
+                    transitions.append((message_id, old_state, event_type))
+
+        if applied:
+            self.browse({notification_id for notification_id, __ in applied})._postal_state_changed(fnames)
+            self.env['mail.message']._postal_apply_state_transitions(transitions)
+        return applied
+
+    def _postal_recompute_states(self):
+        """Derive the postal state of these notifications from their events.
+
+        Used when events are moved away from a notification: its state
+        becomes the highest one among its remaining events, or ``sent`` /
+        ``none`` depending on the mail status when none are left, and a
+        bounce status set by Postal is lifted without a bounce event. Events
+        older than the last reset of the notification are ignored.
+        """
+        if not self:
+            return
+        fnames = ['postal_state', 'postal_last_event_id', 'notification_status', 'failure_type', 'failure_reason']
+        self.flush_recordset(fnames + ['postal_reset_date'])
+        self.env['mail.postal.event'].flush_model(['notification_id', 'event_type', 'event_datetime'])
+        self.env.cr.execute(SQL(
+            """UPDATE mail_notification n
+                  SET postal_state = COALESCE(
+                          best.event_type,
+                          CASE WHEN n.notification_status IN ('sent', 'bounce') THEN 'sent' ELSE 'none' END
+                      ),
+                      postal_last_event_id = best.id,
+                      notification_status = CASE WHEN bounce.lifted THEN 'sent' ELSE n.notification_status END,
+                      failure_type = CASE WHEN bounce.lifted THEN NULL ELSE n.failure_type END,
+                      failure_reason = CASE WHEN bounce.lifted THEN NULL ELSE n.failure_reason END
+                 FROM mail_notification src
+            LEFT JOIN LATERAL (
+                    SELECT e.id, e.event_type
+                      FROM mail_postal_event e
+                     WHERE e.notification_id = src.id
+                       AND (src.postal_reset_date IS NULL OR e.event_datetime >= src.postal_reset_date)
+                  ORDER BY %s DESC, e.event_datetime DESC, e.id DESC
+                     LIMIT 1
+                 ) best ON TRUE,
+                      LATERAL (
+                    SELECT src.notification_status = 'bounce' AND src.failure_type = 'mail_bounce'
+                           AND best.event_type IS DISTINCT FROM 'bounced' AS lifted
+                 ) bounce
+                WHERE n.id = src.id AND src.id = ANY(%s)
+            RETURNING n.mail_message_id, n.notification_type, COALESCE(src.postal_state, 'none'), n.postal_state""",
+            _postal_state_rank_sql('e.event_type'), self.ids,
+        ))
+        transitions = [
+            (message_id, old_state, new_state)
+            for message_id, notification_type, old_state, new_state in self.env.cr.fetchall()
+            if notification_type == 'email'
+        ]
+        self._postal_state_changed(fnames)
+        self.env['mail.message']._postal_apply_state_transitions(transitions)
+
+    def _postal_state_changed(self, fnames):
+        """Refresh the cache after SQL updates of ``fnames`` and notify clients."""
+        self.invalidate_recordset(fnames)
+        self.modified(fnames)
+        self._postal_notify_state_changes()
+
+    def _postal_notify_state_changes(self):
+        """Schedule a bus update of these notifications at commit time.
+
+        Notifications changed during the transaction are accumulated and sent
+        once, so a burst of events results in a single compact store update
+        per internal user watching the messages.
+        """
+        pending = self.env.cr.precommit.data.setdefault('dr_postal.bus_notification_ids', set())
+        if not pending:
+            self.env.cr.precommit.add(self._postal_send_bus_updates)
+        pending.update(self.ids)
+
+    def _postal_send_bus_updates(self):
+        """Push the changed notifications to the internal authors and followers of their threads."""
+        notification_ids = self.env.cr.precommit.data.pop('dr_postal.bus_notification_ids', set())
+        notifications = self.sudo().browse(notification_ids).exists()
+        for partner, messages in notifications.mail_message_id._postal_get_internal_watchers().items():
+            partner._bus_send('mail.record/insert', {
+                'mail.message': [{'id': message.id, 'postal_summary': message.postal_summary} for message in messages],
+                'mail.notification': [{
+                    'id': notification.id,
+                    'postal_state': notification.postal_state,
+                    'notification_status': notification.notification_status,
+                    'failure_type': notification.failure_type,
+                } for notification in notifications if notification.mail_message_id in messages],
+            })
+
+    # ------------------------------------------------------------
+    # RECONCILIATION
+    # ------------------------------------------------------------
+
+    @api.model
+    def _cron_postal_reconcile_states(self):
+        """Pull from Postal the failed deliveries lost by webhooks.
+
+        Webhooks given up by Postal while Odoo was unreachable are lost; this
+        fetches the delivery attempts of notifications still ``sent`` after
+        ``dr_postal.reconcile_after_hours``. ``sent`` is also where delivered
+        emails rest, as no delivery maps to ``delivered``, so only deliveries
+        that move the notification (failures) are fed to the webhook
+        pipeline, and only when no event of that type is stored for the
+        notification yet. Only messages whose Postal id is known (see
+        ``mail.postal.message.map``) can be looked up. Each message is checked
+        at most once per period, and only within
+        ``dr_postal.reconcile_max_age_days`` of its sending.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        api_url = ICP.get_param('dr_postal.api_url', '')
+        api_key = ICP.get_param('dr_postal.api_key', '')
+        if not api_url or not api_key:
+            return
+        batch_size = int(ICP.get_param('dr_postal.reconcile_batch_size', 200))
+        now = fields.Datetime.now()
+        stuck_before = now - timedelta(hours=int(ICP.get_param('dr_postal.reconcile_after_hours', 24)))
+        oldest = now - timedelta(days=int(ICP.get_param('dr_postal.reconcile_max_age_days', 7)))
+        self.env['mail.postal.message.map'].flush_model()
+        self.env['mail.message'].flush_model(['date'])
+        self.flush_model(['postal_state'])
+
+        with PostalAPIClient(
+            api_url, api_key,
+            concurrency=int(ICP.get_param('dr_postal.reconcile_concurrency', 4)),
+        ) as client:
+            while True:
+                self.env.cr.execute(SQL(
+                    """SELECT map.id, map.postal_message_id, map.postal_token, map.message_key,
+                              n.id, n.postal_state
+                         FROM mail_postal_message_map map
+                         JOIN mail_notification n ON n.id = map.notification_id
+                         JOIN mail_message m ON m.id = n.mail_message_id
+                        WHERE n.postal_state = 'sent'
+                          AND m.date BETWEEN %s AND %s
+                          AND (map.reconcile_date IS NULL OR map.reconcile_date < %s)
+                     ORDER BY map.id
+                        LIMIT %s
+                   FOR UPDATE OF map SKIP LOCKED""",
+                    oldest, stuck_before, stuck_before, batch_size,
+                ))
+                rows = self.env.cr.fetchall()
+                if not rows:
+                    break
+                deliveries = client.get_many_deliveries(row[1] for row in rows)
+                stored = self._postal_stored_event_types([row[4] for row in rows])
+                Event = self.env['mail.postal.event'].sudo()
+                envelopes = []
+                for __, postal_message_id, postal_token, message_key, notification_id, postal_state in rows:
+                    for envelope in self._postal_delivery_envelopes(
+                        postal_message_id, postal_token, message_key, deliveries.get(postal_message_id) or [],
+                    ):
+                        event_type = Event._parse_postal_payload(envelope)['event_type']
+                        if event_type in stored[notification_id]:
+                            continue
+                        if event_type != 'bounced' and POSTAL_STATE_RANK[event_type] <= POSTAL_STATE_RANK[postal_state]:
+                            continue
+                        stored[notification_id].add(event_type)
+                        envelopes.append(envelope)
+                if envelopes:
+                    Event._process_postal_events(envelopes)
+                self.env.cr.execute(SQL(
+                    "UPDATE mail_postal_message_map SET reconcile_date = %s WHERE id = ANY(%s)",
+                    now, [row[0] for row in rows],
+                ))
+                self.env['mail.postal.message.map'].invalidate_model(['reconcile_date'])
+                _logger.info('Postal reconciliation: %s messages checked, %s deliveries found', len(rows), len(envelopes))
+                if not self.env['ir.cron']._commit_progress(len(rows)):
+                    break
+
+    @api.model
+    def _postal_stored_event_types(self, notification_ids):
+        """Return the event types stored for each notification, as sets."""
+        stored = defaultdict(set)
+        self.env['mail.postal.event'].flush_model(['notification_id', 'event_type'])
+        self.env.cr.execute(SQL(
+            """SELECT DISTINCT notification_id, event_type
+                 FROM mail_postal_event
+                WHERE notification_id = ANY(%s)""",
+            list(notification_ids),
+        ))
+        for notification_id, event_type in self.env.cr.fetchall():
+            stored[notification_id].add(event_type)
+        return stored
+
+    @api.model
+    def _postal_delivery_envelopes(self, postal_message_id, postal_token, message_key, deliveries):
+        """Build the webhook envelopes reporting Postal delivery attempts.
+
+        Envelope uuids derive from the delivery ids: they never match the
+        uuids of the webhooks Postal sent for the same deliveries, so callers
+        skip the deliveries already stored themselves. They do make feeding
+        the same delivery twice a duplicate for the pipeline.
+        """
+        message_data = {'id': postal_message_id, 'token': postal_token, 'message_id': message_key or ''}
+        envelopes = []
+        for delivery in deliveries:
+            event_name = POSTAL_DELIVERY_EVENTS.get(delivery.get('status'))
+            if not event_name:
+                continue
+            if event_name == 'MessageBounced':
+                payload = {'original_message': message_data, 'bounce': {}}
+            else:
+                payload = {
+                    'message': message_data,
+                    'status': delivery.get('status'),
+                    'details': delivery.get('details') or '',
+                    'output': delivery.get('output') or '',
+                }
+            envelopes.append({
+                'event': event_name,
+                'timestamp': delivery.get('timestamp'),
+                'uuid': f"postal-delivery-{postal_message_id}-{delivery.get('id')}",
+                'payload': payload,
+            })
+        return envelopes
 
     def action_open_postal_events(self):
         """Open a popup showing all postal events for this notification."""
         self.ensure_one()
-        
-        # Get all events for this notification
-        events = self.env['mail.postal.event'].search([
-            ('notification_id', '=', self.id)
-        ])
-        
         return {
             'name': _('Email Tracking: %s') % (self.res_partner_id.name or self.mail_email_address or _('Unknown')),
             'type': 'ir.actions.act_window',
@@ -1,6 +1,44 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+import base64
+import csv
+import io
+import json
+import logging
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from cryptography.hazmat.primitives import serialization
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL, email_normalize, frozendict
+
+from odoo.addons.dr_postal.models.mail_notification import _postal_state_rank_sql
+from odoo.addons.dr_postal.tools.metrics import METRICS
+from odoo.addons.dr_postal.tools.smtp import SMTP_CATEGORIES, parse_smtp_error
+
+_logger = logging.getLogger(__name__)
+
+# Map Postal event names to our states
+POSTAL_EVENT_MAPPING = {
+    'MessageSent': 'sent',
+    'MessageDelayed': 'sent',
+    'MessageDeliveryFailed': 'bounced',
+    'MessageHeld': 'sent',
+    'MessageBounced': 'bounced',
+    'MessageLinkClicked': 'opened',
+    'MessageLoaded': 'opened',
+}
+
+# Columns of the streaming export, in this order; 'payload' only on demand
+POSTAL_EXPORT_COLUMNS = (
+    'id', 'event_datetime', 'event_type', 'recipient', 'recipient_normalized', 'recipient_domain',
+    'external_message_id', 'message_id', 'notification_id', 'postal_uuid', 'postal_tracking_uuid',
+    'smtp_code', 'smtp_category', 'error_message', 'payload_size', 'payload',
+)
 
 
 class MailPostalEvent(models.Model):
@@ -30,8 +68,28 @@ class MailPostalEvent(models.Model):
     )
     payload_json = fields.Text(
         string='Raw Payload',
+        compute='_compute_payload_json',
+        inverse='_inverse_payload_json',
+        exportable=False,
         help='Original JSON payload from postal webhook',
     )
+    payload_data = fields.Binary(
+        string='Compressed Payload',
+        attachment=False,
+        prefetch=False,
+        exportable=False,
+        help='Minified, zlib-compressed payload stored in the database',
+    )
+    payload_file = fields.Binary(
+        string='Offloaded Payload',
+        attachment=True,
+        exportable=False,
+        help='Minified, zlib-compressed payload offloaded to the filestore',
+    )
+    payload_size = fields.Integer(
+        string='Payload Size',
+        help='Size in bytes of the minified payload',
+    )
     external_message_id = fields.Char(
         string='External Message ID',
         index=True,
@@ -41,10 +99,37 @@ class MailPostalEvent(models.Model):
         string='Recipient',
         help='Email recipient address',
     )
+    recipient_normalized = fields.Char(
+        string='Recipient Address',
+        compute='_compute_recipient_keys',
+        store=True,
+        index='trigram',
+        help='Lowercased recipient address',
+    )
+    recipient_domain = fields.Char(
+        string='Recipient Domain',
+        compute='_compute_recipient_keys',
+        store=True,
+        index=True,
+    )
     error_message = fields.Text(
         string='Error Message',
+        index='trigram',
         help='Error details for bounced emails',
     )
+    smtp_code = fields.Char(
+        string='SMTP Code',
+        compute='_compute_smtp_failure',
+        store=True,
+        help='Enhanced status code (e.g. 5.1.1) or reply code (e.g. 550) of the failure',
+    )
+    smtp_category = fields.Selection(
+        SMTP_CATEGORIES,
+        string='Failure Category',
+        compute='_compute_smtp_failure',
+        store=True,
+        index=True,
+    )
     message_id = fields.Many2one(
         'mail.message',
         string='Mail Message',
@@ -55,18 +140,806 @@ class MailPostalEvent(models.Model):
         'mail.notification',
         string='Notification',
         ondelete='set null',
-        index=True,
     )
     postal_tracking_uuid = fields.Char(
         string='Tracking UUID',
         index=True,
         help='Odoo-generated tracking UUID',
     )
+    postal_uuid = fields.Char(
+        string='Postal Event UUID',
+        copy=False,
+        help='UUID of the webhook envelope, identical across Postal retries',
+    )
+
+    _postal_uuid_uniq = models.UniqueIndex('(postal_uuid) WHERE postal_uuid IS NOT NULL')
+    # also serves lookups on notification_id alone
+    _notification_datetime_idx = models.Index('(notification_id, event_datetime)')
 
     @api.depends('event_type', 'recipient', 'event_datetime')
     def _compute_name(self):
         for event in self:
-            event_label = dict(self._fields['event_type'].selection).get(event.event_type, event.event_type)
-            recipient = event.recipient or _('Unknown')
-            event.name = f"{event_label}: {recipient}"
+            event.name = self._postal_event_name(event.event_type, event.recipient)
+
+    @api.depends('recipient')
+    def _compute_recipient_keys(self):
+        for event in self:
+            event.update(self._postal_recipient_keys(event.recipient))
+
+    @api.depends('error_message')
+    def _compute_smtp_failure(self):
+        for event in self:
+            event.smtp_code, event.smtp_category = parse_smtp_error(event.error_message)
+
+    @api.model
+    def _postal_recipient_keys(self, recipient):
+        """Return the normalized address and domain of a recipient."""
+        address = email_normalize(recipient or '') or (recipient or '').strip().lower() or False
+        return {
+            'recipient_normalized': address,
+            'recipient_domain': address and address.rpartition('@')[2] or False,
+        }
+
+    @api.model
+    def _postal_event_name(self, event_type, recipient):
+        event_label = dict(self._fields['event_type'].selection).get(event_type, event_type)
+        return f"{event_label}: {recipient or _('Unknown')}"
+
+    @api.depends('payload_data', 'payload_file')
+    def _compute_payload_json(self):
+        for event in self:
+            # payload_file would otherwise be read as its size in list views
+            event_sudo = event.sudo().with_context(bin_size=False)
+            event.payload_json = self._postal_decode_payload(event_sudo.payload_data or event_sudo.payload_file)
+
+    def _inverse_payload_json(self):
+        for event in self:
+            raw = event.payload_json or ''
+            try:
+                raw = json.loads(raw) if raw else None
+            except ValueError:
+                pass
+            vals = self._postal_encode_payload(raw) if raw else {'payload_size': 0}
+            vals.setdefault('payload_data', False)
+            vals.setdefault('payload_file', False)
+            event.write(vals)
+
+    # ------------------------------------------------------------
+    # PAYLOAD STORAGE
+    # ------------------------------------------------------------
+
+    @api.model
+    def _postal_encode_payload(self, data):
+        """Return the values storing ``data`` minified and compressed.
+
+        Payloads whose compressed size exceeds the configured offload
+        threshold (in bytes, 0 to disable) go to the filestore through
+        ``payload_file``; all others are kept inline in ``payload_data``.
+        Strings are stored as is, anything else is serialized to JSON.
+        """
+        if isinstance(data, str):
+            raw = data.encode()
+        else:
+            raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+        compressed = base64.b64encode(zlib.compress(raw))
+        threshold = int(self.env['ir.config_parameter'].sudo().get_param(
+            'dr_postal.payload_offload_threshold', 0
+        ))
+        field_name = 'payload_file' if threshold and len(compressed) > threshold else 'payload_data'
+        return {field_name: compressed, 'payload_size': len(raw)}
+
+    @api.model
+    def _postal_decode_payload(self, blob):
+        """Return the pretty-printed payload stored in ``blob``."""
+        if not blob:
+            return False
+        try:
+            raw = zlib.decompress(base64.b64decode(blob)).decode()
+        except (ValueError, zlib.error):
+            _logger.warning('Postal event: Unable to decode stored payload')
+            return False
+        try:
+            return json.dumps(json.loads(raw), indent=2, ensure_ascii=False)
+        except ValueError:
+            return raw
+
+    # ------------------------------------------------------------
+    # WEBHOOK CONFIGURATION
+    # ------------------------------------------------------------
+
+    @api.model
+    @tools.ormcache()
+    def _postal_get_webhook_config(self):
+        """Return the webhook settings needed on every request.
+
+        Cached per worker; the cache is cleared whenever a system parameter
+        changes, so updating the settings takes effect on all workers. The
+        Postal public key is parsed once here; it is None when signatures are
+        not verified or when the configured key is invalid.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        verify_signature = bool(ICP.get_param('dr_postal.webhook_verify_signature'))
+        public_key = None
+        key_text = ICP.get_param('dr_postal.webhook_public_key', '').strip()
+        if verify_signature and key_text:
+            try:
+                if 'BEGIN' in key_text:
+                    public_key = serialization.load_pem_public_key(key_text.encode())
+                else:
+                    # DNS record format: base64 DER, possibly with the "p=" prefix
+                    key_text = key_text.removeprefix('p=').rstrip(';')
+                    public_key = serialization.load_der_public_key(base64.b64decode(key_text))
+            except ValueError:
+                _logger.error('Postal webhook: Invalid public key configured, all webhooks will be rejected')
+        return frozendict({
+            'token': ICP.get_param('dr_postal.webhook_token', ''),
+            'async': bool(ICP.get_param('dr_postal.webhook_async')),
+            'verify_signature': verify_signature,
+            'public_key': public_key,
+            'metrics_token': ICP.get_param('dr_postal.metrics_token', ''),
+            'log_sample_rate': float(ICP.get_param('dr_postal.log_sample_rate', 0.01)),
+            'max_concurrency': int(ICP.get_param('dr_postal.webhook_max_concurrency', 0)),
+            'rate_limit': float(ICP.get_param('dr_postal.webhook_rate_limit', 0)),
+            'max_backlog': int(ICP.get_param('dr_postal.webhook_max_backlog', 0)),
+            'retry_after': int(ICP.get_param('dr_postal.webhook_retry_after', 30)),
+            'coalesce_opens': bool(ICP.get_param('dr_postal.coalesce_opens')),
+            'open_sample_rate': float(ICP.get_param('dr_postal.open_sample_rate', 0.0)),
+        })
+
+    # ------------------------------------------------------------
+    # WEBHOOK PROCESSING
+    # ------------------------------------------------------------
+
+    @api.model
+    def _parse_postal_payload(self, data):
+        """Extract the values we need from a Postal webhook envelope.
+
+        Postal wraps events: {event, timestamp, uuid, payload}. Returns a
+        dict of parsed values, with ``event_type`` set to False for unknown
+        event names.
+        """
+        event_name = data.get('event', '')
+        payload = data.get('payload') or {}
+        event_type = POSTAL_EVENT_MAPPING.get(event_name, False)
+
+        # For most events, message info is in payload.message
+        # For bounce events, it's in payload.original_message
+        if event_name == 'MessageBounced':
+            message_data = payload.get('original_message') or {}
+        else:
+            message_data = payload.get('message') or {}
+
+        timestamp = data.get('timestamp') or payload.get('timestamp', 0)
+        # naive UTC, like every datetime stored by the ORM
+        event_datetime = fields.Datetime.now()
+        if timestamp:
+            try:
+                event_datetime = datetime.fromtimestamp(float(timestamp), tz=timezone.utc).replace(tzinfo=None)
+            except (ValueError, TypeError, OSError):
+                pass
+
+        try:
+            postal_message_id = int(message_data.get('id') or 0)
+        except (ValueError, TypeError):
+            postal_message_id = 0
+
+        # Build error message for failures
+        error_message = ''
+        if event_type == 'bounced':
+            if event_name == 'MessageBounced':
+                bounce_info = payload.get('bounce') or {}
+                error_message = f"Bounce from: {bounce_info.get('from', 'unknown')}\nSubject: {bounce_info.get('subject', 'N/A')}"
+            else:
+                error_message = payload.get('details', '')
+                if payload.get('output'):
+                    error_message += f"\n\nServer response: {payload.get('output', '')}"
+
+        return {
+            'uuid': str(data.get('uuid') or '') or False,
+            'event_name': event_name,
+            'event_type': event_type,
+            'message_data': message_data,
+            'external_message_id': message_data.get('message_id', ''),
+            'postal_message_id': postal_message_id,
+            'postal_token': str(message_data.get('token') or ''),
+            'recipient': message_data.get('to', ''),
+            'event_datetime': event_datetime,
+            'error_message': error_message,
+        }
+
+    @api.model
+    def _postal_log_event(self, parsed, outcome, event=None):
+        """Count the event in the metrics and log a sample of events.
+
+        Only a ``dr_postal.log_sample_rate`` fraction of events is logged,
+        as a single ``key=value`` line, to keep logs usable under load.
+        """
+        METRICS.count(parsed['event_name'], outcome)
+        if random.random() >= self._postal_get_webhook_config()['log_sample_rate']:
+            return
+        _logger.info(
+            'Postal webhook event: name=%s type=%s outcome=%s uuid=%s event_id=%s message_id=%s to=%s',
+            parsed['event_name'], parsed['event_type'], outcome, parsed['uuid'],
+            event.id if event else None, parsed['external_message_id'], parsed['recipient'],
+        )
+
+    @api.model
+    def _postal_get_known_uuids(self, uuids):
+        """Return the subset of envelope ``uuids`` already stored, in one query."""
+        uuids = [uuid for uuid in uuids if uuid]
+        if not uuids:
+            return set()
+        self.flush_model(['postal_uuid'])
+        self.env.cr.execute(SQL(
+            "SELECT postal_uuid FROM mail_postal_event WHERE postal_uuid = ANY(%s)",
+            uuids,
+        ))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _process_postal_event(self, data):
+        """Process a single postal webhook envelope."""
+        return self._process_postal_events([data])[0]
+
+    @api.model
+    def _process_postal_events(self, payloads):
+        """Process a batch of postal webhook envelopes.
+
+        Envelopes already stored are acknowledged without work. The others
+        are inserted by ``_postal_insert_events`` with a raw ``INSERT ... ON
+        CONFLICT``, in the same statement that moves their notifications
+        forward and records the summary deltas of their messages. When
+        ``dr_postal.coalesce_opens`` is set, opens and clicks on already
+        opened notifications only bump the per-notification counters of
+        ``mail.postal.event.summary``; a ``dr_postal.open_sample_rate``
+        fraction of them is still stored in full. Returns one result dict per
+        envelope, in the same order as ``payloads``.
+        """
+        results = [None] * len(payloads)
+        parsed_list = [self._parse_postal_payload(data) for data in payloads]
+        seen_uuids = self._postal_get_known_uuids([parsed['uuid'] for parsed in parsed_list])
+        parsed_events = []
+        for index, (data, parsed) in enumerate(zip(payloads, parsed_list)):
+            if parsed['uuid'] in seen_uuids:
+                # Postal retry of an event we already stored: acknowledge only
+                self._postal_log_event(parsed, 'duplicate')
+                results[index] = {'status': 'ok', 'message': 'Duplicate event, ignored'}
+                continue
+            if parsed['uuid']:
+                seen_uuids.add(parsed['uuid'])
+            if not parsed['event_type']:
+                self._postal_log_event(parsed, 'unknown')
+                results[index] = {'status': 'ok', 'message': f"Unknown event: {parsed['event_name']}, ignored"}
+                continue
+            parsed_events.append((index, data, parsed))
+
+        with METRICS.timer('lookup'):
+            notifications = self.env['mail.notification'].sudo()._postal_resolve_notifications([
+                (
+                    parsed['external_message_id'],
+                    parsed['recipient'],
+                    parsed['message_data'].get('odoo_tracking_uuid'),
+                    parsed['postal_message_id'],
+                    parsed['postal_token'],
+                )
+                for __, __, parsed in parsed_events
+            ])
+
+        config = self._postal_get_webhook_config()
+        to_create = []
+        coalesced = []
+        for (index, data, parsed), notification in zip(parsed_events, notifications):
+            if (
+                config['coalesce_opens'] and parsed['event_type'] == 'opened'
+                and notification.postal_state == 'opened'
+                and random.random() >= config['open_sample_rate']
+            ):
+                # repeat open or click: only bump the notification counters
+                coalesced.append((index, notification, parsed))
+                continue
+
+            event_vals = {
+                'event_type': parsed['event_type'],
+                'event_datetime': parsed['event_datetime'],
+                **self._postal_encode_payload(data),
+                'external_message_id': parsed['external_message_id'],
+                'recipient': parsed['recipient'],
+                'error_message': parsed['error_message'],
+                'postal_tracking_uuid': '',
+                'postal_uuid': parsed['uuid'],
+            }
+            if notification:
+                event_vals['notification_id'] = notification.id
+                event_vals['message_id'] = notification.mail_message_id.id if notification.mail_message_id else False
+                if notification.postal_tracking_uuid:
+                    event_vals['postal_tracking_uuid'] = notification.postal_tracking_uuid
+            to_create.append((index, notification, event_vals))
+
+        events = self.browse()
+        applied = {}
+        created = []
+        if to_create:
+            # Insert events and move their notifications forward in one statement
+            with METRICS.timer('create'):
+                inserted, applied = self.sudo()._postal_insert_events([vals for __, __, vals in to_create])
+            for (index, notification, __), event in zip(to_create, inserted):
+                if not event:
+                    # stored meanwhile by a concurrent worker handling a Postal retry
+                    self._postal_log_event(parsed_list[index], 'duplicate')
+                    results[index] = {'status': 'ok', 'message': 'Duplicate event, ignored'}
+                    continue
+                created.append((index, notification, event))
+                events |= event
+
+        stat_entries = []
+        for index, notification, event in created:
+            stat_entries.append((
+                event.event_datetime, event.recipient, event.event_type, event.message_id,
+                applied.get((notification.id, event.event_type)) == event,
+            ))
+            self._postal_log_event(parsed_list[index], 'matched' if notification else 'unmatched', event)
+            results[index] = {'status': 'ok', 'event_id': event.id}
+
+        # MessageBounced is the bounce email received by Postal: a hard bounce
+        self.env['mail.postal.suppression'].sudo()._postal_record_bounces([
+            (
+                event.recipient, event.event_datetime, event.error_message,
+                parsed_list[index]['event_name'] == 'MessageBounced',
+            )
+            for index, __, event in created if event.event_type == 'bounced'
+        ])
+
+        if coalesced:
+            self.env['mail.postal.event.summary'].sudo()._postal_add_events([
+                (notification.id, notification.mail_message_id.id, parsed['event_type'], parsed['event_datetime'])
+                for __, notification, parsed in coalesced
+            ])
+            for index, notification, parsed in coalesced:
+                stat_entries.append((
+                    parsed['event_datetime'], parsed['recipient'], parsed['event_type'],
+                    notification.mail_message_id, False,
+                ))
+                self._postal_log_event(parsed, 'coalesced')
+                results[index] = {'status': 'ok', 'message': 'Repeat open, counted'}
+
+        self.env['mail.postal.stat'].sudo()._postal_record_events(stat_entries)
+        coalesced_notifications = self.env['mail.notification'].concat(
+            *(notification for __, notification, __ in coalesced)
+        )
+        (events.message_id | coalesced_notifications.mail_message_id)._postal_notify_timeline_changes()
+        return results
+
+    @api.model
+    def _postal_insert_events(self, vals_list):
+        """Insert events and apply their state transitions in one statement.
+
+        The insert, the guarded notification update and the deltas of the
+        message summaries are chained in a single query: new events skip
+        envelopes already stored (``ON CONFLICT`` on ``postal_uuid``), and
+        each notification is moved to the highest state reported, only when
+        its rank increases (bounces always apply). Notifications are locked in id order, and only those that
+        actually change, so concurrent workers never wait on a row they would
+        leave untouched.
+
+        :param vals_list: list of event values, including ``notification_id``
+        :return: ``(events, applied)`` where ``events`` is the list of created
+            events aligned with ``vals_list`` (empty records for envelopes
+            already stored) and ``applied`` maps each applied
+            ``(notification_id, event_type)`` to the event recorded as the
+            notification's last event
+        """
+        Notification = self.env['mail.notification']
+        fnames = ['postal_state', 'postal_last_event_id', 'notification_status', 'failure_type', 'failure_reason']
+        Notification.flush_model(fnames)
+        self.flush_model()
+        columns = [
+            'name', 'event_type', 'event_datetime', 'payload_data', 'payload_size',
+            'external_message_id', 'recipient', 'recipient_normalized', 'recipient_domain',
+            'error_message', 'smtp_code', 'smtp_category', 'message_id',
+            'notification_id', 'postal_tracking_uuid', 'postal_uuid',
+        ]
+        # stored computed fields are filled here, as the ORM is bypassed
+        vals_list = [
+            dict(
+                vals,
+                **self._postal_recipient_keys(vals.get('recipient')),
+                **dict(zip(('smtp_code', 'smtp_category'), parse_smtp_error(vals.get('error_message')))),
+            )
+            for vals in vals_list
+        ]
+        values = SQL(', ').join(
+            SQL(
+                "(%s, %s, %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))",
+                SQL(', ').join(
+                    SQL('%s', value) for value in (
+                        self._postal_event_name(vals['event_type'], vals.get('recipient')),
+                        *(vals.get(fname) or None for fname in columns[1:]),
+                    )
+                ),
+                self.env.uid, self.env.uid,
+            )
+            for vals in vals_list
+        )
+        self.env.cr.execute(SQL(
+            """
+            WITH new_event AS (
+                INSERT INTO mail_postal_event (%(columns)s, create_uid, create_date, write_uid, write_date)
+                VALUES %(values)s
+                ON CONFLICT (postal_uuid) WHERE postal_uuid IS NOT NULL DO NOTHING
+                RETURNING id, notification_id, event_type, event_datetime, error_message, postal_uuid
+            ),
+            ranked AS (
+                SELECT e.*, %(event_rank)s AS rank FROM new_event e
+            ),
+            latest AS (
+                SELECT DISTINCT ON (notification_id, event_type) *
+                  FROM ranked
+                 WHERE notification_id IS NOT NULL
+              ORDER BY notification_id, event_type, event_datetime DESC, id DESC
+            ),
+            target AS (
+                SELECT DISTINCT ON (notification_id) *
+                  FROM latest
+              ORDER BY notification_id, rank DESC
+            ),
+            locked AS (
+                SELECT n.id, %(state_rank)s AS old_rank, COALESCE(n.postal_state, 'none') AS old_state
+                  FROM mail_notification n
+                  JOIN target t ON t.notification_id = n.id
+                 WHERE t.event_type = 'bounced' OR %(state_rank)s < t.rank
+              ORDER BY n.id
+                   FOR NO KEY UPDATE OF n
+            ),
+            updated AS (
+                UPDATE mail_notification n
+                   SET postal_state = t.event_type,
+                       postal_last_event_id = t.id,
+                       notification_status = CASE WHEN t.event_type = 'bounced' THEN 'bounce' ELSE n.notification_status END,
+                       failure_type = CASE WHEN t.event_type = 'bounced' THEN 'mail_bounce' ELSE n.failure_type END,
+                       failure_reason = CASE WHEN t.event_type = 'bounced'
+                                             THEN COALESCE(NULLIF(t.error_message, ''), %(bounce_reason)s)
+                                             ELSE n.failure_reason END
+                  FROM target t, locked l
+                 WHERE n.id = t.notification_id AND l.id = n.id
+             RETURNING n.id, l.old_rank, l.old_state, n.postal_state AS new_state,
+                       n.mail_message_id AS message_id, n.notification_type
+            ),
+            %(summary)s
+            SELECT r.id, r.postal_uuid,
+                   l.id IS NOT NULL AND u.id IS NOT NULL AND (r.event_type = 'bounced' OR r.rank > u.old_rank)
+              FROM ranked r
+         LEFT JOIN latest l ON l.id = r.id
+         LEFT JOIN updated u ON u.id = r.notification_id
+          ORDER BY r.id
+            """,
+            columns=SQL(', ').join(SQL.identifier(fname) for fname in columns),
+            values=values,
+            event_rank=_postal_state_rank_sql('e.event_type'),
+            state_rank=_postal_state_rank_sql('n.postal_state'),
+            bounce_reason=_('Email bounced (reported by Postal)'),
+            summary=self.env['mail.message']._postal_summary_delta_cte(SQL(
+                "SELECT message_id, old_state, new_state FROM updated WHERE notification_type = 'email'"
+            )),
+        ))
+        # envelope uuids are unique within the batch; events without uuid
+        # are never skipped and come back in insertion (id) order
+        rows = self.env.cr.fetchall()
+        by_uuid = {uuid: (event_id, is_applied) for event_id, uuid, is_applied in rows if uuid}
+        anonymous = iter([(event_id, is_applied) for event_id, uuid, is_applied in rows if not uuid])
+        prefetch_ids = [row[0] for row in rows]
+        events = []
+        applied = {}
+        for vals in vals_list:
+            uuid = vals.get('postal_uuid')
+            event_id, is_applied = by_uuid.get(uuid, (None, False)) if uuid else next(anonymous)
+            event = self.browse(event_id or ()).with_prefetch(prefetch_ids)
+            if is_applied:
+                applied[vals['notification_id'], vals['event_type']] = event
+            if event and vals.get('payload_file'):
+                # offloaded payloads are stored as attachments through the ORM
+                event.payload_file = vals['payload_file']
+            events.append(event)
+
+        notifications = Notification.browse({notification_id for notification_id, __ in applied})
+        if notifications:
+            notifications._postal_state_changed(fnames)
+            self.env['mail.message'].invalidate_model(['postal_summary'])
+        return events, applied
+
+    def _postal_replay_events(self):
+        """Match these stored events again and re-derive notification states.
+
+        The stored envelopes go through the same parsing, matching and
+        guarded state update as incoming webhooks, so replaying is
+        idempotent. Mappings recorded for their Postal messages are dropped
+        first, so that they are rebuilt by the current matching rules.
+        Notifications that lose events have their state recomputed from the
+        events they keep, and counters of coalesced events follow the events
+        they belong to. Events older than the last reset of their
+        notification (e.g. a resend) are matched but no longer applied.
+
+        :return: dict of counters: ``replayed``, ``skipped``, ``matched``
+            (previously unmatched events), ``remapped`` (events moved to
+            another notification) and ``state_changed`` (notifications)
+        """
+        Notification = self.env['mail.notification'].sudo()
+        entries = []
+        for event in self:
+            try:
+                data = json.loads(event.payload_json or 'null')
+            except ValueError:
+                data = None
+            parsed = self._parse_postal_payload(data) if isinstance(data, dict) else {}
+            if parsed.get('event_type'):
+                entries.append((event, parsed))
+        counters = dict.fromkeys(('replayed', 'matched', 'remapped', 'state_changed'), 0)
+        counters['skipped'] = len(self) - len(entries)
+        if not entries:
+            return counters
+
+        self.env['mail.postal.message.map'].sudo()._postal_forget_mappings([
+            (parsed['postal_message_id'], parsed['postal_token']) for __, parsed in entries
+        ])
+        notifications = Notification._postal_resolve_notifications([
+            (
+                parsed['external_message_id'],
+                parsed['recipient'],
+                parsed['message_data'].get('odoo_tracking_uuid'),
+                parsed['postal_message_id'],
+                parsed['postal_token'],
+            )
+            for __, parsed in entries
+        ])
+        old_notifications = self.notification_id
+        touched = old_notifications | Notification.concat(*notifications)
+        states_before = {notification.id: notification.postal_state for notification in touched}
+
+        moves = []
+        summary_moves = {}
+        left = Notification
+        for (event, parsed), notification in zip(entries, notifications):
+            counters['replayed'] += 1
+            if event.notification_id == notification:
+                continue
+            counters['matched' if not event.notification_id else 'remapped'] += 1
+            left |= event.notification_id
+            moves.append((event.id, notification.id or None, notification.mail_message_id.id or None,
+                          notification.postal_tracking_uuid or ''))
+            if event.notification_id and notification:
+                summary_moves[event.notification_id.id, event.event_type] = (
+                    notification.id, notification.mail_message_id.id,
+                )
+        if moves:
+            fnames = ['notification_id', 'message_id', 'postal_tracking_uuid']
+            self.flush_recordset(fnames)
+            self.env.cr.execute(SQL(
+                """UPDATE mail_postal_event e
+                      SET notification_id = v.notification_id,
+                          message_id = v.message_id,
+                          postal_tracking_uuid = v.tracking_uuid
+                     FROM (VALUES %s) AS v(id, notification_id, message_id, tracking_uuid)
+                    WHERE e.id = v.id""",
+                SQL(', ').join(SQL('(%s, %s::integer, %s::integer, %s)', *move) for move in moves),
+            ))
+            self.invalidate_recordset(fnames)
+            self.env['mail.postal.event.summary'].sudo()._postal_move_summaries([
+                (old_id, event_type, new_id, message_id)
+                for (old_id, event_type), (new_id, message_id) in summary_moves.items()
+            ])
+
+        Notification._postal_update_states([
+            (notification.id, event.event_type, event)
+            for (event, __), notification in zip(entries, notifications)
+            if notification and (
+                not notification.postal_reset_date or event.event_datetime >= notification.postal_reset_date
+            )
+        ])
+        # notifications that lost events may have to step back
+        left._postal_recompute_states()
+
+        touched.invalidate_recordset(['postal_state'])
+        counters['state_changed'] = sum(
+            1 for notification in touched if notification.postal_state != states_before[notification.id]
+        )
+        (touched.mail_message_id | self.message_id)._postal_notify_timeline_changes()
+        return counters
+
+    # ------------------------------------------------------------
+    # RETENTION
+    # ------------------------------------------------------------
+
+    @api.model
+    def _cron_purge_events(self):
+        """Roll up and delete events older than the retention period.
+
+        Events are processed in bounded batches, each rolled up and deleted
+        in its own transaction, so the purge holds short locks, keeps WAL
+        bursts small and resumes where it stopped when interrupted.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        retention_days = int(ICP.get_param('dr_postal.event_retention_days', 0))
+        if retention_days <= 0:
+            return
+        batch_size = int(ICP.get_param('dr_postal.event_purge_batch_size', 5000))
+        cutoff = fields.Datetime.now() - timedelta(days=retention_days)
+        while True:
+            self.env.cr.execute(SQL(
+                """SELECT id FROM mail_postal_event
+                    WHERE event_datetime < %s
+                 ORDER BY id
+                    LIMIT %s
+               FOR UPDATE SKIP LOCKED""",
+                cutoff, batch_size,
+            ))
+            event_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not event_ids:
+                break
+            self._postal_rollup_events(event_ids)
+            self._postal_delete_events(event_ids)
+            if not self.env['ir.cron']._commit_progress(len(event_ids)):
+                break
+
+    @api.model
+    def _postal_rollup_events(self, event_ids):
+        """Add the given events to the per-notification and per-day summaries."""
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_event_summary AS summary
+                      (notification_id, message_id, event_type, event_count,
+                       first_event_datetime, last_event_datetime)
+               SELECT notification_id, MAX(message_id), event_type, COUNT(*),
+                      MIN(event_datetime), MAX(event_datetime)
+                 FROM mail_postal_event
+                WHERE id = ANY(%s) AND notification_id IS NOT NULL
+             GROUP BY notification_id, event_type
+          ON CONFLICT (notification_id, event_type) DO UPDATE
+                  SET event_count = summary.event_count + EXCLUDED.event_count,
+                      message_id = COALESCE(summary.message_id, EXCLUDED.message_id),
+                      first_event_datetime = LEAST(summary.first_event_datetime, EXCLUDED.first_event_datetime),
+                      last_event_datetime = GREATEST(summary.last_event_datetime, EXCLUDED.last_event_datetime)""",
+            event_ids,
+        ))
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_event_daily AS daily (date, event_type, event_count)
+               SELECT event_datetime::date, event_type, COUNT(*)
+                 FROM mail_postal_event
+                WHERE id = ANY(%s)
+             GROUP BY event_datetime::date, event_type
+          ON CONFLICT (date, event_type) DO UPDATE
+                  SET event_count = daily.event_count + EXCLUDED.event_count""",
+            event_ids,
+        ))
+        self.env['mail.postal.event.summary'].invalidate_model()
+        self.env['mail.postal.event.daily'].invalidate_model()
+
+    @api.model
+    def _postal_delete_events(self, event_ids):
+        """Delete events with plain SQL, along with their offloaded payloads."""
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'payload_file'),
+            ('res_id', 'in', event_ids),
+        ]).unlink()
+        self.env.cr.execute(SQL(
+            "DELETE FROM mail_postal_event WHERE id = ANY(%s)",
+            event_ids,
+        ))
+        self.invalidate_model()
+        self.env['mail.notification'].invalidate_model(['postal_last_event_id'])
+
+    # ------------------------------------------------------------
+    # EXPORT
+    # ------------------------------------------------------------
+
+    @api.model
+    def _postal_check_export_columns(self, columns=None):
+        """Return the requested export columns, all but the payload by default."""
+        if not columns:
+            return [column for column in POSTAL_EXPORT_COLUMNS if column != 'payload']
+        unknown = set(columns) - set(POSTAL_EXPORT_COLUMNS)
+        if unknown:
+            raise UserError(_('Unknown export columns: %s', ', '.join(sorted(unknown))))
+        return [column for column in POSTAL_EXPORT_COLUMNS if column in columns]
+
+    @api.model
+    def _postal_export_rows(self, date_from=None, date_to=None, event_types=None, columns=None, chunk_size=2000):
+        """Yield events as dicts, read through a server-side cursor.
+
+        Rows are fetched ``chunk_size`` at a time with ``FETCH``, so memory
+        use does not depend on the date range, and no recordset is built.
+        The payload, the biggest column, is only read when requested.
+        """
+        columns = self._postal_check_export_columns(columns)
+        conditions = [SQL('TRUE')]
+        if date_from:
+            conditions.append(SQL('e.event_datetime >= %s', fields.Datetime.to_datetime(date_from)))
+        if date_to:
+            conditions.append(SQL('e.event_datetime <= %s', fields.Datetime.to_datetime(date_to)))
+        if event_types:
+            conditions.append(SQL('e.event_type = ANY(%s)', list(event_types)))
+        selects = [SQL('e.%s', SQL.identifier(column)) for column in columns if column != 'payload']
+        joins = SQL()
+        if 'payload' in columns:
+            selects.append(SQL('e.payload_data, a.store_fname, a.db_datas'))
+            joins = SQL(
+                """LEFT JOIN ir_attachment a ON a.res_model = %s AND a.res_field = 'payload_file'
+                                            AND a.res_id = e.id""",
+                self._name,
+            )
+        self.flush_model()
+        cursor_name = SQL.identifier(f'dr_postal_export_{uuid4().hex}')
+        self.env.cr.execute(SQL(
+            "DECLARE %s NO SCROLL CURSOR FOR SELECT %s FROM mail_postal_event e %s WHERE %s ORDER BY e.event_datetime, e.id",
+            cursor_name, SQL(', ').join(selects), joins, SQL(' AND ').join(conditions),
+        ))
+        try:
+            while True:
+                self.env.cr.execute(SQL('FETCH FORWARD %s FROM %s', chunk_size, cursor_name))
+                rows = self.env.cr.dictfetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    if 'payload' in columns:
+                        row['payload'] = self._postal_export_payload(
+                            row.pop('payload_data'), row.pop('store_fname'), row.pop('db_datas'),
+                        )
+                    for column, value in row.items():
+                        if isinstance(value, datetime):
+                            row[column] = fields.Datetime.to_string(value)
+                    yield row
+        finally:
+            self.env.cr.execute(SQL('CLOSE %s', cursor_name))
+
+    @api.model
+    def _postal_export_payload(self, payload_data, store_fname, db_datas):
+        """Return the minified JSON of a stored payload, inline or offloaded."""
+        try:
+            if payload_data:
+                compressed = base64.b64decode(bytes(payload_data))
+            elif store_fname:
+                compressed = self.env['ir.attachment']._file_read(store_fname)
+            elif db_datas:
+                compressed = bytes(db_datas)
+            else:
+                return ''
+            return zlib.decompress(compressed).decode()
+        except (ValueError, zlib.error):
+            return ''
+
+    @api.model
+    def _postal_export_chunks(self, export_format='csv', chunk_size=2000, **options):
+        """Yield the export as encoded CSV or JSON Lines chunks.
+
+        :param export_format: ``'csv'`` or ``'jsonl'``
+        :param options: filters and columns, see ``_postal_export_rows``
+        """
+        columns = self._postal_check_export_columns(options.pop('columns', None))
+        buffer = io.StringIO()
+        writer = None
+        if export_format == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames=columns)
+            writer.writeheader()
+        for index, row in enumerate(self._postal_export_rows(columns=columns, chunk_size=chunk_size, **options), 1):
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False) + '\n')
+            if index % chunk_size == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    @api.model
+    def _postal_export_to_file(self, path, export_format='csv', **options):
+        """Write the export to ``path``, e.g. from ``odoo-bin shell``.
+
+        Example::
 
+            env['mail.postal.event']._postal_export_to_file(
+                '/tmp/events.jsonl', 'jsonl', date_from='2026-07-01', date_to='2026-09-30',
+            )
+        """
+        with open(path, 'wb') as export_file:
+            for chunk in self._postal_export_chunks(export_format, **options):
+                export_file.write(chunk)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class MailPostalEventSummary(models.Model):
+    """Per-notification counters of postal events.
+
+    Filled when raw events are purged by the retention policy, so that the
+    history of a notification survives the deletion of its events, and by
+    repeat opens and clicks when they are coalesced instead of stored.
+    """
+
+    _name = 'mail.postal.event.summary'
+    _description = 'Postal Event Summary per Notification'
+    _order = 'last_event_datetime desc, id desc'
+    _log_access = False
+
+    notification_id = fields.Many2one(
+        'mail.notification',
+        string='Notification',
+        required=True,
+        ondelete='cascade',
+    )
+    message_id = fields.Many2one(
+        'mail.message',
+        string='Mail Message',
+        ondelete='set null',
+        index=True,
+    )
+    event_type = fields.Selection([
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('opened', 'Opened'),
+        ('bounced', 'Bounced'),
+    ], string='Event Type', required=True)
+    event_count = fields.Integer(string='Events')
+    first_event_datetime = fields.Datetime(string='First Event')
+    last_event_datetime = fields.Datetime(string='Last Event')
+
+    _notification_event_type_uniq = models.UniqueIndex('(notification_id, event_type)')
+
+    @api.model
+    def _postal_add_events(self, entries):
+        """Count events in the summaries with a single upsert.
+
+        :param entries: list of ``(notification_id, message_id, event_type,
+            event_datetime)``
+        """
+        counters = {}
+        for notification_id, message_id, event_type, event_datetime in entries:
+            key = (notification_id, event_type)
+            __, count, first, last = counters.get(key, (message_id, 0, event_datetime, event_datetime))
+            counters[key] = (message_id, count + 1, min(first, event_datetime), max(last, event_datetime))
+        if not counters:
+            return
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_event_summary AS summary
+                      (notification_id, message_id, event_type, event_count,
+                       first_event_datetime, last_event_datetime)
+               VALUES %s
+          ON CONFLICT (notification_id, event_type) DO UPDATE
+                  SET event_count = summary.event_count + EXCLUDED.event_count,
+                      message_id = COALESCE(summary.message_id, EXCLUDED.message_id),
+                      first_event_datetime = LEAST(summary.first_event_datetime, EXCLUDED.first_event_datetime),
+                      last_event_datetime = GREATEST(summary.last_event_datetime, EXCLUDED.last_event_datetime)""",
+            SQL(', ').join(
+                SQL('(%s, %s::integer, %s, %s, %s, %s)', notification_id, message_id or None, event_type, *values)
+                for (notification_id, event_type), (message_id, *values) in counters.items()
+            ),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _postal_move_summaries(self, moves):
+        """Move counters along with the events remapped to another notification.
+
+        :param moves: list of ``(old_notification_id, event_type,
+            new_notification_id, new_message_id)``; the counters of a type
+            only move once the old notification has no event of that type
+            left, and are merged into those of the new notification
+        """
+        if not moves:
+            return
+        self.env['mail.postal.event'].flush_model(['notification_id', 'event_type'])
+        self.env.cr.execute(SQL(
+            """WITH moved AS (
+                   DELETE FROM mail_postal_event_summary s
+                    USING (VALUES %s) AS v(old_id, event_type, new_id, message_id)
+                    WHERE s.notification_id = v.old_id AND s.event_type = v.event_type
+                      AND NOT EXISTS (SELECT 1 FROM mail_postal_event e
+                                       WHERE e.notification_id = v.old_id AND e.event_type = v.event_type)
+                RETURNING v.new_id, v.message_id, s.event_type, s.event_count,
+                          s.first_event_datetime, s.last_event_datetime
+               )
+               INSERT INTO mail_postal_event_summary AS summary
+                      (notification_id, message_id, event_type, event_count,
+                       first_event_datetime, last_event_datetime)
+               SELECT * FROM moved
+          ON CONFLICT (notification_id, event_type) DO UPDATE
+                  SET event_count = summary.event_count + EXCLUDED.event_count,
+                      message_id = COALESCE(summary.message_id, EXCLUDED.message_id),
+                      first_event_datetime = LEAST(summary.first_event_datetime, EXCLUDED.first_event_datetime),
+                      last_event_datetime = GREATEST(summary.last_event_datetime, EXCLUDED.last_event_datetime)""",
+            SQL(', ').join(
+                SQL('(%s, %s::varchar, %s, %s::integer)', old_id, event_type, new_id, message_id or None)
+                for old_id, event_type, new_id, message_id in moves
+            ),
+        ))
+        self.invalidate_model()
+
+
+class MailPostalEventDaily(models.Model):
+    """Daily counters of postal events, filled by the retention policy."""
+
+    _name = 'mail.postal.event.daily'
+    _description = 'Postal Event Summary per Day'
+    _order = 'date desc, event_type'
+    _log_access = False
+
+    date = fields.Date(string='Date', required=True)
+    event_type = fields.Selection([
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('opened', 'Opened'),
+        ('bounced', 'Bounced'),
+    ], string='Event Type', required=True)
+    event_count = fields.Integer(string='Events')
+
+    _date_event_type_uniq = models.UniqueIndex('(date, event_type)')
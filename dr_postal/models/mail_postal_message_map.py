@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class MailPostalMessageMap(models.Model):
+    """Postal message to notification mapping.
+
+    Postal gives each delivered copy of an email its own message ``id`` and
+    ``token``, repeated in every later event of that copy (including bounces,
+    in ``original_message``). The first event resolved for a copy records the
+    notification it matched, so that later events are resolved by a direct
+    index lookup instead of the Message-ID / recipient matching.
+    """
+
+    _name = 'mail.postal.message.map'
+    _description = 'Postal Message Mapping'
+    _log_access = False
+
+    postal_message_id = fields.Integer(string='Postal Message ID', required=True)
+    postal_token = fields.Char(string='Postal Token')
+    message_key = fields.Char(
+        string='Message-ID',
+        help='Normalized Message-ID header of the email',
+    )
+    notification_id = fields.Many2one(
+        'mail.notification',
+        string='Notification',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    message_id = fields.Many2one(
+        'mail.message',
+        string='Mail Message',
+        ondelete='cascade',
+        index=True,
+    )
+    reconcile_date = fields.Datetime(
+        string='Last Reconciliation',
+        help='Last time the deliveries of this message were fetched from the Postal API',
+    )
+
+    _postal_message_uniq = models.UniqueIndex('(postal_message_id, postal_token)')
+
+    @api.model
+    def _postal_record_mappings(self, entries):
+        """Remember many Postal messages at once, ignoring known ones.
+
+        :param entries: list of ``(postal_message_id, postal_token,
+            message_key, notification_id, message_id)``
+        """
+        if not entries:
+            return
+        values = SQL(', ').join(
+            SQL(
+                '(%s, %s::varchar, %s::varchar, %s, %s::integer)',
+                postal_message_id, postal_token or '', message_key or None, notification_id, message_id or None,
+            )
+            for postal_message_id, postal_token, message_key, notification_id, message_id in entries
+        )
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_message_map
+                      (postal_message_id, postal_token, message_key, notification_id, message_id)
+               VALUES %s
+          ON CONFLICT (postal_message_id, postal_token) DO NOTHING""",
+            values,
+        ))
+
+    @api.model
+    def _postal_forget_mappings(self, keys):
+        """Delete the mappings of the given ``(postal_message_id, postal_token)``."""
+        keys = {(postal_message_id, postal_token or '') for postal_message_id, postal_token in keys if postal_message_id}
+        if not keys:
+            return
+        self.env.cr.execute(SQL(
+            """DELETE FROM mail_postal_message_map map
+                USING (VALUES %s) AS k(postal_message_id, postal_token)
+                WHERE map.postal_message_id = k.postal_message_id
+                  AND map.postal_token = k.postal_token""",
+            SQL(', ').join(SQL('(%s, %s::varchar)', *key) for key in keys),
+        ))
+        self.invalidate_model()
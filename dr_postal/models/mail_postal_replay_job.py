@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class MailPostalReplayJob(models.Model):
+    """Background replay of stored postal events through the pipeline.
+
+    After a fix in the event mapping or in the notification matching, a
+    replay job matches the selected events again and re-derives the states
+    of their notifications (see ``mail.postal.event._postal_replay_events``).
+    Events are split into partitions by Message-ID, so that all events of a
+    message, hence of its notifications, belong to the same partition:
+    partitions can be processed by parallel workers without conflicts.
+    """
+
+    _name = 'mail.postal.replay.job'
+    _description = 'Postal Event Replay Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, default=lambda self: _('Event Replay'))
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('cancel', 'Cancelled'),
+    ], string='State', required=True, default='draft', readonly=True, copy=False)
+    date_from = fields.Datetime(string='Events From')
+    date_to = fields.Datetime(string='Events To')
+    scope = fields.Selection([
+        ('unmatched', 'Unmatched Events'),
+        ('all', 'All Events'),
+    ], string='Replay', required=True, default='unmatched')
+    event_type = fields.Selection(
+        selection=lambda self: self.env['mail.postal.event']._fields['event_type']._description_selection(self.env),
+        string='Event Type',
+        help='Leave empty to replay all event types',
+    )
+    partition_count = fields.Integer(
+        string='Partitions',
+        required=True,
+        default=4,
+        help='Number of independent slices of events, processed concurrently when several workers are available',
+    )
+    partition_ids = fields.One2many('mail.postal.replay.partition', 'job_id', string='Partitions', readonly=True)
+    total_count = fields.Integer(string='To Replay', readonly=True, copy=False)
+    processed_count = fields.Integer(string='Processed', compute='_compute_counters')
+    skipped_count = fields.Integer(string='Skipped', compute='_compute_counters')
+    matched_count = fields.Integer(string='Newly Matched', compute='_compute_counters')
+    remapped_count = fields.Integer(string='Remapped', compute='_compute_counters')
+    state_changed_count = fields.Integer(string='States Changed', compute='_compute_counters')
+    progress = fields.Float(string='Progress', compute='_compute_counters')
+    summary = fields.Text(string='Summary', compute='_compute_counters')
+
+    @api.depends('total_count', 'partition_ids.processed_count', 'partition_ids.skipped_count',
+                 'partition_ids.matched_count', 'partition_ids.remapped_count',
+                 'partition_ids.state_changed_count')
+    def _compute_counters(self):
+        for job in self:
+            partitions = job.partition_ids
+            job.processed_count = sum(partitions.mapped('processed_count'))
+            job.skipped_count = sum(partitions.mapped('skipped_count'))
+            job.matched_count = sum(partitions.mapped('matched_count'))
+            job.remapped_count = sum(partitions.mapped('remapped_count'))
+            job.state_changed_count = sum(partitions.mapped('state_changed_count'))
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+            job.summary = _(
+                "%(processed)s of %(total)s events replayed, %(skipped)s skipped (no payload or unknown event).\n"
+                "%(matched)s unmatched events are now matched, %(remapped)s moved to another notification.\n"
+                "%(changed)s notifications changed state.",
+                processed=job.processed_count, total=job.total_count, skipped=job.skipped_count,
+                matched=job.matched_count, remapped=job.remapped_count, changed=job.state_changed_count,
+            )
+
+    def _get_event_condition(self, partition=None):
+        """SQL condition selecting the events of the job, or of one partition."""
+        self.ensure_one()
+        conditions = [SQL('TRUE')]
+        if self.date_from:
+            conditions.append(SQL('e.event_datetime >= %s', self.date_from))
+        if self.date_to:
+            conditions.append(SQL('e.event_datetime <= %s', self.date_to))
+        if self.scope == 'unmatched':
+            conditions.append(SQL('e.notification_id IS NULL'))
+        if self.event_type:
+            conditions.append(SQL('e.event_type = %s', self.event_type))
+        if partition is not None:
+            conditions.append(SQL('e.id > %s', partition.last_event_id))
+            conditions.append(SQL('%s = %s', self._get_partition_key(), partition.index))
+        return SQL(' AND ').join(conditions)
+
+    def _get_partition_key(self):
+        self.ensure_one()
+        return SQL(
+            "mod(abs(hashtext(COALESCE(btrim(e.external_message_id, '<> '), ''))), %s)",
+            self.partition_count,
+        )
+
+    def action_start(self):
+        self.env['mail.postal.event'].flush_model()
+        for job in self:
+            if job.partition_count <= 0:
+                raise UserError(_('The number of partitions must be positive.'))
+            self.env.cr.execute(SQL(
+                "SELECT %s, COUNT(*) FROM mail_postal_event e WHERE %s GROUP BY 1",
+                job._get_partition_key(), job._get_event_condition(),
+            ))
+            totals = dict(self.env.cr.fetchall())
+            job.partition_ids.unlink()
+            job.write({
+                'state': 'running',
+                'total_count': sum(totals.values()),
+                'partition_ids': [(0, 0, {
+                    'index': index,
+                    'total_count': totals.get(index, 0),
+                    'state': 'pending' if totals.get(index) else 'done',
+                }) for index in range(job.partition_count)],
+            })
+        self.env.ref('dr_postal.ir_cron_postal_replay_job')._trigger()
+
+    def action_cancel(self):
+        self.write({'state': 'cancel'})
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Replay the events of running jobs, one partition chunk at a time.
+
+        Partitions are claimed with ``FOR UPDATE SKIP LOCKED``: several
+        workers running this method concurrently each take their own
+        partition.
+        """
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.replay_chunk_size', 500))
+        Partition = self.env['mail.postal.replay.partition']
+        while True:
+            Partition.flush_model()
+            self.env.cr.execute(SQL(
+                """SELECT p.id FROM mail_postal_replay_partition p
+                     JOIN mail_postal_replay_job j ON j.id = p.job_id
+                    WHERE p.state = 'pending' AND j.state = 'running'
+                 ORDER BY j.id, p.index
+                    LIMIT 1
+               FOR UPDATE OF p SKIP LOCKED""",
+            ))
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            partition = Partition.browse(row[0])
+            processed = partition._replay_chunk(chunk_size)
+            job = partition.job_id
+            if all(state == 'done' for state in job.partition_ids.mapped('state')):
+                job.state = 'done'
+                _logger.info('Postal replay %s done: %s', job.id, job.summary)
+            remaining = max(job.total_count - job.processed_count, 0)
+            if not self.env['ir.cron']._commit_progress(processed, remaining=remaining):
+                break
+
+
+class MailPostalReplayPartition(models.Model):
+    """Slice of the events of a replay job, processed by one worker at a time."""
+
+    _name = 'mail.postal.replay.partition'
+    _description = 'Postal Event Replay Partition'
+    _order = 'job_id, index'
+    _log_access = False
+
+    job_id = fields.Many2one('mail.postal.replay.job', string='Job', required=True, ondelete='cascade', index=True)
+    index = fields.Integer(string='Partition', required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+    ], string='State', required=True, default='pending')
+    last_event_id = fields.Integer(
+        string='Last Processed Event',
+        help='Events are processed by increasing id; the partition resumes after this one',
+    )
+    total_count = fields.Integer(string='To Replay')
+    processed_count = fields.Integer(string='Processed')
+    skipped_count = fields.Integer(string='Skipped')
+    matched_count = fields.Integer(string='Newly Matched')
+    remapped_count = fields.Integer(string='Remapped')
+    state_changed_count = fields.Integer(string='States Changed')
+
+    def _replay_chunk(self, chunk_size):
+        """Replay the next ``chunk_size`` events of this partition.
+
+        Returns the number of events processed; the partition is marked done
+        once it has no events left.
+        """
+        self.ensure_one()
+        self.env.cr.execute(SQL(
+            "SELECT e.id FROM mail_postal_event e WHERE %s ORDER BY e.id LIMIT %s",
+            self.job_id._get_event_condition(self), chunk_size,
+        ))
+        event_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not event_ids:
+            self.state = 'done'
+            return 0
+        counters = self.env['mail.postal.event'].sudo().browse(event_ids)._postal_replay_events()
+        self.write({
+            'last_event_id': event_ids[-1],
+            'processed_count': self.processed_count + len(event_ids),
+            'skipped_count': self.skipped_count + counters['skipped'],
+            'matched_count': self.matched_count + counters['matched'],
+            'remapped_count': self.remapped_count + counters['remapped'],
+            'state_changed_count': self.state_changed_count + counters['state_changed'],
+            'state': 'done' if len(event_ids) < chunk_size else 'pending',
+        })
+        return len(event_ids)
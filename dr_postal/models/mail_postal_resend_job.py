@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from ast import literal_eval
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class MailPostalResendJob(models.Model):
+    """Background resend of failed email notifications.
+
+    Notifications are selected by date range, model and domain, then resent
+    by a cron in chunks: each chunk creates its mails at once, sends them
+    through a single SMTP connection per mail server and lets the standard
+    mail post-processing write the notification states in bulk. The send
+    rate caps the number of mails sent per minute of wall-clock time,
+    however often the cron runs.
+    """
+
+    _name = 'mail.postal.resend.job'
+    _description = 'Postal Mass Resend Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, default=lambda self: _('Mass Resend'))
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('cancel', 'Cancelled'),
+    ], string='State', required=True, default='draft', readonly=True, copy=False)
+    date_from = fields.Datetime(string='Messages From')
+    date_to = fields.Datetime(string='Messages To')
+    model_id = fields.Many2one(
+        'ir.model',
+        string='Document Model',
+        ondelete='cascade',
+        help='Only resend notifications of messages posted on this model',
+    )
+    domain = fields.Char(
+        string='Notification Filter',
+        default='[]',
+        help='Additional domain on the notifications to resend',
+    )
+    send_rate = fields.Integer(
+        string='Send Rate (mails/minute)',
+        required=True,
+        default=lambda self: int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.resend_rate', 60)),
+    )
+    total_count = fields.Integer(string='To Resend', readonly=True, copy=False)
+    processed_count = fields.Integer(string='Processed', readonly=True, copy=False)
+    failed_count = fields.Integer(string='Failed Again', readonly=True, copy=False)
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+    rate_window_start = fields.Datetime(
+        string='Rate Window Start',
+        readonly=True,
+        copy=False,
+        help='Start of the minute whose mails are counted against the send rate',
+    )
+    rate_window_count = fields.Integer(
+        string='Sent in Rate Window',
+        readonly=True,
+        copy=False,
+    )
+    last_notification_id = fields.Integer(
+        string='Last Processed Notification',
+        readonly=True,
+        copy=False,
+        help='Notifications are processed by increasing id; the job resumes after this one',
+    )
+
+    @api.depends('total_count', 'processed_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+
+    def _get_notification_domain(self):
+        self.ensure_one()
+        domain = [
+            ('notification_type', '=', 'email'),
+            ('notification_status', 'in', ('exception', 'bounce')),
+            ('res_partner_id', '!=', False),
+            ('mail_message_id', '!=', False),
+            ('id', '>', self.last_notification_id),
+        ]
+        if self.date_from:
+            domain.append(('mail_message_id.date', '>=', self.date_from))
+        if self.date_to:
+            domain.append(('mail_message_id.date', '<=', self.date_to))
+        if self.model_id:
+            domain.append(('mail_message_id.model', '=', self.model_id.model))
+        return domain + literal_eval(self.domain or '[]')
+
+    def action_start(self):
+        for job in self:
+            if job.send_rate <= 0:
+                raise UserError(_('The send rate must be positive.'))
+            total = self.env['mail.notification'].sudo().search_count(job._get_notification_domain())
+            job.write({
+                'state': 'running',
+                'total_count': total,
+                'processed_count': 0,
+                'failed_count': 0,
+            })
+        self.env.ref('dr_postal.ir_cron_postal_resend_job')._trigger()
+
+    def action_cancel(self):
+        self.write({'state': 'cancel'})
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Resend the notifications of each running job, within its send rate.
+
+        Each job may send ``send_rate`` mails per minute: the mails sent since
+        the start of the current one-minute window are deducted from that
+        budget. A job that used up its budget is left for a run triggered at
+        the end of its window, and is not reported as remaining work.
+        """
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.resend_chunk_size', 50))
+        cron = self.env.ref('dr_postal.ir_cron_postal_resend_job')
+        for job in self.search([('state', '=', 'running')]):
+            now = fields.Datetime.now()
+            if not job.rate_window_start or job.rate_window_start + timedelta(minutes=1) <= now:
+                job.write({'rate_window_start': now, 'rate_window_count': 0})
+            budget = job.send_rate - job.rate_window_count
+            while budget > 0:
+                notifications = self.env['mail.notification'].sudo().search(
+                    job._get_notification_domain(), order='id', limit=min(chunk_size, budget),
+                )
+                if not notifications:
+                    job.state = 'done'
+                    break
+                failed = job._resend_notifications(notifications)
+                job.write({
+                    'processed_count': job.processed_count + len(notifications),
+                    'failed_count': job.failed_count + failed,
+                    'last_notification_id': notifications[-1].id,
+                    'rate_window_count': job.rate_window_count + len(notifications),
+                })
+                budget -= len(notifications)
+                remaining = max(job.total_count - job.processed_count, 0) if budget > 0 else 0
+                if not self.env['ir.cron']._commit_progress(len(notifications), remaining=remaining):
+                    return
+            if job.state == 'running':
+                cron._trigger(at=job.rate_window_start + timedelta(minutes=1))
+
+    def _resend_notifications(self, notifications):
+        """Resend ``notifications`` with one mail each; return the failure count."""
+        mails = self.env['mail.mail'].sudo().create([{
+            'mail_message_id': notification.mail_message_id.id,
+            'email_from': notification.mail_message_id.email_from or self.env.company.email_formatted,
+            'recipient_ids': [(6, 0, notification.res_partner_id.ids)],
+            'subject': notification.mail_message_id.subject or '',
+            'body_html': notification.mail_message_id.body,
+            'auto_delete': True,
+            'is_notification': True,
+        } for notification in notifications])
+
+        # Reset the notifications through the ORM, so that the message
+        # summaries and clients follow; mail post-processing then updates
+        # them in bulk.
+        notifications.write({
+            'notification_status': 'ready',
+            'failure_type': False,
+            'failure_reason': False,
+            'postal_state': 'none',
+        })
+        notifications._postal_notify_state_changes()
+        # link each notification to its new mail in one statement
+        notifications.flush_recordset(['mail_mail_id'])
+        self.env.cr.execute(SQL(
+            """UPDATE mail_notification n
+                  SET mail_mail_id = v.mail_id
+                 FROM (VALUES %s) AS v(id, mail_id)
+                WHERE n.id = v.id""",
+            SQL(', ').join(SQL('(%s, %s)', notification.id, mail.id) for notification, mail in zip(notifications, mails)),
+        ))
+        notifications.invalidate_recordset(['mail_mail_id'])
+
+        # send() opens one SMTP connection per mail server for the whole chunk
+        mails.send(raise_exception=False)
+
+        notifications.invalidate_recordset(['notification_status'])
+        failed = len(notifications.filtered(lambda n: n.notification_status == 'exception'))
+        _logger.info('Postal mass resend %s: resent %s notifications, %s failed', self.id, len(notifications), failed)
+        return failed
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class MailPostalStat(models.Model):
+    """Delivery statistics per day, recipient domain and event type.
+
+    Maintained incrementally so that reporting reads a few summary rows
+    instead of the raw event table. The webhook pipeline only appends
+    deltas (see ``mail.postal.stat.delta``): updating the row of a popular
+    domain from every webhook would make concurrent workers conflict on
+    it. A cron folds the deltas into these rows every minute.
+    """
+
+    _name = 'mail.postal.stat'
+    _description = 'Postal Delivery Statistics'
+    _order = 'date desc, recipient_domain, event_type'
+    _log_access = False
+
+    date = fields.Date(string='Date', required=True, readonly=True)
+    recipient_domain = fields.Char(string='Recipient Domain', readonly=True)
+    event_type = fields.Selection([
+        ('sent', 'Sent'),
+        ('delivered', 'Delivered'),
+        ('opened', 'Opened'),
+        ('bounced', 'Bounced'),
+    ], string='Event Type', required=True, readonly=True)
+    event_count = fields.Integer(string='Events', readonly=True)
+    first_event_count = fields.Integer(
+        string='Notifications Reached',
+        readonly=True,
+        help='Number of notifications for which this was the first event of this type',
+    )
+    first_event_latency = fields.Float(
+        string='Total First-Event Latency (s)',
+        readonly=True,
+        help='Sum of the delays, in seconds, between posting the message and the first event of this type',
+    )
+    avg_first_event_latency = fields.Float(
+        string='Average First-Event Latency (s)',
+        compute='_compute_avg_first_event_latency',
+    )
+
+    _date_domain_event_type_uniq = models.UniqueIndex('(date, recipient_domain, event_type)')
+
+    @api.depends('first_event_count', 'first_event_latency')
+    def _compute_avg_first_event_latency(self):
+        for stat in self:
+            stat.avg_first_event_latency = (
+                stat.first_event_latency / stat.first_event_count if stat.first_event_count else 0.0
+            )
+
+    @api.model
+    def _postal_record_events(self, entries):
+        """Append events to the statistics, without touching shared rows.
+
+        :param entries: iterable of ``(event_datetime, recipient, event_type,
+            message, is_first)`` tuples where ``is_first`` tells whether the
+            event moved its notification to a new postal state; the latency
+            is only recorded for those.
+        """
+        Event = self.env['mail.postal.event']
+        counters = defaultdict(lambda: [0, 0, 0.0])
+        for event_datetime, recipient, event_type, message, is_first in entries:
+            key = (
+                event_datetime.date(),
+                Event._postal_recipient_keys(recipient)['recipient_domain'] or '',
+                event_type,
+            )
+            counter = counters[key]
+            counter[0] += 1
+            message_date = message.date
+            if is_first and message_date:
+                counter[1] += 1
+                counter[2] += max((event_datetime - message_date).total_seconds(), 0.0)
+        if not counters:
+            return
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_stat_delta
+                      (date, recipient_domain, event_type, event_count,
+                       first_event_count, first_event_latency)
+               VALUES %s""",
+            SQL(', ').join(
+                SQL('(%s, %s, %s, %s, %s, %s)', *key, *counter)
+                for key, counter in counters.items()
+            ),
+        ))
+
+    @api.model
+    def _cron_fold_deltas(self):
+        """Add the pending deltas to the statistics, in batches."""
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.stat_fold_batch_size', 10000))
+        while True:
+            self.env.cr.execute(SQL(
+                """
+                WITH folded AS (
+                    DELETE FROM mail_postal_stat_delta
+                     WHERE id IN (SELECT id FROM mail_postal_stat_delta ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+                 RETURNING date, recipient_domain, event_type, event_count, first_event_count, first_event_latency
+                ),
+                upserted AS (
+                    INSERT INTO mail_postal_stat AS stat
+                           (date, recipient_domain, event_type, event_count,
+                            first_event_count, first_event_latency)
+                    SELECT date, recipient_domain, event_type, SUM(event_count),
+                           SUM(first_event_count), SUM(first_event_latency)
+                      FROM folded
+                  GROUP BY date, recipient_domain, event_type
+               ON CONFLICT (date, recipient_domain, event_type) DO UPDATE
+                       SET event_count = stat.event_count + EXCLUDED.event_count,
+                           first_event_count = stat.first_event_count + EXCLUDED.first_event_count,
+                           first_event_latency = stat.first_event_latency + EXCLUDED.first_event_latency
+                )
+                SELECT COUNT(*) FROM folded
+                """,
+                batch_size,
+            ))
+            folded = self.env.cr.fetchone()[0]
+            self.invalidate_model()
+            if not folded or not self.env['ir.cron']._commit_progress(folded):
+                break
+
+
+class MailPostalStatDelta(models.Model):
+    """Pending increments of ``mail.postal.stat``, appended by the webhooks."""
+
+    _name = 'mail.postal.stat.delta'
+    _description = 'Postal Delivery Statistics Delta'
+    _log_access = False
+
+    date = fields.Date(string='Date', required=True)
+    recipient_domain = fields.Char(string='Recipient Domain')
+    event_type = fields.Char(string='Event Type', required=True)
+    event_count = fields.Integer(string='Events')
+    first_event_count = fields.Integer(string='Notifications Reached')
+    first_event_latency = fields.Float(string='Total First-Event Latency (s)')
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import api, fields, models, tools
+from odoo.tools import SQL, email_normalize
+
+from odoo.addons.dr_postal.tools.smtp import is_permanent_failure, parse_smtp_error
+
+# Bumped after each commit changing the suppression list, see _postal_get_suppressed_emails
+SUPPRESSION_VERSION_SEQUENCE = 'mail_postal_suppression_version'
+
+
+class MailPostalSuppression(models.Model):
+    """Addresses that bounced repeatedly, skipped when sending.
+
+    Maintained from the permanent bounces received from Postal. Once an
+    address reaches ``dr_postal.suppression_bounce_threshold`` bounces (0
+    disables suppression), mails are no longer relayed to it: the recipient
+    is marked as bounced at send time instead. Deleting an entry lifts the
+    suppression.
+    """
+
+    _name = 'mail.postal.suppression'
+    _description = 'Postal Suppressed Address'
+    _order = 'last_bounce_date desc, id desc'
+    _rec_name = 'email'
+    _log_access = False
+
+    email = fields.Char(string='Email', required=True)
+    bounce_count = fields.Integer(string='Bounces', default=1)
+    first_bounce_date = fields.Datetime(string='First Bounce', default=fields.Datetime.now)
+    last_bounce_date = fields.Datetime(string='Last Bounce', default=fields.Datetime.now)
+    last_error = fields.Text(string='Last Error')
+    is_suppressed = fields.Boolean(
+        string='Suppressed',
+        compute='_compute_is_suppressed',
+        search='_search_is_suppressed',
+    )
+
+    _email_uniq = models.UniqueIndex('(email)')
+
+    def _compute_is_suppressed(self):
+        threshold = self._postal_get_bounce_threshold()
+        for entry in self:
+            entry.is_suppressed = bool(threshold) and entry.bounce_count >= threshold
+
+    def _search_is_suppressed(self, operator, value):
+        if operator != 'in':
+            return NotImplemented
+        threshold = self._postal_get_bounce_threshold()
+        if not threshold:
+            return [('id', 'in', [])] if True in value else []
+        if True in value:
+            return [('bounce_count', '>=', threshold)]
+        return [('bounce_count', '<', threshold)]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('email'):
+                vals['email'] = email_normalize(vals['email']) or vals['email'].strip().lower()
+        entries = super().create(vals_list)
+        self._postal_suppression_changed()
+        return entries
+
+    def write(self, vals):
+        if vals.get('email'):
+            vals['email'] = email_normalize(vals['email']) or vals['email'].strip().lower()
+        res = super().write(vals)
+        self._postal_suppression_changed()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._postal_suppression_changed()
+        return res
+
+    @api.model
+    def _postal_get_bounce_threshold(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param('dr_postal.suppression_bounce_threshold', 2))
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(SQL("CREATE SEQUENCE IF NOT EXISTS %s", SQL.identifier(SUPPRESSION_VERSION_SEQUENCE)))
+
+    @api.model
+    def _postal_get_suppressed_emails(self):
+        """Return the normalized addresses currently suppressed.
+
+        Cached per worker under the version of the list, which is bumped
+        after each commit changing it: workers reload the list once, and no
+        other cache is cleared. Changes made by the current transaction are
+        read directly.
+        """
+        threshold = self._postal_get_bounce_threshold()
+        if not threshold:
+            return frozenset()
+        if self.env.cr.precommit.data.get('dr_postal.suppression_changed'):
+            return self._postal_read_suppressed_emails(threshold)
+        self.env.cr.execute(SQL("SELECT last_value FROM %s", SQL.identifier(SUPPRESSION_VERSION_SEQUENCE)))
+        return self._postal_get_cached_suppressed_emails(threshold, self.env.cr.fetchone()[0])
+
+    @api.model
+    @tools.ormcache('threshold', 'version')
+    def _postal_get_cached_suppressed_emails(self, threshold, version):
+        return self._postal_read_suppressed_emails(threshold)
+
+    @api.model
+    def _postal_read_suppressed_emails(self, threshold):
+        self.flush_model(['email', 'bounce_count'])
+        self.env.cr.execute(SQL(
+            "SELECT email FROM mail_postal_suppression WHERE bounce_count >= %s",
+            threshold,
+        ))
+        return frozenset(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _postal_suppression_changed(self):
+        """Bump the version of the suppression list once this transaction commits."""
+        data = self.env.cr.precommit.data
+        if data.get('dr_postal.suppression_changed'):
+            return
+        data['dr_postal.suppression_changed'] = True
+        registry = self.env.registry
+
+        @self.env.cr.postcommit.add
+        def bump_version():
+            with registry.cursor() as cr:
+                cr.execute(SQL("SELECT nextval(%s)", SUPPRESSION_VERSION_SEQUENCE))
+
+    @api.model
+    def _postal_record_bounces(self, bounces):
+        """Count permanent bounces per address with a single upsert.
+
+        Soft bounces (full mailbox, greylisting, ``4xx`` codes...) clear up on
+        their own and are not counted.
+
+        :param bounces: list of ``(recipient, event_datetime, error_message,
+            permanent)``; when ``permanent`` is False, the error message
+            decides whether the bounce is permanent
+        """
+        threshold = self._postal_get_bounce_threshold()
+        counters = defaultdict(lambda: [0, None, None, ''])
+        for recipient, event_datetime, error_message, permanent in bounces:
+            email = email_normalize(recipient or '')
+            if not email or not (permanent or is_permanent_failure(*parse_smtp_error(error_message))):
+                continue
+            counter = counters[email]
+            counter[0] += 1
+            counter[1] = min(counter[1] or event_datetime, event_datetime)
+            if not counter[2] or event_datetime >= counter[2]:
+                counter[2] = event_datetime
+                counter[3] = error_message or ''
+        if not counters:
+            return
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_suppression AS entry
+                      (email, bounce_count, first_bounce_date, last_bounce_date, last_error)
+               VALUES %s
+          ON CONFLICT (email) DO UPDATE
+                  SET bounce_count = entry.bounce_count + EXCLUDED.bounce_count,
+                      first_bounce_date = LEAST(entry.first_bounce_date, EXCLUDED.first_bounce_date),
+                      last_bounce_date = GREATEST(entry.last_bounce_date, EXCLUDED.last_bounce_date),
+                      last_error = EXCLUDED.last_error
+            RETURNING email, bounce_count""",
+            SQL(', ').join(SQL('(%s, %s, %s, %s, %s)', email, *counter) for email, counter in counters.items()),
+        ))
+        crossed = threshold and any(
+            bounce_count >= threshold > bounce_count - counters[email][0]
+            for email, bounce_count in self.env.cr.fetchall()
+        )
+        self.invalidate_model()
+        if crossed:
+            self._postal_suppression_changed()
+
+    def action_clear(self):
+        """Lift the suppression of these addresses."""
+        self.unlink()
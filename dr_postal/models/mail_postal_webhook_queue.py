@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2.errors import DeadlockDetected, LockNotAvailable, SerializationFailure, UniqueViolation
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from odoo.addons.dr_postal.tools.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+# Errors caused by concurrent transactions: the row is retried later
+TRANSIENT_ERRORS = (SerializationFailure, LockNotAvailable, DeadlockDetected)
+# Delay before retrying a row, doubled at each attempt up to the maximum
+RETRY_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+
+class MailPostalWebhookQueue(models.Model):
+    """Staging table for raw Postal webhook bodies.
+
+    In asynchronous mode the webhook controller only appends the raw body
+    here and answers immediately. A single cron drains the table in
+    batches, one worker at a time; rows are claimed with ``FOR UPDATE SKIP
+    LOCKED`` only so that a manual run next to the cron neither waits on it
+    nor processes the same webhook twice. Rows hitting
+    a concurrency error stay pending and are retried with an exponential
+    backoff; only rows that cannot be processed at all are marked failed.
+    """
+
+    _name = 'mail.postal.webhook.queue'
+    _description = 'Postal Webhook Queue'
+    _order = 'id'
+    _log_access = False
+
+    body = fields.Text(string='Raw Body', required=True)
+    received_date = fields.Datetime(
+        string='Received On',
+        required=True,
+        default=fields.Datetime.now,
+    )
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ], string='State', required=True, default='pending', index=True)
+    error_message = fields.Text(string='Error Message')
+    attempt_count = fields.Integer(string='Attempts', default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string='Next Attempt', readonly=True)
+
+    @api.model
+    def _enqueue(self, body):
+        """Append a raw webhook body to the queue with a single INSERT."""
+        self.env.cr.execute(SQL(
+            """INSERT INTO mail_postal_webhook_queue (body, received_date, state, attempt_count)
+               VALUES (%s, NOW() AT TIME ZONE 'UTC', 'pending', 0)""",
+            body,
+        ))
+
+    @api.model
+    def _get_backlog(self, limit, due_only=False):
+        """Return the number of pending rows, counting at most ``limit``.
+
+        With ``due_only``, rows waiting for their next attempt are left out.
+        """
+        self.env.cr.execute(SQL(
+            """SELECT COUNT(*) FROM (
+                   SELECT 1 FROM mail_postal_webhook_queue
+                    WHERE state = 'pending' %s
+                    LIMIT %s
+               ) pending""",
+            SQL("AND %s", self._get_due_condition()) if due_only else SQL(),
+            limit,
+        ))
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _get_due_condition(self):
+        return SQL("(next_attempt_date IS NULL OR next_attempt_date <= NOW() AT TIME ZONE 'UTC')")
+
+    @api.model
+    def _get_batch_size(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'dr_postal.webhook_queue_batch_size', 500
+        ))
+
+    @api.model
+    def _cron_process_queue(self):
+        """Drain the queue batch by batch, committing after each batch."""
+        batch_size = self._get_batch_size()
+        while True:
+            processed = self._process_batch(batch_size)
+            if not processed:
+                break
+            # the exact backlog does not matter, only whether work is left
+            remaining = self._get_backlog(batch_size * 10, due_only=True)
+            if not self.env['ir.cron']._commit_progress(processed, remaining=remaining):
+                break
+
+    @api.model
+    def _process_batch(self, limit):
+        """Claim up to ``limit`` pending rows and process them set-wise.
+
+        Returns the number of claimed rows. Successfully processed rows are
+        deleted. Rows that hit a concurrency error are kept pending for a
+        later attempt; rows that cannot be processed are kept with state
+        ``failed`` and their error message.
+        """
+        self.env.cr.execute(SQL(
+            """SELECT id, body, attempt_count
+                 FROM mail_postal_webhook_queue
+                WHERE state = 'pending' AND %s
+             ORDER BY id
+                LIMIT %s
+           FOR UPDATE SKIP LOCKED""",
+            self._get_due_condition(),
+            limit,
+        ))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return 0
+
+        failed = {}
+        retried = {}
+        entries = []
+        for row_id, body, __ in rows:
+            try:
+                data = json.loads(body)
+            except ValueError as e:
+                METRICS.count(None, 'error')
+                failed[row_id] = f'Invalid JSON: {e}'
+                continue
+            if not data or not isinstance(data, dict):
+                METRICS.count(None, 'error')
+                failed[row_id] = 'Empty payload'
+                continue
+            entries.append((row_id, data))
+
+        Event = self.env['mail.postal.event'].sudo()
+        try:
+            # counts are only kept if the batch commits, the rows are counted again below otherwise
+            with self.env.cr.savepoint(), METRICS.timer('process_batch'), METRICS.deferred():
+                Event._process_postal_events([data for __, data in entries])
+        except Exception:
+            _logger.warning('Postal webhook queue: batch failed, retrying row by row', exc_info=True)
+            for row_id, data in entries:
+                try:
+                    with self.env.cr.savepoint(), METRICS.deferred():
+                        Event._process_postal_event(data)
+                except UniqueViolation:
+                    # Already stored by a concurrent worker or webhook retry
+                    continue
+                except TRANSIENT_ERRORS as e:
+                    _logger.info('Postal webhook queue: row %s postponed after a concurrency error', row_id)
+                    METRICS.count(data.get('event'), 'retried')
+                    retried[row_id] = str(e)
+                except Exception as e:
+                    _logger.exception('Postal webhook queue: Error processing row %s', row_id)
+                    METRICS.count(data.get('event'), 'error')
+                    failed[row_id] = str(e)
+
+        if failed:
+            self.env.cr.execute(SQL(
+                """UPDATE mail_postal_webhook_queue
+                      SET state = 'failed', error_message = v.error
+                     FROM (VALUES %s) AS v(id, error)
+                    WHERE mail_postal_webhook_queue.id = v.id""",
+                SQL(', ').join(SQL('(%s, %s)', row_id, error) for row_id, error in failed.items()),
+            ))
+        if retried:
+            now = fields.Datetime.now()
+            attempts = {row_id: attempt_count for row_id, __, attempt_count in rows}
+            self.env.cr.execute(SQL(
+                """UPDATE mail_postal_webhook_queue
+                      SET attempt_count = COALESCE(attempt_count, 0) + 1, next_attempt_date = v.next_date, error_message = v.error
+                     FROM (VALUES %s) AS v(id, next_date, error)
+                    WHERE mail_postal_webhook_queue.id = v.id""",
+                SQL(', ').join(
+                    SQL('(%s, %s::timestamp, %s)', row_id, now + self._get_retry_delay(attempts[row_id] or 0), error)
+                    for row_id, error in retried.items()
+                ),
+            ))
+        done_ids = [row_id for row_id, __, __ in rows if row_id not in failed and row_id not in retried]
+        if done_ids:
+            self.env.cr.execute(SQL(
+                "DELETE FROM mail_postal_webhook_queue WHERE id = ANY(%s)",
+                done_ids,
+            ))
+        self.invalidate_model()
+        return len(rows)
+
+    @api.model
+    def _get_retry_delay(self, attempt_count):
+        """Return the delay before the attempt following ``attempt_count`` ones."""
+        return min(RETRY_DELAY * 2 ** min(attempt_count, 10), RETRY_MAX_DELAY)
+
+    def action_retry(self):
+        """Put failed rows back in the queue."""
+        self.write({'state': 'pending', 'error_message': False, 'attempt_count': 0, 'next_attempt_date': False})
@@ -14,6 +14,108 @@ class ResConfigSettings(models.TransientModel):
         help='Secret token used to authenticate incoming postal webhooks. '
              'This token will be part of your webhook URL.',
     )
+    dr_postal_webhook_verify_signature = fields.Boolean(
+        string='Verify Postal Signatures',
+        config_parameter='dr_postal.webhook_verify_signature',
+        help='Reject webhooks whose X-Postal-Signature header does not match '
+             'the public key of your Postal server.',
+    )
+    dr_postal_webhook_public_key = fields.Char(
+        string='Postal Public Key',
+        config_parameter='dr_postal.webhook_public_key',
+        help='Public key of your Postal server, as published in its DNS record '
+             '(the "p=" value) or in PEM format.',
+    )
+    dr_postal_webhook_async = fields.Boolean(
+        string='Asynchronous Webhook Processing',
+        config_parameter='dr_postal.webhook_async',
+        help='Only stage incoming webhooks in a queue and answer immediately. '
+             'A scheduled action processes the queue in batches.',
+    )
+    dr_postal_payload_offload_threshold = fields.Integer(
+        string='Payload Offload Threshold',
+        config_parameter='dr_postal.payload_offload_threshold',
+        help='Compressed webhook payloads larger than this size (in bytes) are '
+             'stored in the filestore instead of the database. 0 disables offloading.',
+    )
+    dr_postal_event_retention_days = fields.Integer(
+        string='Event Retention (days)',
+        config_parameter='dr_postal.event_retention_days',
+        help='Postal events older than this are rolled up into per-notification and '
+             'per-day summaries, then deleted. 0 keeps events forever.',
+    )
+    dr_postal_resend_rate = fields.Integer(
+        string='Mass Resend Rate',
+        config_parameter='dr_postal.resend_rate',
+        default=60,
+        help='Default number of mails per minute sent by mass resend jobs.',
+    )
+    dr_postal_coalesce_opens = fields.Boolean(
+        string='Coalesce Repeat Opens',
+        config_parameter='dr_postal.coalesce_opens',
+        help='Only count repeat opens and clicks of an already opened email instead of storing each event.',
+    )
+    dr_postal_open_sample_rate = fields.Float(
+        string='Stored Repeat Opens',
+        config_parameter='dr_postal.open_sample_rate',
+        default=0.0,
+        help='Fraction of coalesced repeat opens and clicks still stored as full events (0 to 1).',
+    )
+    dr_postal_suppression_bounce_threshold = fields.Integer(
+        string='Suppress After',
+        config_parameter='dr_postal.suppression_bounce_threshold',
+        default=2,
+        help='Number of bounces after which an address is no longer sent to. Leave 0 to disable suppression.',
+    )
+    dr_postal_api_url = fields.Char(
+        string='Postal URL',
+        config_parameter='dr_postal.api_url',
+        help='URL of the Postal web interface, used to query its HTTP API.',
+    )
+    dr_postal_api_key = fields.Char(
+        string='Postal API Key',
+        config_parameter='dr_postal.api_key',
+        help='API credential of the Postal mail server.',
+    )
+    dr_postal_reconcile_after_hours = fields.Integer(
+        string='Reconcile After',
+        config_parameter='dr_postal.reconcile_after_hours',
+        default=24,
+        help='Hours after which notifications still in Sent state are checked against the Postal API.',
+    )
+    dr_postal_metrics_token = fields.Char(
+        string='Metrics Token',
+        config_parameter='dr_postal.metrics_token',
+        help='Bearer token allowing a Prometheus server to scrape /postal/metrics.',
+    )
+    dr_postal_log_sample_rate = fields.Float(
+        string='Event Log Sample Rate',
+        config_parameter='dr_postal.log_sample_rate',
+        default=0.01,
+        help='Fraction of processed webhook events written to the server log (0 to 1).',
+    )
+    dr_postal_webhook_max_concurrency = fields.Integer(
+        string='Max Concurrent Webhooks',
+        config_parameter='dr_postal.webhook_max_concurrency',
+        help='Webhook requests handled at the same time by each worker; more are answered with 503. 0 for no limit.',
+    )
+    dr_postal_webhook_rate_limit = fields.Float(
+        string='Webhook Rate Limit',
+        config_parameter='dr_postal.webhook_rate_limit',
+        help='Webhook requests per second accepted from each source address by each worker; '
+             'more are answered with 429. 0 for no limit.',
+    )
+    dr_postal_webhook_max_backlog = fields.Integer(
+        string='Max Queue Backlog',
+        config_parameter='dr_postal.webhook_max_backlog',
+        help='Pending queue rows above which webhooks are answered with 503. 0 for no limit.',
+    )
+    dr_postal_webhook_retry_after = fields.Integer(
+        string='Retry After',
+        config_parameter='dr_postal.webhook_retry_after',
+        default=30,
+        help='Seconds after which Postal is asked to retry a rejected webhook.',
+    )
     dr_postal_webhook_url = fields.Char(
         string='Webhook URL',
         compute='_compute_webhook_url',
@@ -0,0 +1,10 @@
+/** @odoo-module **/
+
+import { Message } from "@mail/core/common/message_model";
+
+/**
+ * Delivery summary of the message, sent by the server instead of the
+ * notifications of every recipient: counts per postal state, and the worst
+ * and best state. See notification_patch.js for the ticks rendered from it.
+ */
+Message.prototype.postal_summary = undefined;
@@ -1,6 +1,7 @@
 /** @odoo-module **/
 
 import { registry } from "@web/core/registry";
+import { PostalTimelineDialog } from "./postal_timeline_dialog";
 
 /**
  * Store for the currently open popover's message ID.
@@ -12,12 +13,12 @@ export const postalPopoverState = {
 
 /**
  * Service to handle clicks on postal status icons in the notification popover.
- * Opens a clean wizard popup (like the resend dialog) instead of a list view.
+ * Opens the cached tracking timeline of the message in a dialog.
  */
 export const postalPopoverClickService = {
-    dependencies: ["action"],
+    dependencies: ["dialog"],
     
-    start(env, { action }) {
+    start(env, { dialog }) {
         console.log("DR_POSTAL: Postal popover click service started");
         
         // Global click handler for postal icons in popover
@@ -44,16 +45,8 @@ export const postalPopoverClickService = {
                 return;
             }
 
-            try {
-                // Call the wizard action by XMLID, passing message ID via context
-                await action.doAction("dr_postal.mail_postal_events_popup_action", {
-                    additionalContext: {
-                        default_mail_message_id: messageId,
-                    },
-                });
-            } catch (error) {
-                console.error("DR_POSTAL: Error opening popup", error);
-            }
+            // Timeline data is fetched (and cached) by the dialog itself
+            dialog.add(PostalTimelineDialog, { messageId });
         }, true);
         
         return {};
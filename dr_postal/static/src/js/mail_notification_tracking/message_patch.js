@@ -5,11 +5,14 @@ import { patch } from "@web/core/utils/patch";
 import { toRaw } from "@odoo/owl";
 import { markEventHandled } from "@web/core/utils/misc";
 import { postalPopoverState } from "./message_notification_popover_patch";
+import { PostalTimelineDialog } from "./postal_timeline_dialog";
 
 /**
  * Patch the Message component to:
  * 1. Store message ID when opening notification popover (for postal click handler)
  * 2. Open resend dialog for failed notifications
+ * 3. Open the tracking timeline of messages Postal reported on, whose
+ *    recipients are only fetched at that point
  */
 
 patch(Message.prototype, {
@@ -37,8 +40,14 @@ patch(Message.prototype, {
             return;
         }
         
+        // Tracked messages: load the recipients page by page on demand
+        if (message.postal_summary && message.postal_summary.best !== "none") {
+            this.env.services.dialog.add(PostalTimelineDialog, { messageId: message.id });
+            return;
+        }
+        
         // Default: show the regular popover
-        this.popover.open(ev.target, { message });
+        super.onClickNotification(ev);
     },
 });
 
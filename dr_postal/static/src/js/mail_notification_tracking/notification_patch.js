@@ -16,10 +16,27 @@ import { _t } from "@web/core/l10n/translation";
  * - Red envelope (Odoo default): Bounced/Failed (keeps popup functionality)
  */
 
+// Postal states shown as ticks, from the least to the most advanced
+const POSTAL_TICK_STATES = ["none", "sent", "delivered", "opened"];
+
 /** @type {import("models").Notification} */
 const notificationPatch = {
+    /**
+     * Postal state shown for the message: the least advanced state of its
+     * recipients according to the message summary (bounced recipients are
+     * reported as failures), or the state of this notification when the
+     * message has no summary.
+     */
+    get postalDisplayState() {
+        const summary = this.mail_message_id?.postal_summary;
+        if (!summary) {
+            return this.postal_state;
+        }
+        return POSTAL_TICK_STATES.find((state) => summary.counts[state] > 0) || "none";
+    },
+
     get statusIcon() {
-        const postalState = this.postal_state;
+        const postalState = this.postalDisplayState;
         
         // For bounces/failures, let Odoo handle it (popup needs to work)
         if (this.isFailure) {
@@ -47,13 +64,20 @@ const notificationPatch = {
     },
 
     get statusTitle() {
-        const postalState = this.postal_state;
+        const postalState = this.postalDisplayState;
+        const summary = this.mail_message_id?.postal_summary;
         
         // For bounces/failures, let Odoo handle it
         if (this.isFailure) {
             return super.statusTitle;
         }
         
+        if (summary && summary.total > 1 && postalState !== "none") {
+            return _t("Read by %(opened)s of %(total)s recipients - Click for details", {
+                opened: summary.counts.opened,
+                total: summary.total,
+            });
+        }
         if (postalState === "opened") {
             return _t("Read - Click for details");
         }
@@ -77,7 +101,7 @@ const notificationPatch = {
      * Check if this notification has postal tracking (can show popup)
      */
     get hasPostalTracking() {
-        const postalState = this.postal_state;
+        const postalState = this.postalDisplayState;
         return postalState && postalState !== "none";
     },
 };
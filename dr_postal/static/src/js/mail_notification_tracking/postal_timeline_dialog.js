@@ -0,0 +1,62 @@
+/** @odoo-module **/
+
+import { Component, onWillStart, useState } from "@odoo/owl";
+import { Dialog } from "@web/core/dialog/dialog";
+import { deserializeDateTime, formatDateTime } from "@web/core/l10n/dates";
+import { useService } from "@web/core/utils/hooks";
+
+const PAGE_SIZE = 20;
+
+/**
+ * Compact tracking timeline of a message: one row per recipient with the
+ * number of events and the first / last event time for each event type.
+ */
+export class PostalTimelineDialog extends Component {
+    static template = "dr_postal.PostalTimelineDialog";
+    static components = { Dialog };
+    static props = {
+        messageId: Number,
+        close: Function,
+    };
+
+    setup() {
+        this.timeline = useService("postal_timeline");
+        this.state = useState({ offset: 0, data: null });
+        onWillStart(() => this.load());
+    }
+
+    async load() {
+        this.state.data = await this.timeline.fetch(this.props.messageId, {
+            offset: this.state.offset,
+            limit: PAGE_SIZE,
+        });
+    }
+
+    get hasPrevious() {
+        return this.state.offset > 0;
+    }
+
+    get hasNext() {
+        return this.state.offset + PAGE_SIZE < this.state.data.total;
+    }
+
+    get pagerLabel() {
+        const { total } = this.state.data;
+        const last = Math.min(this.state.offset + PAGE_SIZE, total);
+        return `${total ? this.state.offset + 1 : 0}-${last} / ${total}`;
+    }
+
+    async onClickPrevious() {
+        this.state.offset = Math.max(this.state.offset - PAGE_SIZE, 0);
+        await this.load();
+    }
+
+    async onClickNext() {
+        this.state.offset += PAGE_SIZE;
+        await this.load();
+    }
+
+    formatDate(value) {
+        return value ? formatDateTime(deserializeDateTime(value)) : "";
+    }
+}
@@ -0,0 +1,60 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
+
+/**
+ * Client-side cache of the per-message tracking timelines.
+ *
+ * Pages are fetched from /postal/timeline and kept until the server reports
+ * (over the bus) that new events arrived for the message, or until they
+ * expire: the server only notifies the authors and followers of the thread.
+ */
+export const TIMELINE_CACHE_TTL = 60 * 1000;
+
+export const postalTimelineService = {
+    dependencies: ["bus_service"],
+
+    start(env, { bus_service }) {
+        const cache = new Map();
+
+        bus_service.subscribe("dr_postal.timeline/invalidate", ({ message_ids }) => {
+            for (const messageId of message_ids) {
+                cache.delete(messageId);
+            }
+        });
+
+        return {
+            /**
+             * @param {number} messageId
+             * @param {{ offset?: number, limit?: number }} [options]
+             * @returns {Promise<Object>} one page of recipients with event stats
+             */
+            async fetch(messageId, { offset = 0, limit = 20 } = {}) {
+                if (!cache.has(messageId)) {
+                    cache.set(messageId, new Map());
+                }
+                const pages = cache.get(messageId);
+                const key = `${offset}:${limit}`;
+                const page = pages.get(key);
+                if (!page || Date.now() - page.fetchedAt > TIMELINE_CACHE_TTL) {
+                    pages.set(key, {
+                        fetchedAt: Date.now(),
+                        promise: rpc("/postal/timeline", { message_id: messageId, offset, limit }),
+                    });
+                }
+                const { promise } = pages.get(key);
+                try {
+                    return await promise;
+                } catch (error) {
+                    if (pages.get(key)?.promise === promise) {
+                        pages.delete(key);
+                    }
+                    throw error;
+                }
+            },
+        };
+    },
+};
+
+registry.category("services").add("postal_timeline", postalTimelineService);
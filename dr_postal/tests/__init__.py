@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from . import test_postal_bus
+from . import test_postal_export
+from . import test_postal_payload
+from . import test_postal_reconcile
+from . import test_postal_replay
+from . import test_postal_resend_job
+from . import test_postal_retention
+from . import test_postal_simulator
+from . import test_postal_stat
+from . import test_postal_suppression
+from . import test_postal_summary
+from . import test_webhook_controller
+from . import test_webhook_performance
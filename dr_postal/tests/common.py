@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import statistics
+import time
+import uuid
+
+from odoo.tests import common
+
+_logger = logging.getLogger(__name__)
+
+
+class PostalCase(common.TransactionCase):
+    """Seed a message with email notifications and build Postal envelopes."""
+
+    RECIPIENT_COUNT = 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('dr_postal.webhook_token', 'test-token')
+        cls.author = cls.env['res.partner'].create({'name': 'Postal Author', 'email': 'author@example.com'})
+        cls.record = cls.env['res.partner'].create({'name': 'Tracked Record'})
+        cls.recipients = cls.env['res.partner'].create([{
+            'name': f'Recipient {index}',
+            'email': f'recipient{index}@example.com',
+        } for index in range(cls.RECIPIENT_COUNT)])
+        cls.message = cls._create_tracked_message('<postal-test-message@example.com>', cls.recipients)
+
+    @classmethod
+    def _create_tracked_message(cls, message_id, partners):
+        message = cls.env['mail.message'].create({
+            'model': cls.record._name,
+            'res_id': cls.record.id,
+            'message_type': 'email',
+            'message_id': message_id,
+            'author_id': cls.author.id,
+            'body': '<p>Tracked</p>',
+        })
+        cls.env['mail.notification'].create([{
+            'mail_message_id': message.id,
+            'res_partner_id': partner.id,
+            'notification_type': 'email',
+            'notification_status': 'sent',
+        } for partner in partners])
+        return message
+
+    def _envelope(self, event_name, recipient, message=None):
+        """Return a Postal webhook envelope for ``recipient`` of ``message``."""
+        message = message or self.message
+        message_data = {
+            # Postal creates one message, with its own id and token, per recipient
+            'id': message.id * 100000 + recipient.id,
+            'token': f'token{message.id}x{recipient.id}',
+            'message_id': message.message_id.strip('<>'),
+            'to': recipient.email,
+            'from': self.author.email,
+        }
+        payload = {'status': 'Sent', 'details': 'Message sent', 'message': message_data}
+        if event_name == 'MessageBounced':
+            payload = {'original_message': message_data, 'bounce': {'from': 'mailer-daemon@example.com', 'subject': 'Undelivered'}}
+        elif event_name == 'MessageLinkClicked':
+            payload.update({'url': 'https://example.com', 'ip_address': '127.0.0.1'})
+        return {
+            'event': event_name,
+            'timestamp': time.time(),
+            'uuid': str(uuid.uuid4()),
+            'payload': payload,
+        }
+
+    def _benchmark(self, label, envelopes, process):
+        """Process ``envelopes`` one by one and log throughput and latency."""
+        durations = []
+        started = time.perf_counter()
+        for envelope in envelopes:
+            start = time.perf_counter()
+            process(envelope)
+            durations.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - started
+        quantiles = statistics.quantiles(durations, n=100) if len(durations) > 1 else durations * 99
+        _logger.info(
+            'Postal benchmark %s: %d events, %.1f events/s, p50 %.2fms, p95 %.2fms, p99 %.2fms',
+            label, len(envelopes), len(envelopes) / elapsed,
+            quantiles[49] * 1000, quantiles[94] * 1000, quantiles[98] * 1000,
+        )
+        return durations
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from odoo.tests import tagged
+
+from odoo.addons.mail.tests.common import MailCase, mail_new_test_user
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalBus(PostalCase, MailCase):
+    """State changes are pushed to the author once per transaction."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = mail_new_test_user(cls.env, login='postal_author', groups='base.group_user')
+        cls.message.author_id = cls.user_author.partner_id
+        cls.user_follower = mail_new_test_user(cls.env, login='postal_follower', groups='base.group_user')
+        cls.record.message_subscribe(partner_ids=(cls.user_follower.partner_id | cls.recipients[5]).ids)
+
+    def _postal_pushes(self, partner):
+        channel = [self.env.cr.dbname, partner._name, partner.id]
+        return [
+            message['payload']
+            for message in (
+                json.loads(bus.message) for bus in self.env['bus.bus'].sudo().search([])
+                if json.loads(bus.channel) == channel
+            )
+            if message['type'] == 'mail.record/insert' and 'mail.notification' in message['payload']
+        ]
+
+    def test_bus_updates_coalesced(self):
+        Event = self.env['mail.postal.event'].sudo()
+        self.env.cr.precommit.run()
+        self._reset_bus()
+        precommit_count = len(self.env.cr.precommit._funcs)
+
+        Event._process_postal_events([
+            self._envelope('MessageSent', self.recipients[0]),
+            self._envelope('MessageSent', self.recipients[1]),
+        ])
+        Event._process_postal_event(self._envelope('MessageLoaded', self.recipients[0]))
+        Event._process_postal_event(self._envelope('MessageBounced', self.recipients[2]))
+
+        # nothing is sent before commit, and a single flush is scheduled
+        self.assertFalse(self._postal_pushes(self.user_author.partner_id))
+        self.assertEqual(len(self.env.cr.precommit.data['dr_postal.bus_notification_ids']), 3)
+        self.assertEqual(
+            sum(1 for func in self.env.cr.precommit._funcs if getattr(func, '__name__', '') == '_postal_send_bus_updates'),
+            1,
+        )
+        self.assertGreater(len(self.env.cr.precommit._funcs), precommit_count)
+
+        self.env.cr.precommit.run()
+        notifications = self.message.notification_ids.filtered(lambda n: n.res_partner_id in self.recipients[:3])
+        # the author and the internal followers of the thread get one push each
+        for partner in self.user_author.partner_id | self.user_follower.partner_id:
+            pushes = self._postal_pushes(partner)
+            self.assertEqual(len(pushes), 1)
+            self.assertEqual(
+                {(values['id'], values['postal_state']) for values in pushes[0]['mail.notification']},
+                {(notification.id, notification.postal_state) for notification in notifications},
+            )
+            self.assertEqual(
+                pushes[0]['mail.message'], [{'id': self.message.id, 'postal_summary': self.message.postal_summary}],
+            )
+        # followers without internal user are not pushed to
+        self.assertFalse(self._postal_pushes(self.recipients[5]))
+        self.assertNotIn('dr_postal.bus_notification_ids', self.env.cr.precommit.data)
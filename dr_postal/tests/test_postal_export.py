@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import json
+
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalExport(PostalCase):
+    """Streaming export of postal events."""
+
+    def setUp(self):
+        super().setUp()
+        self.Event = self.env['mail.postal.event'].sudo()
+        self.envelopes = [self._envelope('MessageSent', recipient) for recipient in self.recipients[:5]]
+        self.Event._process_postal_events(self.envelopes)
+
+    def test_export_jsonl_with_payload(self):
+        chunks = self.Event._postal_export_chunks(
+            'jsonl', chunk_size=2, columns=['id', 'recipient', 'payload'], event_types=['sent'],
+        )
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set(rows[0]), {'id', 'recipient', 'payload'})
+        self.assertEqual(
+            {json.loads(row['payload'])['uuid'] for row in rows},
+            {envelope['uuid'] for envelope in self.envelopes},
+        )
+
+    def test_export_csv_default_columns(self):
+        content = b''.join(self.Event._postal_export_chunks('csv')).decode()
+        reader = csv.DictReader(io.StringIO(content))
+        self.assertNotIn('payload', reader.fieldnames)
+        self.assertEqual(
+            {row['recipient_normalized'] for row in reader},
+            {recipient.email_normalized for recipient in self.recipients[:5]},
+        )
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import importlib.util
+import json
+import zlib
+
+from odoo.tests import tagged
+from odoo.tools.misc import file_path
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalPayload(PostalCase):
+    """Payloads are stored minified and compressed, inline or in the filestore."""
+
+    def _process(self, envelope):
+        Event = self.env['mail.postal.event'].sudo()
+        return Event.browse(Event._process_postal_event(envelope)['event_id'])
+
+    def test_payload_round_trip(self):
+        envelope = self._envelope('MessageSent', self.recipients[0])
+        event = self._process(envelope)
+        self.assertTrue(event.payload_data)
+        self.assertFalse(event.with_context(bin_size=False).payload_file)
+        minified = json.dumps(envelope, separators=(',', ':'), ensure_ascii=False).encode()
+        self.assertEqual(event.payload_size, len(minified))
+        self.assertEqual(zlib.decompress(base64.b64decode(event.payload_data)), minified)
+        self.assertEqual(json.loads(event.payload_json), envelope)
+
+        # editing the payload stores it compressed again
+        envelope['payload']['details'] = 'Edited'
+        event.payload_json = json.dumps(envelope)
+        self.assertEqual(json.loads(event.payload_json)['payload']['details'], 'Edited')
+
+    def test_payload_offload(self):
+        envelope = self._envelope('MessageSent', self.recipients[0])
+        compressed_size = len(self.env['mail.postal.event']._postal_encode_payload(envelope)['payload_data'])
+        ICP = self.env['ir.config_parameter'].sudo()
+
+        ICP.set_param('dr_postal.payload_offload_threshold', compressed_size)
+        inline = self._process(envelope)
+        self.assertTrue(inline.payload_data)
+
+        ICP.set_param('dr_postal.payload_offload_threshold', compressed_size - 1)
+        envelope = self._envelope('MessageSent', self.recipients[1])
+        offloaded = self._process(envelope)
+        self.assertFalse(offloaded.payload_data)
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', offloaded._name), ('res_field', '=', 'payload_file'), ('res_id', '=', offloaded.id),
+        ])
+        self.assertEqual(len(attachment), 1)
+        self.assertEqual(json.loads(offloaded.payload_json), envelope)
+        self.assertEqual(
+            json.loads(offloaded._postal_export_payload(None, attachment.store_fname, attachment.db_datas)),
+            envelope,
+        )
+
+    def test_legacy_payloads(self):
+        events = self.env['mail.postal.event'].concat(*(
+            self._process(self._envelope('MessageSent', recipient)) for recipient in self.recipients[:2]
+        ))
+        legacy = {'event': 'MessageSent', 'payload': {'details': 'Stored before compression'}}
+        # payloads of older versions were kept as plain text in payload_json
+        self.env.cr.execute("ALTER TABLE mail_postal_event ADD COLUMN payload_json text")
+        self.env.cr.execute(
+            "UPDATE mail_postal_event SET payload_json = %s, payload_data = NULL WHERE id = %s",
+            [json.dumps(legacy, indent=2), events[0].id],
+        )
+        self.env.cr.execute(
+            "UPDATE mail_postal_event SET payload_json = %s, payload_data = NULL WHERE id = %s",
+            ['not json', events[1].id],
+        )
+
+        spec = importlib.util.spec_from_file_location(
+            'dr_postal_migration_19_0_1_1_0', file_path('dr_postal/migrations/19.0.1.1.0/post-migrate.py'),
+        )
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        migration.migrate(self.env.cr, '19.0.1.0.0')
+        events.invalidate_recordset()
+
+        self.assertEqual(json.loads(events[0].payload_json), legacy)
+        self.assertEqual(events[0].payload_size, len(json.dumps(legacy, separators=(',', ':')).encode()))
+        self.assertEqual(events[1].payload_json, 'not json')
+        self.env.cr.execute(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'mail_postal_event' AND column_name = 'payload_json'"
+        )
+        self.assertFalse(self.env.cr.fetchone())
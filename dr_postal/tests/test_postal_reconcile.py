@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+
+class PostalAPIStandIn(BaseHTTPRequestHandler):
+    """Answer ``messages/deliveries`` calls from the ``deliveries`` of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        params = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, self.headers.get('X-Server-API-Key'), params))
+        if self.path == '/api/v1/messages/deliveries' and params.get('id') in self.server.deliveries:
+            result = {'status': 'success', 'data': self.server.deliveries[params['id']]}
+        else:
+            result = {'status': 'error', 'data': {'message': 'No message found matching provided ID'}}
+        body = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@tagged('post_install', '-at_install')
+class TestPostalReconcile(PostalCase):
+    """Reconciliation of stuck notifications against a local Postal API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PostalAPIStandIn)
+        cls.server.deliveries = {}
+        cls.server.requests = []
+        thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        thread.start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.env['ir.config_parameter'].sudo().set_param('dr_postal.api_url', 'http://127.0.0.1:%s' % cls.server.server_port)
+        cls.env['ir.config_parameter'].sudo().set_param('dr_postal.api_key', 'test-api-key')
+
+    def test_reconcile_stuck_notifications(self):
+        Event = self.env['mail.postal.event'].sudo()
+        bounced, delivered = self.recipients[:2]
+        for recipient in (bounced, delivered):
+            Event._process_postal_event(self._envelope('MessageSent', recipient))
+        self.message.date = fields.Datetime.now() - timedelta(days=2)
+        mappings = self.env['mail.postal.message.map'].search([('message_id', '=', self.message.id)])
+        by_partner = {mapping.notification_id.res_partner_id: mapping for mapping in mappings}
+        self.server.deliveries = {
+            by_partner[bounced].postal_message_id: [
+                {'id': 1, 'status': 'SoftFail', 'details': 'Greylisted', 'timestamp': 1700000000.0},
+                {'id': 2, 'status': 'HardFail', 'details': 'Mailbox unavailable', 'output': '550 5.1.1', 'timestamp': 1700000600.0},
+            ],
+            by_partner[delivered].postal_message_id: [
+                {'id': 3, 'status': 'Sent', 'details': 'Message accepted', 'timestamp': 1700000000.0},
+            ],
+        }
+
+        Delta = self.env['mail.postal.stat.delta'].sudo()
+        event_domain = [('message_id', '=', self.message.id)]
+        self.assertEqual(Event.search_count(event_domain), 2)
+        stat_count = sum(Delta.search([]).mapped('event_count'))
+
+        self.env['mail.notification']._cron_postal_reconcile_states()
+
+        notifications = self.message.notification_ids
+        self.assertEqual(notifications.filtered(lambda n: n.res_partner_id == bounced).postal_state, 'bounced')
+        self.assertEqual(notifications.filtered(lambda n: n.res_partner_id == delivered).postal_state, 'sent')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertTrue(all(api_key == 'test-api-key' for __, api_key, __ in self.server.requests))
+        self.assertTrue(all(mappings.mapped('reconcile_date')))
+        # only the hard failure is new: the Sent deliveries were already reported by webhooks
+        self.assertEqual(Event.search_count(event_domain), 3)
+        self.assertEqual(Event.search_count(event_domain + [('event_type', '=', 'bounced')]), 1)
+        self.assertEqual(sum(Delta.search([]).mapped('event_count')), stat_count + 1)
+
+        # already checked messages are skipped until the next period
+        self.env['mail.notification']._cron_postal_reconcile_states()
+        self.assertEqual(len(self.server.requests), 2)
+
+        # the next period only checks the notification still sent, and adds nothing
+        mappings.reconcile_date = fields.Datetime.now() - timedelta(days=2)
+        self.env['mail.notification']._cron_postal_reconcile_states()
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[-1][2]['id'], by_partner[delivered].postal_message_id)
+        self.assertEqual(Event.search_count(event_domain), 3)
+        self.assertEqual(sum(Delta.search([]).mapped('event_count')), stat_count + 1)
+
+    def test_reconcile_is_idempotent(self):
+        notification = self.message.notification_ids[0]
+        Event = self.env['mail.postal.event'].sudo()
+        Event._process_postal_event(self._envelope('MessageSent', notification.res_partner_id))
+        mapping = self.env['mail.postal.message.map'].search([('notification_id', '=', notification.id)])
+        deliveries = [{'id': 7, 'status': 'HardFail', 'details': 'Mailbox unavailable', 'timestamp': 1700000000.0}]
+        envelopes = self.env['mail.notification']._postal_delivery_envelopes(
+            mapping.postal_message_id, mapping.postal_token, mapping.message_key, deliveries,
+        )
+        Event._process_postal_events(envelopes)
+        results = Event._process_postal_events(envelopes)
+        self.assertEqual(results[0]['message'], 'Duplicate event, ignored')
+        self.assertEqual(Event.search_count([('notification_id', '=', notification.id), ('event_type', '=', 'bounced')]), 1)
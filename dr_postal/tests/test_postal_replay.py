@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalReplay(PostalCase):
+    """Replay of stored events after the matching data changed."""
+
+    def test_replay_unmatched_events(self):
+        Event = self.env['mail.postal.event'].sudo()
+        recipient = self.recipients[0]
+        envelope = self._envelope('MessageBounced', recipient)
+        message_data = envelope['payload']['original_message']
+        message_data.update({'id': 987654, 'token': 'late-token', 'message_id': 'late-message@example.com'})
+        event = Event.browse(Event._process_postal_event(envelope)['event_id'])
+        self.assertFalse(event.notification_id)
+
+        # the message is only known to Odoo afterwards, e.g. imported late
+        message = self._create_tracked_message('<late-message@example.com>', recipient)
+        job = self.env['mail.postal.replay.job'].create({'scope': 'unmatched', 'partition_count': 3})
+        job.action_start()
+        self.assertEqual(job.total_count, Event.search_count([('notification_id', '=', False)]))
+        job._cron_process_jobs()
+
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(event.notification_id, message.notification_ids)
+        self.assertEqual(message.notification_ids.postal_state, 'bounced')
+        self.assertEqual(job.matched_count, 1)
+        self.assertEqual(job.state_changed_count, 1)
+
+        # replaying again changes nothing
+        job_again = self.env['mail.postal.replay.job'].create({'scope': 'all', 'partition_count': 2})
+        job_again.action_start()
+        job_again._cron_process_jobs()
+        self.assertEqual(job_again.matched_count + job_again.remapped_count + job_again.state_changed_count, 0)
+
+    def test_replay_after_resend(self):
+        Event = self.env['mail.postal.event'].sudo()
+        recipient = self.recipients[0]
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == recipient)
+        bounce = self._envelope('MessageBounced', recipient)
+        bounce['timestamp'] -= 3600
+        Event._process_postal_event(bounce)
+        self.assertEqual(notification.postal_state, 'bounced')
+
+        # resending resets the notification: the old bounce no longer applies
+        notification.write({'notification_status': 'sent', 'failure_type': False, 'postal_state': 'none'})
+        self.assertTrue(notification.postal_reset_date)
+        Event._process_postal_event(self._envelope('MessageSent', recipient))
+        self.assertEqual(notification.postal_state, 'sent')
+
+        job = self.env['mail.postal.replay.job'].create({'scope': 'all', 'partition_count': 2})
+        job.action_start()
+        job._cron_process_jobs()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.state_changed_count, 0)
+        self.assertEqual(notification.postal_state, 'sent')
+        self.assertEqual(notification.notification_status, 'sent')
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.mail.tests.common import MockEmail
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalResendJob(PostalCase, MockEmail):
+    """Mass resend jobs send in chunks, within their rate, and reset states."""
+
+    def test_resend_job(self):
+        self.env['ir.config_parameter'].sudo().set_param('dr_postal.resend_chunk_size', 2)
+        failed = self.message.notification_ids.sorted('id')[:5]
+        failed.write({
+            'notification_status': 'bounce',
+            'failure_type': 'mail_bounce',
+            'postal_state': 'bounced',
+        })
+        job = self.env['mail.postal.resend.job'].sudo().create({'send_rate': 3})
+        job.action_start()
+        self.assertEqual(job.total_count, 5)
+
+        # the first run sends one budget worth of mails, in chunks
+        with self.mock_mail_gateway():
+            job._cron_process_jobs()
+        self.assertEqual(len(self._mails), 3)
+        self.assertEqual((job.processed_count, job.rate_window_count, job.state), (3, 3, 'running'))
+        resent = failed[:3]
+        self.assertEqual(set(resent.mapped('postal_state')), {'none'})
+        self.assertEqual(set(resent.mapped('notification_status')), {'sent'})
+        self.assertFalse(any(resent.mapped('failure_type')))
+        self.assertEqual(self.message.postal_summary['counts']['bounced'], 2)
+
+        # the budget is per minute, whatever the number of runs
+        with self.mock_mail_gateway():
+            job._cron_process_jobs()
+        self.assertEqual(len(self._mails), 0)
+        self.assertEqual(job.processed_count, 3)
+
+        job.rate_window_start = fields.Datetime.now() - timedelta(minutes=1)
+        with self.mock_mail_gateway():
+            job._cron_process_jobs()
+        self.assertEqual(len(self._mails), 2)
+        self.assertEqual((job.processed_count, job.failed_count, job.state), (5, 0, 'done'))
+        self.assertEqual(set(failed.mapped('postal_state')), {'none'})
+        self.assertEqual(self.message.postal_summary['counts']['bounced'], 0)
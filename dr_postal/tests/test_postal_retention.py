@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tools.sql import index_exists
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalRetention(PostalCase):
+    """Old events are rolled up into summaries before being deleted."""
+
+    def test_purge_last_event_index(self):
+        """Deleting an event nulls notification references through an index."""
+        self.assertTrue(index_exists(self.env.cr, 'mail_notification__postal_last_event_id_index'))
+        self.env.cr.execute("""
+            SELECT indexdef FROM pg_indexes
+             WHERE tablename = 'mail_notification' AND indexname = 'mail_notification__postal_last_event_id_index'
+        """)
+        self.assertIn('postal_last_event_id IS NOT NULL', self.env.cr.fetchone()[0])
+
+    def test_purge_events(self):
+        Event = self.env['mail.postal.event'].sudo()
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('dr_postal.event_retention_days', 30)
+        ICP.set_param('dr_postal.event_purge_batch_size', 2)
+        # offload every payload, to check attachments go away with their events
+        ICP.set_param('dr_postal.payload_offload_threshold', 1)
+        opener, sender, recent = self.recipients[:3]
+        Event._process_postal_events([
+            self._envelope('MessageSent', opener),
+            self._envelope('MessageLoaded', opener),
+            self._envelope('MessageLoaded', opener),
+            self._envelope('MessageSent', sender),
+        ])
+        old_events = Event.search([('message_id', '=', self.message.id)])
+        old_events.flush_recordset()
+        old_date = fields.Datetime.now() - timedelta(days=40)
+        self.env.cr.execute("UPDATE mail_postal_event SET event_datetime = %s WHERE id = ANY(%s)", [old_date, old_events.ids])
+        old_events.invalidate_recordset(['event_datetime'])
+        Event._process_postal_event(self._envelope('MessageSent', recent))
+        Daily = self.env['mail.postal.event.daily'].sudo()
+        daily_domain = [('date', '=', old_date.date())]
+        daily_before = {daily.event_type: daily.event_count for daily in Daily.search(daily_domain)}
+
+        Event._cron_purge_events()
+
+        # only the recent event is kept, with its offloaded payload
+        self.assertFalse(old_events.exists())
+        self.assertEqual(Event.search_count([('message_id', '=', self.message.id)]), 1)
+        self.assertFalse(self.env['ir.attachment'].sudo().search_count([
+            ('res_model', '=', Event._name), ('res_field', '=', 'payload_file'), ('res_id', 'in', old_events.ids),
+        ]))
+        summaries = self.env['mail.postal.event.summary'].sudo().search([('message_id', '=', self.message.id)])
+        self.assertEqual(
+            sorted((summary.notification_id.res_partner_id.id, summary.event_type, summary.event_count)
+                   for summary in summaries),
+            sorted([(opener.id, 'sent', 1), (opener.id, 'opened', 2), (sender.id, 'sent', 1)]),
+        )
+        daily_after = {daily.event_type: daily.event_count for daily in Daily.search(daily_domain)}
+        self.assertEqual(daily_after.get('sent', 0) - daily_before.get('sent', 0), 2)
+        self.assertEqual(daily_after.get('opened', 0) - daily_before.get('opened', 0), 2)
+
+        # the timeline still reports the rolled up events
+        timeline = self.message._postal_get_timeline(limit=self.RECIPIENT_COUNT)
+        events = {row['notification_id']: row['events'] for row in timeline['recipients']}
+        opener_events = events[self.message.notification_ids.filtered(lambda n: n.res_partner_id == opener).id]
+        self.assertEqual(opener_events['opened']['count'], 2)
+        self.assertEqual(opener_events['sent']['count'], 1)
+        recent_events = events[self.message.notification_ids.filtered(lambda n: n.res_partner_id == recent).id]
+        self.assertEqual(recent_events['sent']['count'], 1)
+
+        # purging again finds nothing left to roll up
+        Event._cron_purge_events()
+        self.assertEqual(sum(summaries.mapped('event_count')), 4)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import smtplib
+import threading
+from email.message import EmailMessage
+
+from odoo.tests import tagged
+
+from odoo.addons.dr_postal.tools.postal_simulator import PostalSimulator, Scenario, SMTPSink
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalSimulator(PostalCase):
+    """Webhook sequences of the simulator drive notifications to their final state."""
+
+    def test_simulated_sequences(self):
+        received = []
+        sink = SMTPSink(('127.0.0.1', 0), lambda *mail: received.append(mail))
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        self.addCleanup(sink.server_close)
+        self.addCleanup(sink.shutdown)
+
+        notifications = self.message.notification_ids.sorted('id')[:8]
+        with smtplib.SMTP(*sink.server_address) as smtp:
+            for notification in notifications:
+                mail = EmailMessage()
+                mail['From'] = self.author.email
+                mail['To'] = notification.res_partner_id.email
+                mail['Subject'] = 'Tracked'
+                mail['Message-ID'] = self.message.message_id
+                mail['X-Odoo-Tracking-UUID'] = notification.postal_tracking_uuid
+                mail['X-Odoo-Message-Id'] = str(self.message.id)
+                mail.set_content('Tracked')
+                smtp.send_message(mail)
+        self.assertEqual(len(received), len(notifications))
+
+        # out of order on purpose: events are processed in firing order
+        simulator = PostalSimulator(Scenario(bounce_rate=0.3, open_rate=0.6, reorder_rate=0.5, seed=42))
+        deliveries, planned = [], []
+        for mail in received:
+            for delivery in simulator.deliveries(*mail):
+                deliveries.append(delivery)
+                planned += simulator.scenario.plan(delivery)
+        self.assertEqual(sum(delivery.pending for delivery in deliveries), len(planned))
+        planned.sort(key=lambda fire: fire[0])
+        self.env['mail.postal.event'].sudo()._process_postal_events([envelope for __, envelope in planned])
+
+        by_uuid = {notification.postal_tracking_uuid: notification for notification in notifications}
+        for delivery in deliveries:
+            self.assertEqual(by_uuid[delivery.tracking_uuid].postal_state, delivery.final_state)
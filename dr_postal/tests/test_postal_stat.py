@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalStat(PostalCase):
+    """Statistics are appended by the webhooks and folded by a cron."""
+
+    def test_stats_folded_from_deltas(self):
+        Event = self.env['mail.postal.event'].sudo()
+        Stat = self.env['mail.postal.stat'].sudo()
+        Delta = self.env['mail.postal.stat.delta'].sudo()
+        Stat.search([]).unlink()
+        Delta.search([]).unlink()
+
+        Event._process_postal_events([
+            self._envelope('MessageSent', recipient) for recipient in self.recipients[:3]
+        ])
+        # the webhooks never touch the shared statistic rows
+        self.assertFalse(Stat.search_count([]))
+        self.assertEqual(sum(Delta.search([]).mapped('event_count')), 3)
+
+        Stat._cron_fold_deltas()
+        self.assertFalse(Delta.search_count([]))
+        stat = Stat.search([('recipient_domain', '=', 'example.com'), ('event_type', '=', 'sent')])
+        self.assertEqual(stat.event_count, 3)
+        self.assertEqual(stat.first_event_count, 3)
+
+        Event._process_postal_events([
+            self._envelope('MessageSent', self.recipients[0]),
+            self._envelope('MessageLoaded', self.recipients[0]),
+        ])
+        Stat._cron_fold_deltas()
+        self.assertEqual(stat.event_count, 4)
+        # a repeated Sent does not reach a new notification
+        self.assertEqual(stat.first_event_count, 3)
+        opened = Stat.search([('recipient_domain', '=', 'example.com'), ('event_type', '=', 'opened')])
+        self.assertEqual((opened.event_count, opened.first_event_count), (1, 1))
+
+    def test_latency_on_non_utc_server(self):
+        """Postal timestamps are read as UTC whatever the server timezone."""
+        Event = self.env['mail.postal.event'].sudo()
+        Stat = self.env['mail.postal.stat'].sudo()
+        Stat.search([]).unlink()
+        self.env['mail.postal.stat.delta'].sudo().search([]).unlink()
+        self.message.date = fields.Datetime.now()
+        try:
+            with patch.dict(os.environ, {'TZ': 'Asia/Kolkata'}):
+                time.tzset()
+                Event._process_postal_event(self._envelope('MessageSent', self.recipients[0]))
+        finally:
+            time.tzset()
+
+        event = Event.search([('message_id', '=', self.message.id)])
+        self.assertLess(abs((event.event_datetime - fields.Datetime.now()).total_seconds()), 60)
+        Stat._cron_fold_deltas()
+        stat = Stat.search([('event_type', '=', 'sent')])
+        self.assertEqual(stat.first_event_count, 1)
+        self.assertLess(stat.first_event_latency, 60)
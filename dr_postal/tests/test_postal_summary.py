@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalSummary(PostalCase):
+    """Per-message postal summaries follow every change of notification state."""
+
+    def assertSummary(self, message, worst, best, **counts):
+        expected = dict.fromkeys(('bounced', 'none', 'sent', 'delivered', 'opened'), 0)
+        expected.update(counts)
+        self.assertEqual(message.postal_summary, {
+            'counts': expected,
+            'total': sum(expected.values()),
+            'worst': worst,
+            'best': best,
+        })
+
+    def test_summary_follows_events(self):
+        Event = self.env['mail.postal.event'].sudo()
+        total = len(self.recipients)
+        self.assertSummary(self.message, 'none', 'none', none=total)
+
+        Event._process_postal_events([
+            self._envelope('MessageSent', self.recipients[0]),
+            self._envelope('MessageSent', self.recipients[1]),
+            self._envelope('MessageLoaded', self.recipients[1]),
+            self._envelope('MessageBounced', self.recipients[2]),
+        ])
+        self.assertSummary(self.message, 'bounced', 'opened', none=total - 3, sent=1, opened=1, bounced=1)
+
+        # repeated events do not move anything
+        Event._process_postal_events([
+            self._envelope('MessageLoaded', self.recipients[1]),
+            self._envelope('MessageBounced', self.recipients[2]),
+        ])
+        self.assertSummary(self.message, 'bounced', 'opened', none=total - 3, sent=1, opened=1, bounced=1)
+
+        # the bounce is lifted once its event is gone
+        bounced = self.message.notification_ids.filtered(lambda n: n.res_partner_id == self.recipients[2])
+        Event.search([('notification_id', '=', bounced.id)]).unlink()
+        bounced._postal_recompute_states()
+        self.assertSummary(self.message, 'none', 'opened', none=total - 3, sent=2, opened=1)
+
+    def test_summary_follows_orm_changes(self):
+        total = len(self.recipients)
+        notifications = self.message.notification_ids.sorted('id')
+        notifications[:2].write({'postal_state': 'sent'})
+        self.assertSummary(self.message, 'none', 'sent', none=total - 2, sent=2)
+
+        notifications[2:].unlink()
+        self.assertSummary(self.message, 'sent', 'sent', sent=2)
+
+        # notifications not sent by email are not counted
+        self.env['mail.notification'].create({
+            'mail_message_id': self.message.id,
+            'res_partner_id': self.author.id,
+            'notification_type': 'inbox',
+        })
+        self.assertSummary(self.message, 'sent', 'sent', sent=2)
+
+    def test_summary_fold_and_rebuild(self):
+        Event = self.env['mail.postal.event'].sudo()
+        Message = self.env['mail.message'].sudo()
+        total = len(self.recipients)
+        Message._cron_fold_postal_summaries()
+        Event._process_postal_events([
+            self._envelope('MessageSent', self.recipients[0]),
+            self._envelope('MessageBounced', self.recipients[1]),
+        ])
+        # webhooks only append deltas, the message row is left untouched
+        self.assertEqual(self.message.postal_sent_count, 0)
+        self.assertTrue(self.env['mail.postal.summary.delta'].search_count([('message_id', '=', self.message.id)]))
+        self.assertSummary(self.message, 'bounced', 'sent', none=total - 2, sent=1, bounced=1)
+
+        Message._cron_fold_postal_summaries()
+        self.assertFalse(self.env['mail.postal.summary.delta'].search_count([('message_id', '=', self.message.id)]))
+        self.assertEqual(self.message.postal_sent_count, 1)
+        self.assertEqual(self.message.postal_worst_state, 'bounced')
+        self.assertEqual(self.message.postal_best_state, 'sent')
+        self.assertSummary(self.message, 'bounced', 'sent', none=total - 2, sent=1, bounced=1)
+
+        # a full rebuild from the notifications gives the same counters
+        self.env.cr.execute("UPDATE mail_message SET postal_sent_count = 0 WHERE id = %s", [self.message.id])
+        Message._postal_rebuild_summaries()
+        self.assertSummary(self.message, 'bounced', 'sent', none=total - 2, sent=1, bounced=1)
+
+    def test_web_client_notifications(self):
+        notifications = self.message.notification_ids.sorted('id')
+        notifications[3].write({'notification_status': 'exception', 'failure_type': 'mail_smtp'})
+
+        # nothing reported by Postal yet: every notification is shipped
+        self.assertEqual(notifications._filtered_for_web_client(), notifications)
+
+        # once tracked, ticks come from the summary but failures are kept
+        self.env['mail.postal.event'].sudo()._process_postal_events([
+            self._envelope('MessageSent', self.recipients[0]),
+            self._envelope('MessageBounced', self.recipients[1]),
+        ])
+        bounced = notifications.filtered(lambda n: n.res_partner_id == self.recipients[1])
+        self.assertEqual(bounced.notification_status, 'bounce')
+        self.assertEqual(
+            notifications._filtered_for_web_client(),
+            notifications[0] | bounced | notifications[3],
+        )
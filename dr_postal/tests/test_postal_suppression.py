@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from odoo.addons.mail.tests.common import MockEmail
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestPostalSuppression(PostalCase, MockEmail):
+    """Addresses bouncing repeatedly are skipped at send time."""
+
+    def _create_mail(self, partners):
+        return self.env['mail.mail'].sudo().create({
+            'mail_message_id': self.message.id,
+            'recipient_ids': [(6, 0, partners.ids)],
+            'body_html': '<p>Tracked</p>',
+            'is_notification': True,
+        })
+
+    def _failure(self, recipient, output):
+        envelope = self._envelope('MessageDeliveryFailed', recipient)
+        envelope['payload'].update({'status': 'HardFail', 'details': 'Delivery failed', 'output': output})
+        return envelope
+
+    def test_suppression_after_repeated_bounces(self):
+        Event = self.env['mail.postal.event'].sudo()
+        Suppression = self.env['mail.postal.suppression'].sudo()
+        dead, alive = self.recipients[:2]
+        # temporary failures are not counted
+        Event._process_postal_event(self._failure(dead, '452 4.2.2 Mailbox full'))
+        Event._process_postal_event(self._failure(dead, '451 Greylisted, try again later'))
+        self.assertFalse(Suppression.search([('email', '=', dead.email_normalized)]))
+        Event._process_postal_event(self._failure(dead, '550 5.1.1 User unknown'))
+        self.assertNotIn(dead.email_normalized, Suppression._postal_get_suppressed_emails())
+        Event._process_postal_event(self._failure(dead, '550 5.1.1 User unknown'))
+        self.assertIn(dead.email_normalized, Suppression._postal_get_suppressed_emails())
+
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == dead)
+        notification.write({'notification_status': 'ready', 'postal_state': 'none'})
+        mail = self._create_mail(dead | alive)
+        self.assertEqual(mail._postal_skip_suppressed_recipients(), mail)
+        self.assertEqual(mail.recipient_ids, alive)
+        self.assertEqual(notification.notification_status, 'bounce')
+        self.assertEqual(notification.postal_state, 'bounced')
+
+        only_dead = self._create_mail(dead)
+        self.assertFalse(only_dead._postal_skip_suppressed_recipients())
+        self.assertEqual(only_dead.state, 'exception')
+
+        # clearing the entry lifts the suppression on this worker at once
+        Suppression.search([('email', '=', dead.email_normalized)]).action_clear()
+        self.assertNotIn(dead.email_normalized, Suppression._postal_get_suppressed_emails())
+
+    def test_suppressed_notification_survives_send(self):
+        Event = self.env['mail.postal.event'].sudo()
+        dead, alive = self.recipients[:2]
+        for __ in range(2):
+            Event._process_postal_event(self._failure(dead, '550 5.1.1 User unknown'))
+
+        mail = self._create_mail(dead | alive)
+        notifications = self.message.notification_ids.filtered(lambda n: n.res_partner_id in dead | alive)
+        notifications.write({
+            'mail_mail_id': mail.id,
+            'notification_status': 'ready',
+            'failure_type': False,
+            'failure_reason': False,
+            'postal_state': 'none',
+        })
+        with self.mock_mail_gateway():
+            mail.send()
+        self.assertEqual(len(self._mails), 1)
+        self.assertNotIn(dead.email, self._mails[0]['email_to'][0])
+
+        dead_notification = notifications.filtered(lambda n: n.res_partner_id == dead)
+        alive_notification = notifications - dead_notification
+        self.assertEqual(dead_notification.notification_status, 'bounce')
+        self.assertEqual(dead_notification.failure_type, 'mail_bounce')
+        self.assertEqual(dead_notification.postal_state, 'bounced')
+        self.assertEqual(alive_notification.notification_status, 'sent')
+
+    def test_suppression_after_hard_bounces(self):
+        """Bounce emails received by Postal have no SMTP code but are permanent."""
+        Event = self.env['mail.postal.event'].sudo()
+        Suppression = self.env['mail.postal.suppression'].sudo()
+        dead = self.recipients[0]
+        Event._process_postal_event(self._envelope('MessageBounced', dead))
+        self.assertEqual(Suppression.search([('email', '=', dead.email_normalized)]).bounce_count, 1)
+        self.assertNotIn(dead.email_normalized, Suppression._postal_get_suppressed_emails())
+        Event._process_postal_event(self._envelope('MessageBounced', dead))
+        self.assertIn(dead.email_normalized, Suppression._postal_get_suppressed_emails())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+from unittest.mock import patch
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from psycopg2.errors import SerializationFailure
+
+from odoo.tests import HttpCase, tagged
+
+from odoo.addons.dr_postal.tools.admission import RATE_LIMITER
+
+from .common import PostalCase
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookController(PostalCase, HttpCase):
+    """End-to-end checks of the /postal/webhook route."""
+
+    def _post(self, envelope, token='test-token'):
+        url = '/postal/webhook/%s' % token if token else '/postal/webhook'
+        return self.url_open(url, data=json.dumps(envelope), headers={'Content-Type': 'application/json'})
+
+    def test_webhook_creates_event(self):
+        response = self._post(self._envelope('MessageLoaded', self.recipients[0]))
+        self.assertEqual(response.status_code, 200)
+        event = self.env['mail.postal.event'].browse(response.json()['event_id'])
+        self.assertEqual(event.event_type, 'opened')
+        self.assertEqual(event.notification_id.res_partner_id, self.recipients[0])
+
+    def test_webhook_rejects_bad_token(self):
+        response = self._post(self._envelope('MessageSent', self.recipients[0]), token='wrong-token')
+        self.assertEqual(response.status_code, 403)
+
+    def test_webhook_queue(self):
+        self.env['ir.config_parameter'].sudo().set_param('dr_postal.webhook_async', True)
+        envelope = self._envelope('MessageSent', self.recipients[0])
+        response = self._post(envelope)
+        self.assertEqual(response.status_code, 202)
+        Queue = self.env['mail.postal.webhook.queue'].sudo()
+        self.assertEqual(Queue.search_count([]), 1)
+        Queue._process_batch(10)
+        self.assertFalse(Queue.search_count([]))
+        self.assertTrue(self.env['mail.postal.event'].search_count([('postal_uuid', '=', envelope['uuid'])]))
+
+    def test_webhook_queue_errors(self):
+        Queue = self.env['mail.postal.webhook.queue'].sudo()
+        Event = self.env['mail.postal.event'].sudo()
+        Queue._enqueue('not json')
+        Queue._enqueue(json.dumps(self._envelope('MessageSent', self.recipients[0])))
+        invalid, conflicting = Queue.search([], order='id')
+
+        # a concurrency error postpones the row, only invalid payloads fail
+        with patch.object(type(Event), '_process_postal_events', side_effect=SerializationFailure('conflict')):
+            self.assertEqual(Queue._process_batch(10), 2)
+        self.assertEqual(invalid.state, 'failed')
+        self.assertEqual(conflicting.state, 'pending')
+        self.assertEqual(conflicting.attempt_count, 1)
+        self.assertTrue(conflicting.next_attempt_date)
+        self.assertEqual(Queue._get_backlog(10), 1)
+        self.assertEqual(Queue._get_backlog(10, due_only=True), 0)
+        self.assertEqual(Queue._process_batch(10), 0)
+
+        conflicting.next_attempt_date = False
+        self.assertEqual(Queue._process_batch(10), 1)
+        self.assertFalse(conflicting.exists())
+
+    def test_webhook_rate_limit(self):
+        self.env['ir.config_parameter'].sudo().set_param('dr_postal.webhook_rate_limit', 1)
+        RATE_LIMITER._buckets.clear()
+        statuses = [
+            self._post(self._envelope('MessageSent', recipient)).status_code
+            for recipient in self.recipients[:3]
+        ]
+        # bursts of twice the rate are admitted
+        self.assertEqual(statuses[:2], [200, 200])
+        self.assertEqual(statuses[2], 429)
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookMetrics(PostalCase, HttpCase):
+    """Access to and format of the /postal/metrics endpoint."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('dr_postal.metrics_token', 'metrics-secret')
+
+    def _get_metrics(self, headers=None):
+        return self.url_open('/postal/metrics', headers=headers or {})
+
+    def test_metrics_access(self):
+        self.assertEqual(self._get_metrics().status_code, 403)
+        self.assertEqual(self._get_metrics({'Authorization': 'Bearer wrong-secret'}).status_code, 403)
+        self.assertEqual(self._get_metrics({'Authorization': 'Bearer metrics-secret'}).status_code, 200)
+        # logged in administrators do not need the token
+        self.authenticate('admin', 'admin')
+        self.assertEqual(self._get_metrics().status_code, 200)
+
+    def test_metrics_format(self):
+        self.url_open(
+            '/postal/webhook/test-token',
+            data=json.dumps(self._envelope('MessageSent', self.recipients[0])),
+            headers={'Content-Type': 'application/json'},
+        )
+        response = self._get_metrics({'Authorization': 'Bearer metrics-secret'})
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.text.splitlines()
+        self.assertIn('# TYPE dr_postal_webhook_stage_seconds histogram', lines)
+        self.assertIn('# TYPE dr_postal_webhook_events_total counter', lines)
+        samples = [line for line in lines if not line.startswith('#')]
+        self.assertTrue(samples)
+        for line in samples:
+            name, value = line.rsplit(' ', 1)
+            self.assertRegex(name, r'^dr_postal_webhook_\w+\{(\w+="[^"]*",)*\w+="[^"]*"\}$')
+            float(value)
+        self.assertTrue(any(
+            line.startswith('dr_postal_webhook_events_total{event="MessageSent",outcome="matched"') for line in samples
+        ))
+        self.assertTrue(any(
+            line.startswith('dr_postal_webhook_stage_seconds_bucket{stage="request"') and 'le="+Inf"' in line
+            for line in samples
+        ))
+
+@tagged('post_install', '-at_install')
+class TestWebhookSignature(PostalCase, HttpCase):
+    """Webhooks are only accepted with a valid Postal signature when enforced."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_der = cls.private_key.public_key().public_bytes(
+            serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        ICP = cls.env['ir.config_parameter'].sudo()
+        ICP.set_param('dr_postal.webhook_verify_signature', True)
+        # as published in the DNS record of the Postal server
+        ICP.set_param('dr_postal.webhook_public_key', 'p=%s;' % base64.b64encode(public_der).decode())
+
+    def _sign(self, body, algorithm=hashes.SHA256):
+        return base64.b64encode(self.private_key.sign(body, padding.PKCS1v15(), algorithm())).decode()
+
+    def _post_signed(self, body, headers):
+        return self.url_open(
+            '/postal/webhook/test-token', data=body, headers={'Content-Type': 'application/json', **headers},
+        )
+
+    def _body(self):
+        return json.dumps(self._envelope('MessageSent', self.recipients[0])).encode()
+
+    def test_signature_sha256(self):
+        body = self._body()
+        response = self._post_signed(body, {'X-Postal-Signature-256': self._sign(body)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_signature_sha1(self):
+        body = self._body()
+        response = self._post_signed(body, {'X-Postal-Signature': self._sign(body, hashes.SHA1)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_signature_tampered_body(self):
+        body = self._body()
+        signature = self._sign(body)
+        tampered = body.replace(b'MessageSent', b'MessageBounced')
+        response = self._post_signed(tampered, {'X-Postal-Signature-256': signature})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(self.env['mail.postal.event'].search_count([('event_type', '=', 'bounced')]))
+
+    def test_signature_missing(self):
+        response = self._post_signed(self._body(), {})
+        self.assertEqual(response.status_code, 403)
+
+    def test_signature_key_not_configured(self):
+        self.env['ir.config_parameter'].sudo().set_param('dr_postal.webhook_public_key', '')
+        body = self._body()
+        response = self._post_signed(body, {'X-Postal-Signature-256': self._sign(body)})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from .common import PostalCase
+
+EVENT_NAMES = ('MessageSent', 'MessageBounced', 'MessageLoaded', 'MessageLinkClicked')
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookPerformance(PostalCase):
+    """Query-count budgets of the webhook processing and send hot paths."""
+
+    def setUp(self):
+        super().setUp()
+        self.Event = self.env['mail.postal.event'].sudo()
+        # warm up the caches (config parameters, webhook settings)
+        self.Event._process_postal_event(self._envelope('MessageSent', self.recipients[-1]))
+        self.env.invalidate_all()
+
+    def test_event_query_budget(self):
+        """Each event type is processed within a fixed number of queries."""
+        # includes the precommit bus notifications flushed by assertQueryCount
+        budgets = {
+            'MessageSent': 20,
+            'MessageBounced': 21,
+            'MessageLoaded': 20,
+            'MessageLinkClicked': 20,
+        }
+        for index, event_name in enumerate(EVENT_NAMES):
+            envelope = self._envelope(event_name, self.recipients[index])
+            with self.subTest(event=event_name), self.assertQueryCount(budgets[event_name]):
+                result = self.Event._process_postal_event(envelope)
+            self.assertEqual(result['status'], 'ok')
+            self.assertTrue(result.get('event_id'))
+            self.env.invalidate_all()
+
+    def test_batch_query_budget(self):
+        """A batch costs the same number of queries whatever its size."""
+        envelopes = [
+            self._envelope(EVENT_NAMES[index % len(EVENT_NAMES)], recipient)
+            for index, recipient in enumerate(self.recipients)
+        ]
+        with self.assertQueryCount(25):
+            results = self.Event._process_postal_events(envelopes)
+        self.assertTrue(all(result.get('event_id') for result in results))
+
+    def test_duplicate_query_budget(self):
+        """Postal retries are acknowledged with a single query."""
+        envelope = self._envelope('MessageLoaded', self.recipients[0])
+        self.Event._process_postal_event(envelope)
+        self.env.invalidate_all()
+        with self.assertQueryCount(1):
+            result = self.Event._process_postal_event(envelope)
+        self.assertEqual(result['message'], 'Duplicate event, ignored')
+
+    def test_insert_skips_stored_envelope(self):
+        """An envelope stored by a concurrent worker is skipped by the insert itself."""
+        recipient = self.recipients[3]
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == recipient)
+        envelope = self._envelope('MessageBounced', recipient)
+        self.Event._process_postal_event(envelope)
+        vals = {
+            'event_type': 'opened',
+            'event_datetime': notification.postal_last_event_id.event_datetime,
+            'notification_id': notification.id,
+            'postal_uuid': envelope['uuid'],
+        }
+        events, applied = self.Event._postal_insert_events([vals, dict(vals, postal_uuid=False)])
+        self.assertFalse(events[0])
+        self.assertTrue(events[1])
+        self.assertFalse(applied)
+        self.assertEqual(notification.postal_state, 'bounced')
+
+    def test_event_search_columns(self):
+        """Recipients are normalized and bounce reasons classified at ingest."""
+        envelope = self._envelope('MessageDeliveryFailed', self.recipients[4])
+        envelope['payload'].update({'status': 'HardFail', 'details': 'Permanent failure', 'output': '550 5.1.1 <x>: Recipient address rejected: User unknown'})
+        envelope['payload']['message']['to'] = 'Recipient4@EXAMPLE.com'
+        event = self.Event.browse(self.Event._process_postal_event(envelope)['event_id'])
+        self.assertEqual(event.recipient_normalized, 'recipient4@example.com')
+        self.assertEqual(event.recipient_domain, 'example.com')
+        self.assertEqual(event.smtp_code, '5.1.1')
+        self.assertEqual(event.smtp_category, 'unknown_recipient')
+        self.assertIn(event, self.Event.search([('smtp_category', '=', 'unknown_recipient'), ('recipient_domain', '=', 'example.com')]))
+
+    def test_event_matching(self):
+        """Events reach the notification of their recipient and move it forward only."""
+        recipient = self.recipients[0]
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == recipient)
+        for event_name, expected_state in (
+            ('MessageSent', 'sent'),
+            ('MessageLoaded', 'opened'),
+            ('MessageSent', 'opened'),
+            ('MessageBounced', 'bounced'),
+            ('MessageLoaded', 'bounced'),
+        ):
+            self.Event._process_postal_event(self._envelope(event_name, recipient))
+            self.assertEqual(notification.postal_state, expected_state)
+        self.assertEqual(notification.notification_status, 'bounce')
+        others = self.message.notification_ids - notification
+        self.assertFalse(others.filtered(lambda n: n.postal_state not in ('none', False)))
+
+    def test_event_matching_postal_message_map(self):
+        """Later events of a Postal message are resolved from the recorded mapping."""
+        recipient = self.recipients[1]
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == recipient)
+        self.Event._process_postal_event(self._envelope('MessageSent', recipient))
+        mapping = self.env['mail.postal.message.map'].search([('notification_id', '=', notification.id)])
+        self.assertEqual(len(mapping), 1)
+        self.assertEqual(mapping.message_id, self.message)
+
+        # the bounce carries an unknown Message-ID, only the Postal id and token match
+        envelope = self._envelope('MessageBounced', recipient)
+        envelope['payload']['original_message']['message_id'] = 'rewritten@example.com'
+        self.Event._process_postal_event(envelope)
+        self.assertEqual(notification.postal_state, 'bounced')
+
+    def test_coalesce_repeat_opens(self):
+        """Repeat opens of an opened notification only bump its counters."""
+        self.env['ir.config_parameter'].sudo().set_param('dr_postal.coalesce_opens', True)
+        recipient = self.recipients[2]
+        notification = self.message.notification_ids.filtered(lambda n: n.res_partner_id == recipient)
+        first = self.Event._process_postal_event(self._envelope('MessageLoaded', recipient))
+        self.assertTrue(first.get('event_id'))
+        results = self.Event._process_postal_events([
+            self._envelope(event_name, recipient)
+            for event_name in ('MessageLoaded', 'MessageLinkClicked', 'MessageLoaded')
+        ])
+        self.assertFalse(any(result.get('event_id') for result in results))
+        self.assertEqual(self.Event.search_count([('notification_id', '=', notification.id)]), 1)
+        summary = self.env['mail.postal.event.summary'].search([('notification_id', '=', notification.id)])
+        self.assertEqual(summary.event_type, 'opened')
+        self.assertEqual(summary.event_count, 3)
+        timeline = self.message._postal_get_timeline(limit=self.RECIPIENT_COUNT)
+        entry = next(row for row in timeline['recipients'] if row['notification_id'] == notification.id)
+        self.assertEqual(entry['events']['opened']['count'], 4)
+
+    def test_send_prepare_values_query_budget(self):
+        """Header injection reads from the batch map: no query per recipient."""
+        mail = self.env['mail.mail'].sudo().create({
+            'mail_message_id': self.message.id,
+            'recipient_ids': [(6, 0, self.recipients.ids)],
+            'body_html': '<p>Tracked</p>',
+            'is_notification': True,
+        })
+        self.env.cr.cache['dr_postal.notification_map'] = mail._get_postal_notification_map()
+        self.addCleanup(self.env.cr.cache.pop, 'dr_postal.notification_map', None)
+        mail._send_prepare_values(partner=self.recipients[0])
+        self.env.invalidate_all()
+        with self.assertQueryCount(6):
+            for partner in self.recipients:
+                values = mail._send_prepare_values(partner=partner)
+                self.assertTrue(values['headers']['X-Odoo-Tracking-UUID'])
+
+
+@tagged('-standard', 'dr_postal_benchmark')
+class TestWebhookBenchmark(PostalCase):
+    """Throughput benchmark, run explicitly with --test-tags dr_postal_benchmark."""
+
+    RECIPIENT_COUNT = 200
+
+    def test_benchmark_events(self):
+        Event = self.env['mail.postal.event'].sudo()
+        for event_name in EVENT_NAMES:
+            envelopes = [self._envelope(event_name, recipient) for recipient in self.recipients]
+            self._benchmark(event_name, envelopes, Event._process_postal_event)
+
+    def test_benchmark_batch(self):
+        Event = self.env['mail.postal.event'].sudo()
+        envelopes = [
+            self._envelope(EVENT_NAMES[index % len(EVENT_NAMES)], recipient)
+            for index, recipient in enumerate(self.recipients)
+        ]
+        batches = [envelopes[index:index + 50] for index in range(0, len(envelopes), 50)]
+        self._benchmark('batch of 50', batches, Event._process_postal_events)
+
+    def test_benchmark_send_prepare_values(self):
+        mail = self.env['mail.mail'].sudo().create({
+            'mail_message_id': self.message.id,
+            'recipient_ids': [(6, 0, self.recipients.ids)],
+            'body_html': '<p>Tracked</p>',
+            'is_notification': True,
+        })
+        self.env.cr.cache['dr_postal.notification_map'] = mail._get_postal_notification_map()
+        self.addCleanup(self.env.cr.cache.pop, 'dr_postal.notification_map', None)
+        self._benchmark('_send_prepare_values', self.recipients, lambda partner: mail._send_prepare_values(partner=partner))
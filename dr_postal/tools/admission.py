@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Per-worker admission control of the Postal webhook route.
+
+Limits are enforced within each Odoo worker process (and shared by the
+threads of a threaded server). Rejected webhooks are retried by Postal, so
+shedding load here only delays events instead of losing them.
+"""
+
+import threading
+import time
+
+
+class ConcurrencyLimiter:
+    """Cap the number of requests handled at the same time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def acquire(self, limit):
+        """Take a slot, unless ``limit`` (0 for unlimited) slots are taken."""
+        with self._lock:
+            if limit and self._active >= limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+
+class RateLimiter:
+    """Token bucket per source: ``rate`` requests per second, bursts of ``2 * rate``."""
+
+    # sources idle for this long are forgotten
+    EXPIRY = 60.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._last_cleanup = time.monotonic()
+
+    def allow(self, source, rate):
+        """Consume a token of ``source``; return False when its bucket is empty."""
+        if not rate:
+            return True
+        now = time.monotonic()
+        capacity = 2.0 * rate
+        with self._lock:
+            if now - self._last_cleanup > self.EXPIRY:
+                self._buckets = {
+                    key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < self.EXPIRY
+                }
+                self._last_cleanup = now
+            tokens, updated = self._buckets.get(source, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1.0:
+                self._buckets[source] = (tokens, now)
+                return False
+            self._buckets[source] = (tokens - 1.0, now)
+            return True
+
+
+class BacklogProbe:
+    """Remember the size of the processing backlog for a few seconds."""
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._expiry = 0.0
+
+    def get(self, measure):
+        """Return the cached backlog, calling ``measure()`` once it is stale."""
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now < self._expiry:
+                return self._value
+        value = measure()
+        with self._lock:
+            self._value, self._expiry = value, now + self.ttl
+        return value
+
+
+CONCURRENCY = ConcurrencyLimiter()
+RATE_LIMITER = RateLimiter()
+BACKLOG = BacklogProbe()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""In-process metrics of the Postal webhook pipeline.
+
+Each Odoo worker process keeps its own counters; every series is labelled
+with the process id so that scrapes of different workers do not mix.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PostalMetrics:
+    """Stage timers and per event / outcome counters, safe across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self._stage_sum = defaultdict(float)
+        self._stage_count = defaultdict(int)
+        self._events = defaultdict(int)
+        self._local = threading.local()
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the enclosed block as one observation of ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            buckets = self._stage_buckets[stage]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            self._stage_sum[stage] += seconds
+            self._stage_count[stage] += 1
+
+    def count(self, event_name, outcome, value=1):
+        """Count ``value`` events named ``event_name`` that ended in ``outcome``."""
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.append((event_name, outcome, value))
+            return
+        with self._lock:
+            self._events[event_name or 'none', outcome] += value
+
+    @contextmanager
+    def deferred(self):
+        """Only keep the counts of the enclosed block if it does not raise.
+
+        Used around work that is rolled back and retried on failure, so that
+        the events of the failed attempt are not counted twice.
+        """
+        outer = getattr(self._local, 'pending', None)
+        self._local.pending = pending = []
+        try:
+            yield
+        finally:
+            self._local.pending = outer
+        for event_name, outcome, value in pending:
+            self.count(event_name, outcome, value)
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        pid = os.getpid()
+        lines = [
+            '# HELP dr_postal_webhook_stage_seconds Time spent in each webhook pipeline stage.',
+            '# TYPE dr_postal_webhook_stage_seconds histogram',
+        ]
+        with self._lock:
+            for stage in sorted(self._stage_count):
+                labels = f'stage="{stage}",pid="{pid}"'
+                for bound, count in zip(BUCKETS, self._stage_buckets[stage]):
+                    lines.append(f'dr_postal_webhook_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'dr_postal_webhook_stage_seconds_bucket{{{labels},le="+Inf"}} {self._stage_count[stage]}')
+                lines.append(f'dr_postal_webhook_stage_seconds_sum{{{labels}}} {self._stage_sum[stage]:.6f}')
+                lines.append(f'dr_postal_webhook_stage_seconds_count{{{labels}}} {self._stage_count[stage]}')
+            lines += [
+                '# HELP dr_postal_webhook_events_total Webhook events by Postal event name and outcome.',
+                '# TYPE dr_postal_webhook_events_total counter',
+            ]
+            for (event_name, outcome), value in sorted(self._events.items()):
+                lines.append(
+                    f'dr_postal_webhook_events_total{{event="{_escape(event_name)}",outcome="{outcome}",pid="{pid}"}} {value}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = PostalMetrics()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Minimal client of the Postal HTTP API (``/api/v1``).
+
+Calls go through a single keep-alive ``requests`` session whose connection
+pool is sized to the number of worker threads, so that many lookups reuse
+a handful of TLS connections to the Postal server.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_logger = logging.getLogger(__name__)
+
+
+class PostalAPIError(Exception):
+    """Raised when the Postal API rejects a call or cannot be reached."""
+
+
+class PostalAPIClient:
+    """Pooled client of a Postal mail server API.
+
+    :param base_url: URL of the Postal web interface, e.g.
+        ``https://postal.example.com``
+    :param api_key: API credential of the mail server
+    :param concurrency: maximum number of simultaneous requests
+    :param timeout: timeout in seconds of each request
+    """
+
+    def __init__(self, base_url, api_key, concurrency=4, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.concurrency,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=None),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'X-Server-API-Key': api_key,
+            'Content-Type': 'application/json',
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _call(self, endpoint, params):
+        """POST ``params`` to ``endpoint`` and return the ``data`` of the reply."""
+        try:
+            response = self.session.post(f'{self.base_url}/api/v1/{endpoint}', json=params, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise PostalAPIError(str(e)) from e
+        if result.get('status') != 'success':
+            data = result.get('data') or {}
+            raise PostalAPIError(data.get('message') or result.get('status') or 'Unknown error')
+        return result.get('data')
+
+    def get_deliveries(self, message_id):
+        """Return the delivery attempts of a Postal message."""
+        return self._call('messages/deliveries', {'id': message_id}) or []
+
+    def get_many_deliveries(self, message_ids):
+        """Fetch the deliveries of many messages, ``concurrency`` at a time.
+
+        :return: dict mapping each message id to its list of deliveries;
+            messages whose lookup failed are logged and left out.
+        """
+        message_ids = list(message_ids)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.get_deliveries, message_id) for message_id in message_ids]
+        deliveries = {}
+        for message_id, future in zip(message_ids, futures):
+            try:
+                deliveries[message_id] = future.result()
+            except PostalAPIError as e:
+                _logger.warning('Postal API: Unable to fetch deliveries of message %s: %s', message_id, e)
+        return deliveries
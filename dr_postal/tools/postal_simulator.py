@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for a Postal server, to load-test the webhook pipeline.
+
+The simulator receives the mails sent by Odoo on an SMTP sink, then fires
+the webhooks Postal would send for each recipient (sent, delayed, loaded,
+clicked, bounced) at ``/postal/webhook``, at a configurable rate and
+partly out of order. It reports the latency from the reception of a mail
+to the acknowledgement of its last webhook and, when Odoo credentials are
+given, to the moment the final tick is visible on the notification.
+
+Point an outgoing mail server of Odoo at the sink (no encryption, no
+authentication), then run for instance::
+
+    python dr_postal/tools/postal_simulator.py \\
+        --webhook-url http://localhost:8069/postal/webhook/<token> \\
+        --smtp-port 2525 --rate 200 --open-rate 0.6 --reorder-rate 0.2 \\
+        --odoo-url http://localhost:8069 --db mydb --login admin --password admin
+
+Only the standard library, ``requests`` and ``cryptography`` (to sign the
+webhooks with ``--private-key``) are needed, none of Odoo.
+"""
+
+import argparse
+import base64
+import email
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import socketserver
+import statistics
+import threading
+import time
+import uuid
+import xmlrpc.client
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.utils import getaddresses
+
+import requests
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+BOUNCE_EVENTS = ('MessageBounced', 'MessageDeliveryFailed')
+OPEN_EVENTS = ('MessageLoaded', 'MessageLinkClicked')
+
+
+# ------------------------------------------------------------
+# SMTP SINK
+# ------------------------------------------------------------
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: enough for ``smtplib`` without TLS or AUTH."""
+
+    ADDRESS_RE = re.compile(r'<([^>]*)>')
+
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self._reply('220 postal-simulator ESMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline(65536)
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self._reply('250-postal-simulator')
+                self._reply('250-8BITMIME')
+                self._reply('250 SMTPUTF8')
+            elif verb == 'HELO':
+                self._reply('250 postal-simulator')
+            elif verb == 'MAIL':
+                recipients = []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                address = self.ADDRESS_RE.search(command)
+                recipients.append(address.group(1) if address else command[8:].strip())
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                raw = self._read_data()
+                if raw is None:
+                    return
+                self.server.on_message(recipients, raw, time.monotonic())
+                recipients = []
+                self._reply('250 OK queued')
+            elif verb == 'RSET':
+                recipients = []
+                self._reply('250 OK')
+            elif verb == 'NOOP':
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline(1 << 20)
+            if not line:
+                return None
+            if line in (b'.\r\n', b'.\n'):
+                return b''.join(lines)
+            # undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b'..') else line)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """SMTP server handing every received mail to ``on_message``.
+
+    :param address: ``(host, port)`` to listen on; port 0 picks a free one
+    :param on_message: callable receiving ``(recipients, raw_bytes,
+        received_at)``, ``received_at`` being a ``time.monotonic()`` value
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, on_message):
+        super().__init__(address, _SMTPHandler)
+        self.on_message = on_message
+
+
+# ------------------------------------------------------------
+# SCENARIO
+# ------------------------------------------------------------
+
+class Delivery:
+    """One recipient of a mail received by the sink, tracked until its final tick."""
+
+    __slots__ = (
+        'postal_id', 'token', 'message_id', 'tracking_uuid', 'odoo_message_id', 'recipient', 'sender',
+        'received_at', 'final_state', 'pending', 'acked_at', 'ticked_at',
+    )
+
+    def __init__(self, postal_id, token, message_id, tracking_uuid, odoo_message_id, recipient, sender, received_at):
+        self.postal_id = postal_id
+        self.token = token
+        self.message_id = message_id
+        self.tracking_uuid = tracking_uuid
+        self.odoo_message_id = odoo_message_id
+        self.recipient = recipient
+        self.sender = sender
+        self.received_at = received_at
+        self.final_state = None
+        self.pending = 0
+        self.acked_at = None
+        self.ticked_at = None
+
+
+class Scenario:
+    """Random but realistic sequences of Postal webhooks for a delivery.
+
+    Rates are probabilities in [0, 1]. Events of a delivery are spaced by
+    exponentially distributed gaps of ``mean_gap`` seconds on average; with
+    ``reorder_rate``, an event is held back so that the next one may
+    arrive first, while keeping its own timestamp.
+    """
+
+    def __init__(self, delay_rate=0.1, bounce_rate=0.05, async_bounce_rate=0.5, open_rate=0.6,
+                 reopen_rate=0.3, click_rate=0.2, mean_gap=1.0, reorder_rate=0.1, seed=None):
+        self.delay_rate = delay_rate
+        self.bounce_rate = bounce_rate
+        self.async_bounce_rate = async_bounce_rate
+        self.open_rate = open_rate
+        self.reopen_rate = reopen_rate
+        self.click_rate = click_rate
+        self.mean_gap = mean_gap
+        self.reorder_rate = reorder_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def event_names(self):
+        """Return the names of the events of one delivery, in logical order."""
+        rand = self.random.random
+        names = ['MessageDelayed'] if rand() < self.delay_rate else []
+        if rand() < self.bounce_rate:
+            # bounces are either refused by the remote server, or sent back later
+            names += ['MessageSent', 'MessageBounced'] if rand() < self.async_bounce_rate else ['MessageDeliveryFailed']
+            return names
+        names.append('MessageSent')
+        if rand() < self.open_rate:
+            names.append('MessageLoaded')
+            if rand() < self.reopen_rate:
+                names.append('MessageLoaded')
+            if rand() < self.click_rate:
+                names.append('MessageLinkClicked')
+        return names
+
+    @staticmethod
+    def final_state(event_names):
+        """Postal state the notification must end in after these events."""
+        if any(name in BOUNCE_EVENTS for name in event_names):
+            return 'bounced'
+        if any(name in OPEN_EVENTS for name in event_names):
+            return 'opened'
+        return 'sent'
+
+    def plan(self, delivery):
+        """Return the ``(fire_offset, envelope)`` of the webhooks of ``delivery``.
+
+        Offsets are in seconds from now; ``delivery.final_state`` and
+        ``delivery.pending`` are set accordingly.
+        """
+        with self._lock:
+            names = self.event_names()
+            now = time.time()
+            offset = 0.0
+            planned = []
+            for name in names:
+                fire_offset = offset
+                if self.random.random() < self.reorder_rate:
+                    fire_offset += self.random.uniform(self.mean_gap, 3 * self.mean_gap)
+                planned.append((fire_offset, self.envelope(delivery, name, now + offset)))
+                offset += self.random.expovariate(1.0 / self.mean_gap) if self.mean_gap else 0.0
+        delivery.final_state = self.final_state(names)
+        delivery.pending = len(planned)
+        return planned
+
+    def envelope(self, delivery, event_name, timestamp):
+        """Return the webhook envelope Postal sends for ``event_name``."""
+        message_data = {
+            'id': delivery.postal_id,
+            'token': delivery.token,
+            'direction': 'outgoing',
+            'message_id': delivery.message_id,
+            'to': delivery.recipient,
+            'from': delivery.sender,
+            'odoo_tracking_uuid': delivery.tracking_uuid,
+            'odoo_message_id': delivery.odoo_message_id,
+        }
+        if event_name == 'MessageBounced':
+            payload = {
+                'original_message': message_data,
+                'bounce': {'id': delivery.postal_id + 1, 'from': 'mailer-daemon@example.com',
+                           'subject': 'Mail delivery failed', 'message_id': f'bounce-{delivery.message_id}'},
+            }
+        elif event_name in ('MessageLoaded', 'MessageLinkClicked'):
+            payload = {'message': message_data, 'ip_address': '127.0.0.1', 'user_agent': 'postal-simulator'}
+            if event_name == 'MessageLinkClicked':
+                payload.update({'url': 'https://example.com/', 'token': uuid.uuid4().hex[:8]})
+        else:
+            status, details, output = {
+                'MessageSent': ('Sent', 'Message sent by SMTP', '250 2.0.0 OK queued'),
+                'MessageDelayed': ('SoftFail', 'Message delayed', '451 4.7.1 Greylisted, try again later'),
+                'MessageDeliveryFailed': ('HardFail', 'Permanent failure', '550 5.1.1 User unknown'),
+            }[event_name]
+            payload = {
+                'message': message_data, 'status': status, 'details': details, 'output': output,
+                'sent_with_ssl': True, 'time': round(self.random.uniform(0.05, 0.5), 3),
+            }
+        return {'event': event_name, 'timestamp': timestamp, 'uuid': str(uuid.uuid4()), 'payload': payload}
+
+
+# ------------------------------------------------------------
+# REPORT
+# ------------------------------------------------------------
+
+class Report:
+    """Thread-safe counters and latencies of a simulation run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.counters = Counter()
+        self.statuses = Counter()
+        self.ack_latencies = []
+        self.end_to_end = []
+        self.tick_latencies = []
+
+    def count(self, key, value=1):
+        with self._lock:
+            self.counters[key] += value
+
+    def response(self, status, latency):
+        with self._lock:
+            self.statuses[status] += 1
+            self.ack_latencies.append(latency)
+
+    def delivery_acked(self, delivery):
+        with self._lock:
+            self.counters['deliveries_acked'] += 1
+            self.end_to_end.append(delivery.acked_at - delivery.received_at)
+
+    def delivery_ticked(self, delivery):
+        with self._lock:
+            self.counters['deliveries_ticked'] += 1
+            self.tick_latencies.append(delivery.ticked_at - delivery.received_at)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return 'n/a'
+        values = sorted(values)
+        quantiles = statistics.quantiles(values, n=100, method='inclusive') if len(values) > 1 else values * 99
+        return 'p50=%.3fs p95=%.3fs p99=%.3fs max=%.3fs (n=%d)' % (
+            quantiles[49], quantiles[94], quantiles[98], values[-1], len(values),
+        )
+
+    def render(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            counters = self.counters
+            lines = [
+                'Postal simulation: %.1fs elapsed' % elapsed,
+                '  mails received: %d, deliveries: %d, acknowledged: %d, ticked: %d' % (
+                    counters['mails'], counters['deliveries'],
+                    counters['deliveries_acked'], counters['deliveries_ticked'],
+                ),
+                '  webhooks fired: %d (%.1f/s), retried: %d, given up: %d' % (
+                    counters['webhooks'], counters['webhooks'] / elapsed if elapsed else 0.0,
+                    counters['retries'], counters['given_up'],
+                ),
+                '  responses: %s' % (', '.join(
+                    '%s=%d' % (status, count) for status, count in sorted(self.statuses.items(), key=str)
+                ) or 'none'),
+                '  webhook latency:          %s' % self._summary(self.ack_latencies),
+                '  mail to last webhook ack: %s' % self._summary(self.end_to_end),
+                '  mail to final tick:       %s' % self._summary(self.tick_latencies),
+            ]
+        return '\n'.join(lines)
+
+
+# ------------------------------------------------------------
+# WEBHOOK FIRER
+# ------------------------------------------------------------
+
+class WebhookFirer:
+    """Fire scheduled webhooks at Odoo with bounded concurrency and rate.
+
+    Webhooks answered with 429, 503 or another server error are retried
+    after their ``Retry-After`` (or ``retry_delay``), like Postal does, up
+    to ``max_retries`` times.
+    """
+
+    def __init__(self, url, report, rate=0.0, concurrency=8, private_key=None, timeout=30,
+                 max_retries=5, retry_delay=5.0):
+        self.url = url
+        self.report = report
+        self.rate = rate
+        self.private_key = private_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._in_flight = 0
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='postal-simulator-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def schedule(self, delay, delivery, envelope, attempt=0):
+        with self._condition:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._sequence), delivery, envelope, attempt))
+            self._condition.notify()
+
+    def idle(self):
+        with self._condition:
+            return not self._queue and not self._in_flight
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _dispatch(self):
+        next_slot = time.monotonic()
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                if self._stopped:
+                    return
+                __, __, delivery, envelope, attempt = heapq.heappop(self._queue)
+                self._in_flight += 1
+            if self.rate:
+                next_slot = max(next_slot + 1.0 / self.rate, time.monotonic())
+                time.sleep(max(next_slot - time.monotonic(), 0.0))
+            self._slots.acquire()
+            self._executor.submit(self._post, delivery, envelope, attempt)
+
+    def _post(self, delivery, envelope, attempt):
+        try:
+            body = json.dumps(envelope).encode()
+            headers = {'Content-Type': 'application/json'}
+            if self.private_key:
+                signature = self.private_key.sign(body, padding.PKCS1v15(), hashes.SHA256())
+                headers['X-Postal-Signature-256'] = base64.b64encode(signature).decode()
+            self.report.count('webhooks')
+            start = time.monotonic()
+            retry_after = self.retry_delay
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+                status = response.status_code
+                retry_after = float(response.headers.get('Retry-After') or retry_after)
+            except requests.RequestException as error:
+                _logger.debug('Webhook %s failed: %s', envelope['uuid'], error)
+                status = 'error'
+            self.report.response(status, time.monotonic() - start)
+            if status != 'error' and status < 300:
+                self._acked(delivery)
+            elif status == 'error' or status == 429 or status >= 500:
+                if attempt < self.max_retries:
+                    self.report.count('retries')
+                    self.schedule(retry_after, delivery, envelope, attempt + 1)
+                else:
+                    self.report.count('given_up')
+            else:
+                # rejected for good (bad token, signature...): Postal would not retry either
+                self.report.count('given_up')
+        finally:
+            self._slots.release()
+            with self._condition:
+                self._in_flight -= 1
+
+    def _acked(self, delivery):
+        with self._condition:
+            delivery.pending -= 1
+            done = not delivery.pending
+            if done:
+                delivery.acked_at = time.monotonic()
+        if done:
+            self.report.delivery_acked(delivery)
+
+
+# ------------------------------------------------------------
+# TICK VERIFIER
+# ------------------------------------------------------------
+
+class TickVerifier(threading.Thread):
+    """Poll Odoo over XML-RPC until notifications show their final state."""
+
+    def __init__(self, url, db, login, password, report, interval=0.5):
+        super().__init__(name='postal-simulator-verify', daemon=True)
+        self.db = db
+        self.password = password
+        self.report = report
+        self.interval = interval
+        common = xmlrpc.client.ServerProxy(f'{url.rstrip("/")}/xmlrpc/2/common')
+        self.uid = common.authenticate(db, login, password, {})
+        if not self.uid:
+            raise ValueError('Odoo authentication failed for %s' % login)
+        self.models = xmlrpc.client.ServerProxy(f'{url.rstrip("/")}/xmlrpc/2/object', allow_none=True)
+        self._lock = threading.Lock()
+        self._waiting = {}
+        self._stopped = threading.Event()
+
+    def watch(self, delivery):
+        """Wait for the final tick of ``delivery``, once all its webhooks are acknowledged."""
+        if delivery.tracking_uuid:
+            with self._lock:
+                self._waiting.setdefault(delivery.tracking_uuid, []).append(delivery)
+
+    def pending(self):
+        with self._lock:
+            return sum(len(deliveries) for deliveries in self._waiting.values())
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                uuids = [
+                    tracking_uuid for tracking_uuid, deliveries in self._waiting.items()
+                    if any(delivery.acked_at for delivery in deliveries)
+                ]
+            if not uuids:
+                continue
+            try:
+                rows = self.models.execute_kw(
+                    self.db, self.uid, self.password, 'mail.notification', 'search_read',
+                    [[('postal_tracking_uuid', 'in', uuids)]], {'fields': ['postal_tracking_uuid', 'postal_state']},
+                )
+            except (OSError, xmlrpc.client.Error) as error:
+                _logger.warning('Could not poll notification states: %s', error)
+                continue
+            now = time.monotonic()
+            with self._lock:
+                for row in rows:
+                    deliveries = self._waiting.get(row['postal_tracking_uuid'], [])
+                    for delivery in [d for d in deliveries if d.acked_at and d.final_state == row['postal_state']]:
+                        delivery.ticked_at = now
+                        deliveries.remove(delivery)
+                        self.report.delivery_ticked(delivery)
+                    if not deliveries:
+                        self._waiting.pop(row['postal_tracking_uuid'], None)
+
+
+# ------------------------------------------------------------
+# SIMULATOR
+# ------------------------------------------------------------
+
+class PostalSimulator:
+    """Turn the mails received by the sink into planned webhook sequences."""
+
+    def __init__(self, scenario, firer=None, verifier=None, report=None):
+        self.scenario = scenario
+        self.firer = firer
+        self.verifier = verifier
+        self.report = report or Report()
+        self._postal_ids = itertools.count(int(time.time()) % 1000000 * 1000)
+        self._lock = threading.Lock()
+
+    def deliveries(self, recipients, raw, received_at):
+        """Return one delivery per envelope recipient of a received mail."""
+        message = email.message_from_bytes(raw, policy=policy.default)
+        message_id = (message.get('Message-ID') or '').strip().strip('<>') or f'{uuid.uuid4()}@postal-simulator'
+        recipients = recipients or [address for __, address in getaddresses(message.get_all('To', []))]
+        senders = getaddresses(message.get_all('From', []))
+        deliveries = []
+        for recipient in recipients:
+            with self._lock:
+                postal_id = next(self._postal_ids)
+            deliveries.append(Delivery(
+                postal_id=postal_id,
+                token=uuid.uuid4().hex[:12],
+                message_id=message_id,
+                tracking_uuid=str(message.get('X-Odoo-Tracking-UUID') or '').strip() or None,
+                odoo_message_id=str(message.get('X-Odoo-Message-Id') or '').strip() or None,
+                recipient=recipient,
+                sender=senders[0][1] if senders else '',
+                received_at=received_at,
+            ))
+        return deliveries
+
+    def on_message(self, recipients, raw, received_at):
+        """Sink callback: plan and schedule the webhooks of a received mail."""
+        self.report.count('mails')
+        for delivery in self.deliveries(recipients, raw, received_at):
+            self.report.count('deliveries')
+            for fire_offset, envelope in self.scenario.plan(delivery):
+                self.firer.schedule(fire_offset, delivery, envelope)
+            if self.verifier:
+                self.verifier.watch(delivery)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate Postal: SMTP sink and webhook sequences.')
+    parser.add_argument('--webhook-url', required=True, help='URL of /postal/webhook, with its token')
+    parser.add_argument('--smtp-host', default='127.0.0.1')
+    parser.add_argument('--smtp-port', type=int, default=2525)
+    parser.add_argument('--rate', type=float, default=0.0, help='webhooks per second, 0 for no limit')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous webhook requests')
+    parser.add_argument('--mean-gap', type=float, default=1.0, help='mean seconds between events of a mail')
+    parser.add_argument('--reorder-rate', type=float, default=0.1, help='share of events held back')
+    parser.add_argument('--delay-rate', type=float, default=0.1)
+    parser.add_argument('--bounce-rate', type=float, default=0.05)
+    parser.add_argument('--open-rate', type=float, default=0.6)
+    parser.add_argument('--reopen-rate', type=float, default=0.3)
+    parser.add_argument('--click-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, help='random seed, for reproducible runs')
+    parser.add_argument('--private-key', help='PEM private key signing the webhooks')
+    parser.add_argument('--duration', type=float, default=0.0, help='seconds to run, 0 until interrupted')
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    parser.add_argument('--odoo-url', help='Odoo URL, to measure the latency until the final tick')
+    parser.add_argument('--db')
+    parser.add_argument('--login')
+    parser.add_argument('--password')
+    parser.add_argument('--drain-timeout', type=float, default=60.0,
+                        help='seconds to wait for pending webhooks and ticks when stopping')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    private_key = None
+    if args.private_key:
+        with open(args.private_key, 'rb') as key_file:
+            private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+    report = Report()
+    firer = WebhookFirer(args.webhook_url, report, rate=args.rate, concurrency=args.concurrency,
+                         private_key=private_key)
+    verifier = None
+    if args.odoo_url:
+        verifier = TickVerifier(args.odoo_url, args.db, args.login, args.password, report)
+        verifier.start()
+    scenario = Scenario(
+        delay_rate=args.delay_rate, bounce_rate=args.bounce_rate, open_rate=args.open_rate,
+        reopen_rate=args.reopen_rate, click_rate=args.click_rate, mean_gap=args.mean_gap,
+        reorder_rate=args.reorder_rate, seed=args.seed,
+    )
+    simulator = PostalSimulator(scenario, firer=firer, verifier=verifier, report=report)
+    sink = SMTPSink((args.smtp_host, args.smtp_port), simulator.on_message)
+    threading.Thread(target=sink.serve_forever, name='postal-simulator-smtp', daemon=True).start()
+    _logger.info('SMTP sink listening on %s:%s, firing at %s', *sink.server_address, args.webhook_url)
+
+    deadline = time.monotonic() + args.duration if args.duration else None
+    next_report = time.monotonic() + args.report_interval
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(0.2)
+            if time.monotonic() >= next_report:
+                _logger.info('\n%s', report.render())
+                next_report += args.report_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        drain_until = time.monotonic() + args.drain_timeout
+        while time.monotonic() < drain_until and not (firer.idle() and not (verifier and verifier.pending())):
+            time.sleep(0.2)
+        firer.stop()
+        if verifier:
+            verifier.stop()
+        print(report.render())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Classification of SMTP delivery failures reported by Postal."""
+
+import re
+
+SMTP_CATEGORIES = [
+    ('unknown_recipient', 'Unknown Recipient'),
+    ('mailbox_full', 'Mailbox Full'),
+    ('mailbox_disabled', 'Mailbox Disabled'),
+    ('domain', 'Invalid Domain'),
+    ('policy', 'Rejected by Policy'),
+    ('network', 'Network / Routing'),
+    ('other', 'Other'),
+]
+
+# RFC 3463 enhanced status codes (class.subject.detail), e.g. 5.1.1
+ENHANCED_CODE_RE = re.compile(r'\b([245])\.(\d{1,3})\.(\d{1,3})\b')
+# RFC 5321 reply codes, e.g. 550
+BASIC_CODE_RE = re.compile(r'\b([245][0-5]\d)\b')
+
+# Category of enhanced codes, by (subject, detail) then by subject alone
+ENHANCED_CATEGORIES = {
+    ('1', '1'): 'unknown_recipient',
+    ('1', '2'): 'domain',
+    ('1', '10'): 'domain',
+    ('2', '1'): 'mailbox_disabled',
+    ('2', '2'): 'mailbox_full',
+    ('4', '4'): 'domain',
+    '1': 'unknown_recipient',
+    '2': 'mailbox_disabled',
+    '4': 'network',
+    '7': 'policy',
+}
+
+# Categories of failures that retrying does not fix
+PERMANENT_CATEGORIES = {'unknown_recipient', 'mailbox_disabled', 'domain'}
+
+# Fallback on the wording of the server response, checked in order
+KEYWORD_CATEGORIES = [
+    ('mailbox_full', ('quota', 'mailbox full', 'mailbox is full', 'insufficient storage')),
+    ('unknown_recipient', ('user unknown', 'unknown user', 'no such user', 'does not exist',
+                           'recipient not found', 'address rejected', 'invalid recipient')),
+    ('mailbox_disabled', ('disabled', 'inactive', 'suspended')),
+    ('domain', ('host not found', 'domain not found', 'no mx', 'nxdomain')),
+    ('policy', ('spam', 'blocked', 'blacklist', 'blocklist', 'policy', 'rejected')),
+    ('network', ('timed out', 'timeout', 'connection refused', 'connection reset')),
+]
+
+
+def parse_smtp_error(text):
+    """Return the SMTP code and failure category found in an error message.
+
+    The code is the enhanced status code when present (``5.1.1``), the
+    reply code otherwise (``550``). Returns ``(False, False)`` for empty
+    messages and ``'other'`` when the failure cannot be classified.
+    """
+    if not text:
+        return False, False
+    enhanced = ENHANCED_CODE_RE.search(text)
+    if enhanced:
+        __, subject, detail = enhanced.groups()
+        category = ENHANCED_CATEGORIES.get((subject, detail)) or ENHANCED_CATEGORIES.get(subject)
+        if category:
+            return enhanced.group(0), category
+    basic = BASIC_CODE_RE.search(text)
+    code = enhanced.group(0) if enhanced else basic.group(0) if basic else False
+    lowered = text.lower()
+    for category, keywords in KEYWORD_CATEGORIES:
+        if any(keyword in lowered for keyword in keywords):
+            return code, category
+    return code, 'other'
+
+
+def is_permanent_failure(code, category):
+    """Tell whether a failure parsed by ``parse_smtp_error`` is permanent.
+
+    The class of the code decides (``5.x.x`` / ``5xx``); without code, only
+    categories that retrying does not fix are permanent.
+    """
+    if code:
+        return code.startswith('5')
+    return category in PERMANENT_CATEGORIES
@@ -1,4 +1,4 @@
 # -*- coding: utf-8 -*-
 
 from . import mail_resend_message
-from . import mail_postal_events_popup
+from . import mail_postal_event_export
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from urllib.parse import urlencode
+
+from odoo import api, fields, models
+
+from odoo.addons.dr_postal.models.mail_postal_event import POSTAL_EXPORT_COLUMNS
+
+
+class MailPostalEventExport(models.TransientModel):
+    """Choose the range and columns of a streaming export of postal events."""
+    _name = 'mail.postal.event.export'
+    _description = 'Postal Events Export'
+
+    date_from = fields.Datetime('From', required=True)
+    date_to = fields.Datetime('To', required=True)
+    export_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ], string='Format', required=True, default='csv')
+    event_type = fields.Selection(
+        selection=lambda self: self.env['mail.postal.event']._fields['event_type']._description_selection(self.env),
+        string='Event Type',
+        help='Leave empty to export all event types',
+    )
+    column_ids = fields.Many2many(
+        'ir.model.fields',
+        string='Columns',
+        domain=[('model', '=', 'mail.postal.event'), ('name', 'in', POSTAL_EXPORT_COLUMNS)],
+        help='Leave empty to export all columns except the payload',
+    )
+    include_payload = fields.Boolean('Include Payload')
+
+    @api.model
+    def _action_open_for_events(self, events):
+        """Open the wizard on the date range of the selected events."""
+        [(date_from, date_to)] = self.env['mail.postal.event']._read_group(
+            [('id', 'in', events.ids)], aggregates=['event_datetime:min', 'event_datetime:max'],
+        )
+        action = self.env['ir.actions.act_window']._for_xml_id('dr_postal.mail_postal_event_export_action')
+        action['context'] = {'default_date_from': date_from, 'default_date_to': date_to}
+        return action
+
+    def action_export(self):
+        self.ensure_one()
+        columns = self.column_ids.mapped('name') or [column for column in POSTAL_EXPORT_COLUMNS if column != 'payload']
+        if self.include_payload:
+            columns.append('payload')
+        params = {
+            'date_from': fields.Datetime.to_string(self.date_from),
+            'date_to': fields.Datetime.to_string(self.date_to),
+            'export_format': self.export_format,
+            'columns': ','.join(columns),
+        }
+        if self.event_type:
+            params['event_types'] = self.event_type
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/postal/events/export?' + urlencode(params),
+            'target': 'self',
+        }
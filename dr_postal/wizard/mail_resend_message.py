@@ -81,11 +81,8 @@ class MailResendMessage(models.TransientModel):
                 to_send.action_resend()
             else:
                 wizard.mail_message_id._notify_message_notification_update()
-        # Reload the page to refresh notification icons
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'reload',
-        }
+        # Notification icons are refreshed in place through the bus
+        return {'type': 'ir.actions.act_window_close'}
 
     def cancel_mail_action(self):
         for wizard in self:
@@ -132,6 +129,7 @@ class PartnerResend(models.TransientModel):
 
     def action_resend(self):
         """Resend the email by creating a new mail.mail and sending it."""
+        messages = self.env['mail.message']
         for partner_resend in self:
             notification = partner_resend.notification_id
             message = partner_resend.resend_wizard_id.mail_message_id
@@ -211,8 +209,10 @@ class PartnerResend(models.TransientModel):
                 if mail.exists():
                     mail.unlink()
             
-            # Notify about the update
-            message._notify_message_notification_update()
+            messages |= message
+        
+        # Notify about the update, once per message
+        messages._notify_message_notification_update()
         
         if len(self) == 1:
             return self.action_open_record()